@@ -1,30 +1,56 @@
-import ccxt
 import json
+import threading
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from sklearn.metrics import mean_absolute_error
 from tabulate import tabulate
 
 class ComparadorPredicciones:
-    def __init__(self, archivo_predicciones, archivo_salida, par="ETH/BTC"):
+    DIA_MS = 24 * 3600 * 1000
+    MAX_VELAS_PETICION = 1000
+
+    def __init__(self, archivo_predicciones, archivo_salida, par="ETH/BTC", archivo_historial=None,
+                 fuente=None, exchange=None):
         """
         Inicializa el comparador de predicciones.
 
+        Los valores reales se toman primero del historial local de velas (CSV o
+        almacén) con un cruce por timestamp; solo las predicciones que no cubre se
+        resuelven con una única petición por rango a Binance. La conexión con el
+        exchange se abre únicamente si hace falta.
+
         :param archivo_predicciones: Archivo JSON con las predicciones generadas.
         :param archivo_salida: Archivo CSV donde se guardarán los resultados.
         :param par: Par de criptomonedas a analizar (e.g., "ETH/BTC").
+        :param archivo_historial: CSV de historial local del par (e.g., historial_ETH_BTC.csv).
+        :param fuente: Objeto con método a_dataframe() (e.g., AlmacenVelas) que sustituye al CSV.
+        :param exchange: Cliente ccxt ya inicializado (e.g., SesionBinance.exchange) para reutilizar la conexión.
         """
         self.archivo_predicciones = archivo_predicciones
         self.archivo_salida = archivo_salida
         self.par = par
+        self.archivo_historial = archivo_historial
+        self.fuente = fuente
+        self._exchange = exchange
+        self._lock = threading.Lock()
 
-        # Inicializar conexión con Binance
-        self.exchange = self.inicializar_exchange()
+    @property
+    def exchange(self):
+        """
+        Cliente del exchange; se crea la primera vez que se necesita.
+        """
+        with self._lock:
+            if self._exchange is None:
+                self._exchange = self.inicializar_exchange()
+            return self._exchange
 
     def inicializar_exchange(self):
         """
         Inicializa la conexión con Binance.
         """
+        import ccxt
+
         try:
             exchange = ccxt.binance({
                 'enableRateLimit': True,
@@ -52,6 +78,72 @@ class ComparadorPredicciones:
             print(f"[ERROR] Error al cargar las predicciones: {e}")
             return []
 
+    def velas_diarias_locales(self):
+        """
+        Construye velas diarias (apertura a las 00:00 UTC, como las de Binance) a partir
+        del historial local.
+
+        :return: DataFrame con columnas apertura_ms, high_real, low_real o None si no hay historial.
+        """
+        try:
+            if self.fuente is not None:
+                historial = self.fuente.a_dataframe()
+            elif self.archivo_historial:
+                historial = pd.read_csv(self.archivo_historial, parse_dates=['timestamp'],
+                                        usecols=['timestamp', 'high', 'low'])
+            else:
+                return None
+        except Exception as e:
+            print(f"[WARN] No se pudo leer el historial local: {e}")
+            return None
+        if historial.empty:
+            return None
+
+        diarias = historial.set_index('timestamp')[['high', 'low']].resample('1D').agg({'high': 'max', 'low': 'min'})
+        diarias = diarias.dropna()
+        return pd.DataFrame({
+            'apertura_ms': ((diarias.index - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)).astype(np.int64),
+            'high_real': diarias['high'].to_numpy(),
+            'low_real': diarias['low'].to_numpy(),
+        })
+
+    def velas_diarias_exchange(self, desde_ms, hasta_ms):
+        """
+        Descarga las velas diarias de un rango con una sola petición (o las mínimas
+        necesarias si el rango supera el límite de velas por petición).
+
+        :param desde_ms: Inicio del rango en milisegundos.
+        :param hasta_ms: Fin del rango en milisegundos.
+        :return: DataFrame con columnas apertura_ms, high_real, low_real.
+        """
+        velas = []
+        since = desde_ms - desde_ms % self.DIA_MS
+        while since <= hasta_ms:
+            limite = min(self.MAX_VELAS_PETICION, (hasta_ms - since) // self.DIA_MS + 2)
+            ohlcv = self.exchange.fetch_ohlcv(self.par, timeframe="1d", since=since, limit=int(limite))
+            if not ohlcv:
+                break
+            velas.extend(ohlcv)
+            since = ohlcv[-1][0] + self.DIA_MS
+        return pd.DataFrame({
+            'apertura_ms': np.array([vela[0] for vela in velas], dtype=np.int64),
+            'high_real': [vela[2] for vela in velas],
+            'low_real': [vela[3] for vela in velas],
+        })
+
+    def cruzar_con_velas(self, objetivos, diarias):
+        """
+        Asigna a cada predicción la primera vela diaria que abre en su timestamp o
+        después (lo mismo que devolvía fetch_ohlcv con since=timestamp y limit=1).
+
+        :param objetivos: DataFrame con columnas timestamp y ts_ms, ordenado por ts_ms.
+        :param diarias: DataFrame de velas diarias.
+        :return: DataFrame con timestamp, high_real y low_real (NaN si no hay vela).
+        """
+        diarias = diarias.sort_values('apertura_ms')
+        return pd.merge_asof(objetivos, diarias, left_on='ts_ms', right_on='apertura_ms',
+                             direction='forward', tolerance=self.DIA_MS)
+
     def obtener_datos_reales(self, predicciones):
         """
         Obtiene los datos reales del mercado para los timestamps de las predicciones.
@@ -59,30 +151,39 @@ class ComparadorPredicciones:
         :param predicciones: Lista con las predicciones.
         :return: Lista con los valores reales del mercado.
         """
-        datos_reales = []
-        for prediccion in predicciones:
-            timestamp = prediccion["timestamp"]
-            dt_obj = datetime.fromisoformat(timestamp)
+        objetivos = pd.DataFrame({'timestamp': [prediccion["timestamp"] for prediccion in predicciones]})
+        objetivos['ts_ms'] = np.array(
+            [int(datetime.fromisoformat(t).timestamp() * 1000) for t in objetivos['timestamp']], dtype=np.int64)
+        objetivos = objetivos.sort_values('ts_ms', kind='stable').reset_index(drop=True)
+
+        reales = None
+        diarias = self.velas_diarias_locales()
+        if diarias is not None and not diarias.empty:
+            reales = self.cruzar_con_velas(objetivos, diarias)
+            print(f"[INFO] Datos reales obtenidos del historial local: "
+                  f"{reales['high_real'].notna().sum()} de {len(reales)} predicciones.")
 
+        pendientes = objetivos if reales is None else objetivos[reales['high_real'].isna().to_numpy()]
+        ahora_ms = int(datetime.now().timestamp() * 1000)
+        pendientes = pendientes[pendientes['ts_ms'] <= ahora_ms]
+        if not pendientes.empty:
             try:
-                # Convertir timestamp a milisegundos para Binance
-                since = int(dt_obj.timestamp() * 1000)
-
-                # Consultar datos históricos del mercado
-                ohlcv = self.exchange.fetch_ohlcv(self.par, timeframe="1d", since=since, limit=1)
-
-                if ohlcv:
-                    datos_reales.append({
-                        "timestamp": timestamp,
-                        "high_real": ohlcv[0][2],  # Precio más alto del mercado
-                        "low_real": ohlcv[0][3],   # Precio más bajo del mercado
-                    })
-                else:
-                    print(f"[WARN] No se encontraron datos reales para {timestamp}.")
+                remotas = self.velas_diarias_exchange(int(pendientes['ts_ms'].iloc[0]), int(pendientes['ts_ms'].iloc[-1]))
+                if not remotas.empty:
+                    resueltas = self.cruzar_con_velas(objetivos, remotas)
+                    reales = resueltas if reales is None else reales.fillna(resueltas[['high_real', 'low_real']])
             except Exception as e:
-                print(f"[ERROR] Error al obtener datos reales para {timestamp}: {e}")
+                print(f"[ERROR] Error al obtener datos reales de Binance: {e}")
 
-        return datos_reales
+        if reales is None:
+            return []
+        encontrados = reales.dropna(subset=['high_real', 'low_real'])
+        for timestamp in reales.loc[reales['high_real'].isna(), 'timestamp']:
+            print(f"[WARN] No se encontraron datos reales para {timestamp}.")
+        return [
+            {"timestamp": timestamp, "high_real": float(high), "low_real": float(low)}
+            for timestamp, high, low in zip(encontrados['timestamp'], encontrados['high_real'], encontrados['low_real'])
+        ]
 
     def sincronizar_y_comparar(self, predicciones, datos_reales):
         """
@@ -157,7 +258,9 @@ if __name__ == "__main__":
     # Archivo de predicciones, archivo de salida y par de criptomonedas
     archivo_predicciones = "../datos/predicciones.json"
     archivo_salida = "../datos/resultados_comparacion.csv"
+    archivo_historial = "../datos/historial_ETH_BTC.csv"
     par = "ETH/BTC"
 
-    comparador = ComparadorPredicciones(archivo_predicciones=archivo_predicciones, archivo_salida=archivo_salida, par=par)
+    comparador = ComparadorPredicciones(archivo_predicciones=archivo_predicciones, archivo_salida=archivo_salida, par=par,
+                                        archivo_historial=archivo_historial)
     comparador.ejecutar()
@@ -0,0 +1,239 @@
+import os
+import numpy as np
+import pandas as pd
+
+class AlmacenVelas:
+    COLUMNAS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+    TIPOS = {
+        'timestamp': np.dtype('<i8'),
+        'open': np.dtype('<f8'),
+        'high': np.dtype('<f8'),
+        'low': np.dtype('<f8'),
+        'close': np.dtype('<f8'),
+        'volume': np.dtype('<f8'),
+    }
+
+    def __init__(self, directorio, par, timeframe, filas_por_segmento=1_000_000):
+        """
+        Inicializa el almacén columnar de velas para un par y timeframe.
+
+        Cada segmento es una carpeta con un archivo binario por columna
+        (timestamp en int64 epoch-ms y OHLCV en float64). Los segmentos solo
+        crecen por el final y se leen mediante memoria mapeada.
+
+        :param directorio: Carpeta raíz del almacén (e.g., "../datos/velas").
+        :param par: Par de criptomonedas (e.g., "ETH/BTC").
+        :param timeframe: Intervalo de tiempo de las velas (e.g., "1h").
+        :param filas_por_segmento: Número máximo de velas por segmento.
+        """
+        self.par = par
+        self.timeframe = timeframe
+        self.filas_por_segmento = filas_por_segmento
+        self.ruta = os.path.join(directorio, f"{par.replace('/', '_')}_{timeframe}")
+        os.makedirs(self.ruta, exist_ok=True)
+        self._mapas = {}
+
+    def _segmentos(self):
+        """
+        Lista las carpetas de segmentos ordenadas cronológicamente.
+        """
+        return sorted(
+            os.path.join(self.ruta, nombre)
+            for nombre in os.listdir(self.ruta)
+            if nombre.startswith('seg_')
+        )
+
+    def _archivo(self, segmento, columna):
+        return os.path.join(segmento, f"{columna}.bin")
+
+    def _filas_segmento(self, segmento):
+        """
+        Número de velas completas de un segmento. La columna timestamp se
+        escribe la última, por lo que su tamaño marca las filas válidas.
+        """
+        archivo = self._archivo(segmento, 'timestamp')
+        if not os.path.exists(archivo):
+            return 0
+        return os.path.getsize(archivo) // self.TIPOS['timestamp'].itemsize
+
+    def _mapear(self, segmento):
+        """
+        Devuelve las columnas de un segmento como arrays en memoria mapeada.
+        Los mapas se reutilizan mientras el segmento no cambie de tamaño.
+        """
+        filas = self._filas_segmento(segmento)
+        cache = self._mapas.get(segmento)
+        if cache and cache[0] == filas:
+            return cache[1]
+
+        columnas = {}
+        for columna in self.COLUMNAS:
+            if filas == 0:
+                columnas[columna] = np.empty(0, dtype=self.TIPOS[columna])
+            else:
+                columnas[columna] = np.memmap(self._archivo(segmento, columna), dtype=self.TIPOS[columna],
+                                              mode='r', shape=(filas,))
+        self._mapas[segmento] = (filas, columnas)
+        return columnas
+
+    def _reparar_segmento(self, segmento):
+        """
+        Recorta las columnas que quedaron más largas que timestamp tras una
+        escritura interrumpida.
+        """
+        filas = self._filas_segmento(segmento)
+        for columna in self.COLUMNAS:
+            archivo = self._archivo(segmento, columna)
+            tamano = filas * self.TIPOS[columna].itemsize
+            if os.path.exists(archivo) and os.path.getsize(archivo) > tamano:
+                with open(archivo, 'r+b') as f:
+                    f.truncate(tamano)
+
+    @staticmethod
+    def a_milisegundos(momento):
+        """
+        Convierte un momento (ms, datetime, Timestamp o texto ISO) a epoch en milisegundos.
+        """
+        if momento is None:
+            return None
+        if isinstance(momento, (int, np.integer)):
+            return int(momento)
+        return int(pd.Timestamp(momento).value // 1_000_000)
+
+    def num_filas(self):
+        """
+        Número total de velas guardadas.
+        """
+        return sum(self._filas_segmento(segmento) for segmento in self._segmentos())
+
+    def ultimo_timestamp(self):
+        """
+        Timestamp (epoch-ms) de la última vela guardada o None si el almacén está vacío.
+        """
+        for segmento in reversed(self._segmentos()):
+            columnas = self._mapear(segmento)
+            if len(columnas['timestamp']):
+                return int(columnas['timestamp'][-1])
+        return None
+
+    def anexar(self, velas):
+        """
+        Agrega velas al final del almacén. Las velas anteriores a la última guardada
+        se descartan y, si la primera coincide con la última guardada (vela aún
+        abierta), se sobrescribe en su lugar.
+
+        :param velas: Lista o array de velas [timestamp_ms, open, high, low, close, volume].
+        :return: Número de velas escritas.
+        """
+        if len(velas) == 0:
+            return 0
+
+        datos = np.asarray(velas, dtype=np.float64).reshape(-1, len(self.COLUMNAS))
+        timestamps = datos[:, 0].astype(np.int64)
+        orden = np.argsort(timestamps, kind='stable')
+        datos, timestamps = datos[orden], timestamps[orden]
+
+        ultimo = self.ultimo_timestamp()
+        escritas = 0
+        if ultimo is not None:
+            if timestamps[0] == ultimo:
+                self._sobrescribir_ultima(timestamps[0], datos[0])
+                escritas += 1
+            nuevas = timestamps > ultimo
+            datos, timestamps = datos[nuevas], timestamps[nuevas]
+
+        segmentos = self._segmentos()
+        segmento = segmentos[-1] if segmentos else None
+        inicio = 0
+        while inicio < len(timestamps):
+            if segmento is None or self._filas_segmento(segmento) >= self.filas_por_segmento:
+                segmento = os.path.join(self.ruta, f"seg_{len(self._segmentos()):06d}")
+                os.makedirs(segmento, exist_ok=True)
+            self._reparar_segmento(segmento)
+            hueco = self.filas_por_segmento - self._filas_segmento(segmento)
+            fin = min(len(timestamps), inicio + hueco)
+
+            for indice, columna in enumerate(self.COLUMNAS[1:], start=1):
+                with open(self._archivo(segmento, columna), 'ab') as f:
+                    f.write(datos[inicio:fin, indice].astype(self.TIPOS[columna]).tobytes())
+            with open(self._archivo(segmento, 'timestamp'), 'ab') as f:
+                f.write(timestamps[inicio:fin].tobytes())
+
+            escritas += fin - inicio
+            inicio = fin
+
+        return escritas
+
+    def _sobrescribir_ultima(self, timestamp, fila):
+        """
+        Reescribe en su lugar la última vela guardada (vela todavía abierta).
+        """
+        segmento = next(seg for seg in reversed(self._segmentos()) if self._filas_segmento(seg))
+        filas = self._filas_segmento(segmento)
+        for indice, columna in enumerate(self.COLUMNAS[1:], start=1):
+            tipo = self.TIPOS[columna]
+            with open(self._archivo(segmento, columna), 'r+b') as f:
+                f.seek((filas - 1) * tipo.itemsize)
+                f.write(np.asarray([fila[indice]], dtype=tipo).tobytes())
+        self._mapas.pop(segmento, None)
+
+    def leer(self, desde=None, hasta=None):
+        """
+        Lee las velas dentro de un rango de tiempo usando búsqueda binaria
+        sobre la columna timestamp.
+
+        :param desde: Inicio del rango (incluido); ms, datetime o texto ISO.
+        :param hasta: Fin del rango (excluido); ms, datetime o texto ISO.
+        :return: Diccionario columna -> array de numpy.
+        """
+        desde = self.a_milisegundos(desde)
+        hasta = self.a_milisegundos(hasta)
+
+        partes = []
+        for segmento in self._segmentos():
+            columnas = self._mapear(segmento)
+            timestamps = columnas['timestamp']
+            if len(timestamps) == 0:
+                continue
+            if desde is not None and timestamps[-1] < desde:
+                continue
+            if hasta is not None and timestamps[0] >= hasta:
+                break
+            inicio = 0 if desde is None else int(np.searchsorted(timestamps, desde, side='left'))
+            fin = len(timestamps) if hasta is None else int(np.searchsorted(timestamps, hasta, side='left'))
+            if fin > inicio:
+                partes.append({columna: columnas[columna][inicio:fin] for columna in self.COLUMNAS})
+
+        if not partes:
+            return {columna: np.empty(0, dtype=self.TIPOS[columna]) for columna in self.COLUMNAS}
+        if len(partes) == 1:
+            return partes[0]
+        return {columna: np.concatenate([parte[columna] for parte in partes]) for columna in self.COLUMNAS}
+
+    def a_dataframe(self, desde=None, hasta=None):
+        """
+        Devuelve las velas como DataFrame con el mismo formato que los CSV de historial.
+
+        :param desde: Inicio del rango (incluido).
+        :param hasta: Fin del rango (excluido).
+        :return: DataFrame con columnas timestamp, open, high, low, close, volume.
+        """
+        columnas = self.leer(desde, hasta)
+        df = pd.DataFrame({columna: np.asarray(columnas[columna]) for columna in self.COLUMNAS[1:]})
+        df.insert(0, 'timestamp', pd.to_datetime(np.asarray(columnas['timestamp']), unit='ms'))
+        return df
+
+    def importar_csv(self, archivo_csv):
+        """
+        Importa un CSV de historial existente (e.g., historial_ETH_BTC.csv) al almacén.
+
+        :param archivo_csv: Archivo CSV con columnas timestamp, open, high, low, close, volume.
+        :return: Número de velas importadas.
+        """
+        print(f"Importando historial desde {archivo_csv}...")
+        df = pd.read_csv(archivo_csv, parse_dates=['timestamp'])
+        timestamps = df['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        velas = np.column_stack([timestamps] + [df[columna].to_numpy(dtype=np.float64) for columna in self.COLUMNAS[1:]])
+        escritas = self.anexar(velas)
+        print(f"Velas importadas: {escritas}.")
+        return escritas
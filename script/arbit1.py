@@ -1,30 +1,50 @@
 import asyncio
+import ccxt
 import ccxt.pro as ccxtpro
 import json
 import os
+import sys
 import csv
 import time
 import logging
+import numpy as np
 from datetime import datetime
 from rich.console import Console
 from rich.table import Table
+from libro_operaciones import LibroOperaciones
+from buffer_velas import BufferVelas
+from libro_ordenes_l2 import LibroL2
+from cache_saldo import CacheSaldo
+from metricas import ClienteMedido, METRICAS, TICK_A_DECISION, ANTIGUEDAD_PRECIO, DECISION_A_CONFIRMACION, ORDENES_RECHAZADAS, ORDENES_EJECUTADAS
 
 # Asumimos que ya tienes definida la clase OrdenesBot, la cual reutilizaremos.
 class OrdenesBot:
-    def __init__(self, par="ETH/BTC", timeframe="1h", operaciones_archivo="../datos/operaciones.csv", comision=0.001, predicciones_archivo="../datos/predicciones.json"):
+    def __init__(self, par="ETH/BTC", timeframe="1h", operaciones_archivo="../datos/operaciones.csv", comision=0.001, predicciones_archivo="../datos/predicciones.json", exchange=None, libro=None, libro_l2=None, headless=False, cache_saldo=None):
         logging.basicConfig(level=logging.INFO, 
                             format='%(asctime)s - %(levelname)s - %(message)s')
         self.logger = logging.getLogger(__name__)
         self.api_key = os.getenv('BINANCE_API_KEY')
         self.api_secret = os.getenv('BINANCE_API_SECRET')
         self.operaciones_archivo = operaciones_archivo
+        self.libro = libro
+        self.libro_l2 = libro_l2
+        self.cache_saldo = cache_saldo  # CacheSaldo opcional: saldo en memoria mientras el stream esté vigente
         self.comision = comision
         self.predicciones_archivo = predicciones_archivo
-        self.console = Console()
+        self.momento_precio = None  # perf_counter en que se recibió el último precio
+        # En modo headless no se renderiza nada con rich: los mensajes van al registro JSON asíncrono
+        self.headless = headless
+        if headless:
+            from registro_async import ConsolaRegistro, configurar_registro
+            self.console = ConsolaRegistro(configurar_registro().getChild("arbit1"))
+        else:
+            self.console = Console()
         self.console.log(f"Inicializando bot para colocar órdenes en par: {par} y timeframe: {timeframe}")
-        if not self.api_key or not self.api_secret:
-            self.cargar_credenciales_desde_archivo()
-        self.exchange = self.inicializar_exchange()
+        if exchange is None:
+            if not self.api_key or not self.api_secret:
+                self.cargar_credenciales_desde_archivo()
+            exchange = self.inicializar_exchange()
+        self.exchange = exchange
         self.par = par
         self.timeframe = timeframe
 
@@ -43,12 +63,12 @@ class OrdenesBot:
     def inicializar_exchange(self):
         try:
             self.console.log("Inicializando conexión con Binance...")
-            exchange = ccxt.binance({
+            exchange = ClienteMedido(ccxt.binance({
                 'apiKey': self.api_key,
                 'secret': self.api_secret,
                 'enableRateLimit': True,
                 'options': {'defaultType': 'spot'}
-            })
+            }))
             exchange.load_markets()
             self.console.log("Conexión con Binance establecida exitosamente.")
             return exchange
@@ -57,8 +77,12 @@ class OrdenesBot:
             raise
 
     def obtener_saldo(self):
+        if self.cache_saldo is not None and self.cache_saldo.vigente:
+            return self.cache_saldo.libres(("ETH", "BTC"))
         try:
             balance = self.exchange.fetch_balance()
+            if self.cache_saldo is not None:
+                self.cache_saldo.actualizar(balance, origen="rest", completo=True)
             saldo_eth = balance['free'].get('ETH', 0)
             saldo_btc = balance['free'].get('BTC', 0)
             return {"ETH": saldo_eth, "BTC": saldo_btc}
@@ -68,11 +92,42 @@ class OrdenesBot:
 
     def obtener_precio_actual(self):
         try:
-            return self.exchange.fetch_ticker(self.par)['last']
+            ticker = self.exchange.fetch_ticker(self.par)
+            self.registrar_precio(ticker)
+            return ticker['last']
         except Exception as e:
             self.console.log(f"[ERROR] Error al obtener el precio actual: {e}")
             return None
 
+    def registrar_precio(self, ticker):
+        """
+        Anota cuándo se recibió el precio y su antigüedad según el timestamp del exchange.
+
+        :return: perf_counter en que se recibió el precio.
+        """
+        self.momento_precio = time.perf_counter()
+        if ticker.get('timestamp'):
+            antiguedad = (self.exchange.milliseconds() - ticker['timestamp']) / 1000
+            ANTIGUEDAD_PRECIO.observar(max(0.0, antiguedad), par=self.par)
+        return self.momento_precio
+
+    def estimar_compra(self, importe, precio_actual):
+        """
+        Estima la cantidad de moneda base que se obtiene comprando con un importe de moneda cotizada.
+
+        :param importe: Importe en moneda cotizada.
+        :param precio_actual: Último precio, usado si no hay libro L2 o no tiene profundidad suficiente.
+        :return: Cantidad estimada de moneda base.
+        """
+        if self.libro_l2 is not None:
+            ejecucion = self.libro_l2.cantidad_por_importe(importe)
+            if ejecucion is not None:
+                self.console.log(f"[INFO] Precio medio estimado de compra: {ejecucion['precio_medio']:.8f} "
+                                 f"(deslizamiento: {ejecucion['deslizamiento'] * 100:.4f}%).")
+                return ejecucion['cantidad']
+            self.console.log("[WARN] El libro de órdenes no tiene profundidad suficiente; se usa el último precio.")
+        return importe / precio_actual
+
     def cargar_predicciones(self):
         try:
             with open(self.predicciones_archivo, "r") as f:
@@ -88,6 +143,8 @@ class OrdenesBot:
             return None
 
     def obtener_ultima_operacion(self):
+        if self.libro is not None:
+            return self.libro.ultima_operacion()
         try:
             if not os.path.exists(self.operaciones_archivo):
                 self.console.log("[INFO] No se encontró el archivo de operaciones. Comenzando desde cero.")
@@ -104,6 +161,10 @@ class OrdenesBot:
             return None
 
     def mostrar_dashboard(self, saldo, precio_actual, predicciones):
+        if self.headless:
+            self.console.log("[DEBUG] Estado actual del bot", saldo=saldo, precio_actual=precio_actual,
+                             predicciones=predicciones)
+            return
         table = Table(title="Estado Actual del Bot")
         table.add_column("Elemento", justify="left", style="cyan", no_wrap=True)
         table.add_column("Valor", justify="right", style="magenta")
@@ -117,18 +178,13 @@ class OrdenesBot:
             table.add_row("Predicciones", "No disponibles")
         self.console.print(table)
 
-    def colocar_orden(self):
-        saldo = self.obtener_saldo()
-        precio_actual = self.obtener_precio_actual()
-        predicciones = self.cargar_predicciones()
-        tiempo_transcurrido = self.tiempo_desde_ultima_operacion()
-        self.mostrar_dashboard(saldo, precio_actual, predicciones)
-        if precio_actual is None:
-            self.console.log("[WARN] No se pudo obtener el precio actual. Orden no colocada.")
-            return
-        if not predicciones:
-            self.console.log("[WARN] No se encontraron predicciones. Se continuará con lógica estándar.")
-        ultima_operacion = self.obtener_ultima_operacion()
+    def decidir(self, saldo, precio_actual, predicciones, ultima_operacion, tiempo_transcurrido):
+        """
+        Decide la orden a colocar con los datos ya obtenidos, sin llamadas al exchange;
+        la usan tanto el camino síncrono (colocar_orden) como el asíncrono (colocar_orden_async).
+
+        :return: Tupla (tipo, cantidad) de la orden de mercado o None si no se opera.
+        """
         if ultima_operacion and ultima_operacion["tipo"] == "sell" and saldo["BTC"] > 0:
             precio_anterior = float(ultima_operacion["precio_promedio"])
             precio_min_predicho = predicciones.get("low_pred", precio_anterior) if predicciones else precio_anterior
@@ -136,14 +192,13 @@ class OrdenesBot:
             if tiempo_transcurrido and tiempo_transcurrido > 60:
                 self.console.log(f"Ha pasado más de 1 hora desde la última operación ({tiempo_transcurrido:.2f} minutos). Evaluando proximidad al precio predicho.")
                 if abs(precio_actual - precio_min_predicho) / precio_min_predicho < 0.1:
-                    cantidad = saldo["BTC"] / precio_actual
+                    cantidad = self.estimar_compra(saldo["BTC"], precio_actual)
                     self.console.log("Decisión: Comprar ETH con BTC debido a proximidad al precio predicho.")
-                    self.colocar_orden_mercado("buy", cantidad)
-                    return
+                    return "buy", cantidad
             if precio_actual < max(precio_anterior, precio_min_predicho):
-                cantidad = saldo["BTC"] / precio_actual
+                cantidad = self.estimar_compra(saldo["BTC"], precio_actual)
                 self.console.log("Decisión: Comprar ETH con BTC")
-                self.colocar_orden_mercado("buy", cantidad)
+                return "buy", cantidad
             else:
                 self.console.log(f"No se realiza compra: Precio actual ({precio_actual}) >= Máximo ({max(precio_anterior, precio_min_predicho)}).")
         elif ultima_operacion and ultima_operacion["tipo"] == "buy" and saldo["ETH"] > 0:
@@ -155,34 +210,66 @@ class OrdenesBot:
                 if abs(precio_actual - precio_max_predicho) / precio_max_predicho < 0.1:
                     cantidad = saldo["ETH"]
                     self.console.log("Decisión: Vender ETH por BTC debido a proximidad al precio predicho.")
-                    self.colocar_orden_mercado("sell", cantidad)
-                    return
+                    return "sell", cantidad
             if precio_actual > precio_anterior:
                 cantidad = saldo["ETH"]
                 self.console.log("Decisión: Vender ETH por BTC")
-                self.colocar_orden_mercado("sell", cantidad)
+                return "sell", cantidad
             else:
                 self.console.log(f"No se realiza venta: Precio actual ({precio_actual}) <= Último precio ({precio_anterior}).")
         else:
             self.console.log("[WARN] No se pudo determinar la acción a realizar o no hay saldo suficiente.")
+        return None
+
+    def colocar_orden(self):
+        saldo = self.obtener_saldo()
+        precio_actual = self.obtener_precio_actual()
+        predicciones = self.cargar_predicciones()
+        tiempo_transcurrido = self.tiempo_desde_ultima_operacion()
+        self.mostrar_dashboard(saldo, precio_actual, predicciones)
+        if precio_actual is None:
+            self.console.log("[WARN] No se pudo obtener el precio actual. Orden no colocada.")
+            return
+        if not predicciones:
+            self.console.log("[WARN] No se encontraron predicciones. Se continuará con lógica estándar.")
+        ultima_operacion = self.obtener_ultima_operacion()
+        decision = self.decidir(saldo, precio_actual, predicciones, ultima_operacion, tiempo_transcurrido)
+        if decision is not None:
+            self.colocar_orden_mercado(*decision)
 
     def colocar_orden_mercado(self, tipo, cantidad):
+        if self.momento_precio is not None:
+            TICK_A_DECISION.observar(time.perf_counter() - self.momento_precio, par=self.par)
         try:
             self.console.log(f"Intentando colocar una orden de tipo {tipo} para {cantidad} en {self.par}...")
-            orden = self.exchange.create_order(
-                symbol=self.par,
-                type="market",
-                side=tipo,
-                amount=cantidad
-            )
-            if orden:
-                self.console.log(f"Orden de tipo {tipo} ejecutada exitosamente.")
-                self.mostrar_detalle_orden(orden)
-                self.registrar_operacion(orden, tipo)
-            else:
-                self.console.log("[ERROR] La orden de tipo {tipo} no se ejecutó correctamente.")
+            if self.cache_saldo is not None:
+                # El saldo en caché no vale hasta que el stream refleje la orden
+                self.cache_saldo.invalidar()
+            with DECISION_A_CONFIRMACION.tramo(par=self.par, lado=tipo):
+                orden = self.exchange.create_order(
+                    symbol=self.par,
+                    type="market",
+                    side=tipo,
+                    amount=cantidad
+                )
         except Exception as e:
+            ORDENES_RECHAZADAS.incrementar(par=self.par, motivo=type(e).__name__)
             self.console.log(f"[ERROR] Ocurrió un error al colocar la orden de tipo {tipo}: {e}")
+            return
+        self.procesar_orden(orden, tipo)
+
+    def procesar_orden(self, orden, tipo):
+        """
+        Registra el resultado de una orden enviada (métricas, detalle y libro de operaciones).
+        """
+        if orden:
+            ORDENES_EJECUTADAS.incrementar(par=self.par, lado=tipo)
+            self.console.log(f"Orden de tipo {tipo} ejecutada exitosamente.")
+            self.mostrar_detalle_orden(orden)
+            self.registrar_operacion(orden, tipo)
+        else:
+            ORDENES_RECHAZADAS.incrementar(par=self.par, motivo="sin_respuesta")
+            self.console.log(f"[ERROR] La orden de tipo {tipo} no se ejecutó correctamente.")
 
     def registrar_operacion(self, orden, tipo):
         detalles = {
@@ -194,6 +281,21 @@ class OrdenesBot:
             "precio_promedio": orden.get("average"),
             "estado": orden.get("status")
         }
+        if self.libro is not None:
+            base, cotizada = self.par.split("/")
+            cantidad = orden.get("amount") or 0
+            precio = orden.get("average") or 0
+            if tipo == "buy":
+                conversion = (cotizada, cantidad * precio, base, cantidad)
+            else:
+                conversion = (base, cantidad, cotizada, cantidad * precio)
+            detalles.update(zip(("moneda_inicial", "cantidad_inicial", "moneda_final", "cantidad_final"), conversion))
+            try:
+                self.libro.registrar(detalles)
+                self.console.log(f"Operación registrada en {self.libro.archivo_db}.")
+            except Exception as e:
+                self.console.log(f"[ERROR] Error al registrar la operación: {e}")
+            return
         try:
             with open(self.operaciones_archivo, mode="a") as f:
                 writer = csv.DictWriter(f, fieldnames=detalles.keys())
@@ -205,6 +307,11 @@ class OrdenesBot:
             self.console.log(f"[ERROR] Error al registrar la operación: {e}")
 
     def mostrar_detalle_orden(self, orden):
+        if self.headless:
+            self.console.log("[INFO] Orden ejecutada", orden_id=orden.get('id'), par=orden.get('symbol'),
+                             tipo=orden.get('type'), lado=orden.get('side'), cantidad=orden.get('amount'),
+                             precio_promedio=orden.get('average'), estado=orden.get('status'))
+            return
         self.console.log("[DETALLE DE LA ORDEN]")
         self.console.log(f"  - ID de la Orden: {orden.get('id')}")
         self.console.log(f"  - Par Operado: {orden.get('symbol')}")
@@ -225,41 +332,255 @@ class OrdenesBot:
 
 # Ahora, creamos una subclase que extienda OrdenesBot para incorporar el monitoreo vía WebSocket usando ccxt.pro
 class WebSocketOrdenesBot(OrdenesBot):
-    async def run_websocket(self):
-        # Reconfiguramos la conexión para usar ccxt.pro
+    def __init__(self, *args, capacidad_buffer=2000, almacen=None, profundidad_libro=100, **kwargs):
+        """
+        Extiende OrdenesBot con streams de ccxt.pro: ticker para las decisiones,
+        velas (watch_ohlcv) para mantener un buffer circular en memoria del que leen
+        directamente el modelo y la estrategia, libro de órdenes (snapshot más stream de
+        diferencias) para dimensionar las órdenes según la profundidad disponible y saldo
+        (watch_balance) para decidir sin llamar a fetch_balance en cada tick.
+
+        :param capacidad_buffer: Número de velas que se conservan en memoria.
+        :param almacen: AlmacenVelas opcional donde se persisten las velas cerradas.
+        :param profundidad_libro: Niveles por lado del libro de órdenes local.
+        """
+        super().__init__(*args, **kwargs)
+        if self.libro_l2 is None:
+            self.libro_l2 = LibroL2(self.par, profundidad=profundidad_libro)
+        self.almacen = almacen
+        self.buffer = BufferVelas(capacidad_buffer, al_cerrar_vela=self.al_cerrar_vela)
+        self.predicciones_en_memoria = None
+        self.modelo = None
+        self._conectado = False
+        self._tarea_predicciones = None
+        self._tarea_decision = None
+        if self.cache_saldo is None:
+            self.cache_saldo = CacheSaldo()
+
+    def inicializar_exchange(self):
+        """
+        Crea el cliente asíncrono de ccxt.pro, que atiende tanto los streams como las
+        llamadas REST (saldo y órdenes); sus mercados se cargan en conectar_websocket.
+        """
         self.console.log("Inicializando conexión WebSocket con ccxt.pro...")
-        self.exchange = ccxtpro.binance({
+        return ClienteMedido(ccxtpro.binance({
             'apiKey': self.api_key,
             'secret': self.api_secret,
             'enableRateLimit': True,
             'options': {'defaultType': 'spot'}
-        })
+        }))
+
+    async def conectar_websocket(self):
+        if self._conectado:
+            return
+        self._conectado = True
         await self.exchange.load_markets()
         self.console.log("Conexión WebSocket establecida exitosamente.")
+
+    async def sembrar_buffer(self):
+        """
+        Llena el buffer con las velas más recientes del almacén o, si no hay almacén, de la API REST.
+        """
+        if self.almacen is not None and self.almacen.ultimo_timestamp() is not None:
+            columnas = self.almacen.leer()
+            velas = np.column_stack([columnas[columna][-self.buffer.capacidad:] for columna in BufferVelas.COLUMNAS])
+        else:
+            velas = await self.exchange.fetch_ohlcv(self.par, self.timeframe, limit=min(self.buffer.capacidad, 1000))
+        self.buffer.cargar(velas)
+        self.console.log(f"Buffer de velas inicializado con {len(self.buffer)} velas.")
+
+    async def run_velas(self):
+        """
+        Mantiene el buffer de velas al día con watch_ohlcv.
+        """
+        await self.conectar_websocket()
+        await self.sembrar_buffer()
+        while True:
+            try:
+                velas = await self.exchange.watch_ohlcv(self.par, self.timeframe)
+                for vela in velas:
+                    self.buffer.actualizar(vela)
+            except Exception as e:
+                self.console.log(f"[ERROR] Error en el stream de velas: {e}")
+                await asyncio.sleep(5)
+
+    async def run_saldo(self):
+        """
+        Mantiene la caché de saldo al día con watch_balance (stream de datos de usuario)
+        y la concilia periódicamente con fetch_balance.
+        """
+        await self.conectar_websocket()
+        await self.cache_saldo.run(self.exchange)
+
+    async def run_libro_ordenes(self):
+        """
+        Mantiene el libro de órdenes local al día con el snapshot REST más el stream de diferencias.
+        """
+        await self.conectar_websocket()
+        while True:
+            try:
+                await self.libro_l2.run(self.exchange, self.libro_l2.profundidad)
+            except Exception as e:
+                self.console.log(f"[ERROR] Error en el stream del libro de órdenes: {e}")
+                await asyncio.sleep(5)
+
+    def al_cerrar_vela(self, vela):
+        """
+        Se llama desde el buffer cuando una vela se cierra: la persiste y recalcula las predicciones.
+        """
+        if self.almacen is not None:
+            self.almacen.anexar([vela])
+        if self._tarea_predicciones is None or self._tarea_predicciones.done():
+            self._tarea_predicciones = asyncio.get_running_loop().create_task(self.actualizar_predicciones())
+
+    async def actualizar_predicciones(self):
+        """
+        Actualiza el modelo incremental con las velas cerradas del buffer fuera del bucle
+        de eventos y guarda la predicción más próxima en memoria.
+        """
+        from reg_logistica import ModeloPrediccion
+        if self.modelo is None:
+            self.modelo = ModeloPrediccion(archivo_csv=None, archivo_salida=self.predicciones_archivo,
+                                           fuente=self.buffer, modo="incremental")
+        modelo = self.modelo
+
+        def calcular():
+            datos = modelo.cargar_datos()
+            modelo.entrenar_modelo(datos)
+            predicciones = modelo.predecir(datos)
+            modelo.guardar_predicciones(predicciones)
+            return predicciones
+
+        try:
+            predicciones = await asyncio.to_thread(calcular)
+            self.predicciones_en_memoria = predicciones[0]
+        except Exception as e:
+            self.console.log(f"[ERROR] Error al actualizar predicciones desde el buffer: {e}")
+
+    def cargar_predicciones(self):
+        if self.predicciones_en_memoria is not None:
+            return self.predicciones_en_memoria
+        return super().cargar_predicciones()
+
+    def _solo_async(self, metodo, alternativa):
+        raise RuntimeError(f"WebSocketOrdenesBot usa un cliente asíncrono de ccxt.pro: {metodo}() no está "
+                           f"disponible, usa {alternativa}().")
+
+    # Los métodos síncronos heredados recibirían corrutinas del cliente asíncrono
+    def obtener_saldo(self):
+        self._solo_async("obtener_saldo", "obtener_saldo_async")
+
+    def obtener_precio_actual(self):
+        self._solo_async("obtener_precio_actual", "self.exchange.watch_ticker")
+
+    def colocar_orden(self):
+        self._solo_async("colocar_orden", "colocar_orden_async")
+
+    def colocar_orden_mercado(self, tipo, cantidad):
+        self._solo_async("colocar_orden_mercado", "colocar_orden_mercado_async")
+
+    async def obtener_saldo_async(self):
+        if self.cache_saldo.vigente:
+            return self.cache_saldo.libres(("ETH", "BTC"))
+        try:
+            balance = await self.exchange.fetch_balance()
+            self.cache_saldo.actualizar(balance, origen="rest", completo=True)
+            return {"ETH": balance['free'].get('ETH', 0), "BTC": balance['free'].get('BTC', 0)}
+        except Exception as e:
+            self.console.log(f"[ERROR] Error al obtener el saldo: {e}")
+            return {"ETH": 0, "BTC": 0}
+
+    async def colocar_orden_async(self, ticker):
+        """
+        Versión asíncrona de colocar_orden: usa el precio del tick recibido en lugar de
+        pedir otro ticker y espera al saldo y a la orden sin bloquear el bucle de eventos.
+
+        :param ticker: Ticker recibido de watch_ticker.
+        """
+        momento_precio = self.registrar_precio(ticker)
+        precio_actual = ticker.get('last')
+        if precio_actual is None:
+            self.console.log("[WARN] El tick no trae precio. Orden no colocada.")
+            return
+        saldo = await self.obtener_saldo_async()
+        predicciones = self.cargar_predicciones()
+        tiempo_transcurrido = self.tiempo_desde_ultima_operacion()
+        self.mostrar_dashboard(saldo, precio_actual, predicciones)
+        if not predicciones:
+            self.console.log("[WARN] No se encontraron predicciones. Se continuará con lógica estándar.")
+        decision = self.decidir(saldo, precio_actual, predicciones, self.obtener_ultima_operacion(), tiempo_transcurrido)
+        if decision is not None:
+            await self.colocar_orden_mercado_async(*decision, momento_precio=momento_precio)
+
+    async def colocar_orden_mercado_async(self, tipo, cantidad, momento_precio=None):
+        if momento_precio is not None:
+            TICK_A_DECISION.observar(time.perf_counter() - momento_precio, par=self.par)
+        try:
+            self.console.log(f"Intentando colocar una orden de tipo {tipo} para {cantidad} en {self.par}...")
+            if self.cache_saldo is not None:
+                # El saldo en caché no vale hasta que el stream refleje la orden
+                self.cache_saldo.invalidar()
+            with DECISION_A_CONFIRMACION.tramo(par=self.par, lado=tipo):
+                orden = await self.exchange.create_order(symbol=self.par, type="market", side=tipo, amount=cantidad)
+        except Exception as e:
+            ORDENES_RECHAZADAS.incrementar(par=self.par, motivo=type(e).__name__)
+            self.console.log(f"[ERROR] Ocurrió un error al colocar la orden de tipo {tipo}: {e}")
+            return
+        # El registro en el libro escribe en disco: fuera del bucle de eventos
+        await asyncio.to_thread(self.procesar_orden, orden, tipo)
+
+    async def _decidir_en_tarea(self, ticker):
+        try:
+            await self.colocar_orden_async(ticker)
+        except Exception as e:
+            self.console.log(f"[ERROR] Error al evaluar la orden: {e}")
+
+    async def run_websocket(self):
+        """
+        Recibe los ticks con watch_ticker y evalúa cada uno en una tarea aparte, de modo
+        que una llamada lenta al exchange no retrasa la recepción de los ticks. Mientras
+        hay una decisión en curso los ticks nuevos no lanzan otra, para no enviar dos
+        órdenes con el mismo saldo.
+        """
+        await self.conectar_websocket()
         while True:
             try:
-                # Usamos watch_ticker para obtener actualizaciones en tiempo real
                 ticker = await self.exchange.watch_ticker(self.par)
-                current_price = ticker['last']
-                self.console.log(f"Precio actual de {self.par}: {current_price:.8f}")
-                
-                # Aquí puedes integrar la lógica de tu estrategia para decidir cuándo operar.
-                # Por ejemplo, podrías evaluar condiciones y, si se cumplen, llamar a self.colocar_orden()
-                # En este ejemplo se llama a colocar_orden() de forma condicional (ejemplo simplificado):
-                if current_price is not None:
-                    # Esta es una condición de ejemplo; en la práctica integrarías tu lógica basada en predicciones
-                    if current_price % 2 < 1:  # Condición arbitraria para disparar la orden
-                        self.console.log("Condición de ejemplo cumplida, evaluando orden...")
-                        self.colocar_orden()
-                
-                await asyncio.sleep(1)
+                if ticker.get('last') is not None:
+                    self.console.log(f"Precio actual de {self.par}: {ticker['last']:.8f}")
+                if self._tarea_decision is None or self._tarea_decision.done():
+                    self._tarea_decision = asyncio.create_task(self._decidir_en_tarea(ticker))
             except Exception as e:
                 self.console.log(f"[ERROR] Error en el monitoreo WebSocket: {e}")
                 await asyncio.sleep(5)
 
+async def exportar_metricas(archivo, intervalo=15):
+    """
+    Escribe las métricas en el archivo del textfile collector cada intervalo segundos.
+    """
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            await asyncio.to_thread(METRICAS.escribir_textfile, archivo)
+        except OSError as e:
+            print(f"[WARN] No se pudieron escribir las métricas en {archivo}: {e}")
+
 async def main():
-    bot = WebSocketOrdenesBot(par="ETH/BTC", timeframe="1h", operaciones_archivo="../datos/operaciones.csv")
-    await bot.run_websocket()
+    # Métricas en formato Prometheus: --metricas-puerto 9108 y/o --metricas-textfile ruta.prom
+    if "--metricas-puerto" in sys.argv:
+        METRICAS.iniciar_servidor(int(sys.argv[sys.argv.index("--metricas-puerto") + 1]))
+    tareas = []
+    if "--metricas-textfile" in sys.argv:
+        tareas.append(exportar_metricas(sys.argv[sys.argv.index("--metricas-textfile") + 1]))
+    # Modo headless: sin renderizado rich; el registro se escribe en ../datos/bot.jsonl desde otro hilo
+    if "--headless" in sys.argv:
+        from registro_async import configurar_registro
+        configurar_registro(archivo="../datos/bot.jsonl")
+    libro = LibroOperaciones("../datos/operaciones_ws.db", archivo_csv_inicial="../datos/operaciones.csv")
+    bot = WebSocketOrdenesBot(par="ETH/BTC", timeframe="1h", operaciones_archivo="../datos/operaciones.csv", libro=libro,
+                              headless="--headless" in sys.argv)
+    await bot.conectar_websocket()
+    await asyncio.gather(bot.run_velas(), bot.run_libro_ordenes(), bot.run_saldo(), bot.run_websocket(), *tareas)
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -4,14 +4,18 @@ import json
 import logging
 import pandas as pd
 from datetime import datetime, timedelta
+from metricas import ClienteMedido
 
 class HistorialBinanceBot:
-    def __init__(self, par, timeframe):
+    def __init__(self, par, timeframe, archivo_csv=None, almacen=None, exchange=None):
         """
         Inicializa el bot para obtener el historial del par especificado.
 
         :param par: Par de criptomonedas a analizar, por ejemplo "BTC/ETH".
         :param timeframe: Intervalo de tiempo de las velas (e.g., '1d', '1h').
+        :param archivo_csv: Archivo CSV del historial (por defecto ../datos/historial_<PAR>.csv).
+        :param almacen: AlmacenVelas opcional; si se indica, el historial se guarda en él en lugar del CSV.
+        :param exchange: Cliente ccxt ya inicializado (e.g., SesionBinance.exchange) para reutilizar la conexión.
         """
         logging.basicConfig(level=logging.INFO, 
                             format='%(asctime)s - %(levelname)s - %(message)s')
@@ -23,12 +27,16 @@ class HistorialBinanceBot:
         # Confirmar inicialización de atributos
         print(f"Inicializando bot con par: {par} y timeframe: {timeframe}")
 
-        if not self.api_key or not self.api_secret:
-            self.cargar_credenciales_desde_archivo()
+        if exchange is None:
+            if not self.api_key or not self.api_secret:
+                self.cargar_credenciales_desde_archivo()
+            exchange = self.inicializar_exchange()
 
-        self.exchange = self.inicializar_exchange()
+        self.exchange = exchange
         self.par = par
         self.timeframe = timeframe
+        self.archivo_csv = archivo_csv or f"../datos/historial_{par.replace('/', '_')}.csv"
+        self.almacen = almacen
 
     def cargar_credenciales_desde_archivo(self):
         """
@@ -51,12 +59,12 @@ class HistorialBinanceBot:
         """
         try:
             print("Inicializando conexión con Binance...")
-            exchange = ccxt.binance({
+            exchange = ClienteMedido(ccxt.binance({
                 'apiKey': self.api_key,
                 'secret': self.api_secret,
                 'enableRateLimit': True,
                 'options': {'defaultType': 'spot'}
-            })
+            }))
             exchange.load_markets()
             self.logger.info("Conexión con Binance establecida exitosamente")
             return exchange
@@ -74,6 +82,47 @@ class HistorialBinanceBot:
         print(f"  API Key: {'Configurada' if self.api_key else 'No configurada'}")
         print(f"  API Secret: {'Configurada' if self.api_secret else 'No configurada'}")
 
+    def descargar_velas(self, timestamp_desde: int) -> list:
+        """
+        Descarga velas paginando fetch_ohlcv desde el timestamp indicado.
+
+        :param timestamp_desde: Timestamp de inicio en milisegundos.
+        :return: Lista de velas [timestamp, open, high, low, close, volume].
+        """
+        # Lista para almacenar las velas históricas
+        velas = []
+        timestamp_actual = timestamp_desde
+
+        while True:
+            print(f"Solicitando datos desde timestamp: {timestamp_actual}")
+            # Descargar velas usando fetch_ohlcv
+            data = self.exchange.fetch_ohlcv(self.par, self.timeframe, since=timestamp_actual, limit=1000)
+            if not data:
+                print("No se recibieron más datos. Finalizando descarga.")
+                break
+
+            velas.extend(data)
+            timestamp_actual = data[-1][0] + 1
+
+            # Salir si ya no hay más datos
+            if len(data) < 1000:
+                break
+
+        return velas
+
+    @staticmethod
+    def velas_a_dataframe(velas) -> pd.DataFrame:
+        """
+        Convierte una lista de velas de ccxt en un DataFrame con timestamp legible.
+
+        :param velas: Lista de velas [timestamp, open, high, low, close, volume].
+        :return: DataFrame con las columnas del historial.
+        """
+        columnas = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+        df = pd.DataFrame(velas, columns=columnas)
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        return df
+
     def obtener_historial(self, desde: str) -> pd.DataFrame:
         """
         Obtiene el historial de precios del par especificado.
@@ -85,30 +134,9 @@ class HistorialBinanceBot:
             print(f"Obteniendo historial para el par: {self.par} desde: {desde}")
             # Convertir fecha de inicio a timestamp
             timestamp_desde = int(datetime.fromisoformat(desde).timestamp() * 1000)
-            
-            # Lista para almacenar las velas históricas
-            velas = []
-            timestamp_actual = timestamp_desde
-
-            while True:
-                print(f"Solicitando datos desde timestamp: {timestamp_actual}")
-                # Descargar velas usando fetch_ohlcv
-                data = self.exchange.fetch_ohlcv(self.par, self.timeframe, since=timestamp_actual, limit=1000)
-                if not data:
-                    print("No se recibieron más datos. Finalizando descarga.")
-                    break
-
-                velas.extend(data)
-                timestamp_actual = data[-1][0] + 1
 
-                # Salir si ya no hay más datos
-                if len(data) < 1000:
-                    break
-
-            # Convertir a DataFrame
-            columnas = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
-            df = pd.DataFrame(velas, columns=columnas)
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+            velas = self.descargar_velas(timestamp_desde)
+            df = self.velas_a_dataframe(velas)
 
             self.logger.info(f"Datos históricos descargados: {len(df)} registros.")
             return df
@@ -130,18 +158,118 @@ class HistorialBinanceBot:
         except Exception as e:
             self.logger.error(f"Error guardando el historial: {e}")
 
-    def ejecutar(self):
+    def leer_ultima_vela(self, archivo: str):
+        """
+        Lee la última vela guardada en el CSV sin cargar el archivo completo.
+
+        :param archivo: Nombre del archivo CSV.
+        :return: Tupla (timestamp en ms, offset en bytes donde empieza la última línea) o None.
+        """
+        if not os.path.exists(archivo) or os.path.getsize(archivo) == 0:
+            return None
+
+        with open(archivo, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            fin = f.tell()
+            # Retroceder por bloques hasta encontrar el salto de línea anterior a la última fila
+            bloque = 4096
+            posicion = fin
+            contenido = b''
+            while posicion > 0:
+                paso = min(bloque, posicion)
+                posicion -= paso
+                f.seek(posicion)
+                contenido = f.read(paso) + contenido
+                if contenido.rstrip(b'\n').count(b'\n') >= 1:
+                    break
+
+        cuerpo = contenido.rstrip(b'\n')
+        inicio_linea = cuerpo.rfind(b'\n') + 1
+        ultima_linea = cuerpo[inicio_linea:].decode('utf-8')
+        if not ultima_linea or ultima_linea.startswith('timestamp'):
+            return None
+
+        timestamp = pd.Timestamp(ultima_linea.split(',')[0])
+        return int(timestamp.value // 1_000_000), posicion + inicio_linea
+
+    def sincronizar_historial(self, archivo: str) -> int:
+        """
+        Sincroniza el CSV de historial de forma incremental: descarga solo las velas
+        posteriores a la última guardada, reemplaza la última vela (que puede seguir
+        abierta) y agrega el resto al final del archivo.
+
+        :param archivo: Nombre del archivo CSV.
+        :return: Número de velas escritas.
+        """
+        ultima = self.leer_ultima_vela(archivo)
+        if ultima is None:
+            return -1
+
+        timestamp_ultimo, offset_ultimo = ultima
+        print(f"Sincronizando historial de {self.par} desde timestamp: {timestamp_ultimo}")
+        velas = self.descargar_velas(timestamp_ultimo)
+        if not velas:
+            self.logger.info("No hay velas nuevas para sincronizar.")
+            return 0
+
+        velas = [vela for vela in velas if vela[0] >= timestamp_ultimo]
+        df = self.velas_a_dataframe(velas)
+
+        with open(archivo, 'r+b') as f:
+            if velas and velas[0][0] == timestamp_ultimo:
+                # La última vela guardada se reescribe con su versión más reciente
+                f.truncate(offset_ultimo)
+            f.seek(0, os.SEEK_END)
+            f.write(df.to_csv(header=False, index=False).encode('utf-8'))
+
+        self.logger.info(f"Historial sincronizado en {archivo}: {len(df)} velas escritas.")
+        return len(df)
+
+    def sincronizar_almacen(self) -> int:
+        """
+        Sincroniza el almacén de velas: importa el CSV existente si el almacén está
+        vacío y luego descarga solo las velas posteriores a la última guardada.
+
+        :return: Número de velas escritas en el almacén.
+        """
+        if self.almacen.ultimo_timestamp() is None and os.path.exists(self.archivo_csv):
+            self.almacen.importar_csv(self.archivo_csv)
+
+        timestamp_ultimo = self.almacen.ultimo_timestamp()
+        if timestamp_ultimo is None:
+            # Almacén vacío: descargar el último año completo (según el reloj del exchange,
+            # que en un ExchangeSimulado es el virtual)
+            timestamp_ultimo = self.exchange.milliseconds() - int(timedelta(days=365).total_seconds() * 1000)
+
+        print(f"Sincronizando almacén de {self.par} desde timestamp: {timestamp_ultimo}")
+        velas = self.descargar_velas(timestamp_ultimo)
+        escritas = self.almacen.anexar(velas)
+        self.logger.info(f"Almacén {self.almacen.ruta} sincronizado: {escritas} velas escritas.")
+        return escritas
+
+    def ejecutar(self, incremental=True):
         """
         Ejecuta el bot para obtener el historial del último año.
+
+        :param incremental: Si es True y ya existe el historial, solo descarga las velas nuevas.
         """
         try:
             self.verificar_atributos()
+            archivo = self.archivo_csv
+
+            if self.almacen is not None:
+                self.sincronizar_almacen()
+                return
+
+            if incremental and self.sincronizar_historial(archivo) >= 0:
+                return
+
             # Fecha de inicio hace un año
-            fecha_inicio = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
+            ahora = datetime.fromtimestamp(self.exchange.milliseconds() / 1000)
+            fecha_inicio = (ahora - timedelta(days=365)).strftime('%Y-%m-%d')
             historial = self.obtener_historial(fecha_inicio)
             
             if not historial.empty:
-                archivo = f"../datos/historial_{self.par.replace('/', '_')}.csv"
                 self.guardar_historial(historial, archivo)
             else:
                 self.logger.warning("No se obtuvieron datos históricos.")
@@ -4,15 +4,20 @@ import logging
 import os
 import pandas as pd
 from datetime import datetime
+from metricas import ClienteMedido
 
 class BinanceSaldoBot:
-    def __init__(self, par="ETH/BTC", timeframe="1h", archivo_csv = "../datos/saldo_binance.csv"):
+    def __init__(self, par="ETH/BTC", timeframe="1h", archivo_csv = "../datos/saldo_binance.csv", exchange=None, almacen=None, cache_saldo=None):
         """
         Inicializa el bot para consultar y guardar el saldo de Binance.
 
         :param par: Par de criptomonedas a analizar.
         :param timeframe: Intervalo de tiempo.
         :param archivo_csv: Archivo CSV donde se guardará el saldo.
+        :param exchange: Cliente ccxt ya inicializado (e.g., SesionBinance.exchange) para reutilizar la conexión.
+        :param almacen: AlmacenSaldo opcional; si se indica, solo se guardan los cambios de saldo en él.
+        :param cache_saldo: CacheSaldo opcional; mientras está vigente el saldo se lee de memoria
+                            en lugar de llamar a fetch_balance.
         """
         logging.basicConfig(level=logging.INFO, 
                             format='%(asctime)s - %(levelname)s - %(message)s')
@@ -24,13 +29,17 @@ class BinanceSaldoBot:
         # Confirmar inicialización de atributos
         print(f"Inicializando bot con par: {par} y timeframe: {timeframe}")
 
-        if not self.api_key or not self.api_secret:
-            self.cargar_credenciales_desde_archivo()
+        if exchange is None:
+            if not self.api_key or not self.api_secret:
+                self.cargar_credenciales_desde_archivo()
+            exchange = self.inicializar_exchange()
 
-        self.exchange = self.inicializar_exchange()
+        self.exchange = exchange
         self.par = par
         self.timeframe = timeframe
         self.archivo_csv = archivo_csv
+        self.almacen = almacen
+        self.cache_saldo = cache_saldo
 
     def cargar_credenciales_desde_archivo(self):
         """
@@ -53,12 +62,12 @@ class BinanceSaldoBot:
         """
         try:
             print("Inicializando conexión con Binance...")
-            exchange = ccxt.binance({
+            exchange = ClienteMedido(ccxt.binance({
                 'apiKey': self.api_key,
                 'secret': self.api_secret,
                 'enableRateLimit': True,
                 'options': {'defaultType': 'spot'}
-            })
+            }))
             exchange.load_markets()
             self.logger.info("Conexión con Binance establecida exitosamente")
             return exchange
@@ -72,7 +81,12 @@ class BinanceSaldoBot:
         """
         try:
             print("Consultando saldo...")
-            balance = self.exchange.fetch_balance()
+            if self.cache_saldo is not None and self.cache_saldo.vigente:
+                balance = self.cache_saldo.balance()
+            else:
+                balance = self.exchange.fetch_balance()
+                if self.cache_saldo is not None:
+                    self.cache_saldo.actualizar(balance, origen="rest", completo=True)
 
             # Crear una lista para almacenar los datos
             registros = []
@@ -86,14 +100,18 @@ class BinanceSaldoBot:
                         "amount": round(info, 6)  # Redondear a 6 decimales
                     })
 
-            # Guardar los registros en un archivo CSV
-            self.guardar_en_csv(registros)
+            if self.almacen is not None:
+                cambios = self.almacen.registrar({r["symbol"]: r["amount"] for r in registros}, timestamp)
+                print(f"[INFO] Saldo registrado en {self.almacen.archivo_db}: {len(cambios)} cambios.")
+            else:
+                # Guardar los registros en un archivo CSV
+                self.guardar_en_csv(registros)
         except Exception as e:
             print(f"[ERROR] Ocurrió un error al consultar el saldo: {e}")
 
     def guardar_en_csv(self, registros):
         """
-        Guarda los registros de saldo en un archivo CSV.
+        Agrega los registros de saldo al final del archivo CSV.
 
         :param registros: Lista de diccionarios con la información del saldo.
         """
@@ -101,19 +119,9 @@ class BinanceSaldoBot:
             # Crear un DataFrame con los datos actuales
             df_nuevo = pd.DataFrame(registros)
 
-            # Verificar si el archivo ya existe
-            if os.path.exists(self.archivo_csv):
-                # Leer el archivo existente
-                df_existente = pd.read_csv(self.archivo_csv)
-
-                # Concatenar los nuevos registros al archivo existente
-                df_final = pd.concat([df_existente, df_nuevo], ignore_index=True)
-            else:
-                # Si no existe, el nuevo registro será el archivo inicial
-                df_final = df_nuevo
-
-            # Guardar el DataFrame actualizado en el archivo CSV
-            df_final.to_csv(self.archivo_csv, index=False)
+            # Agregar al final del archivo sin releerlo; la cabecera solo si es nuevo
+            nuevo = not os.path.exists(self.archivo_csv) or os.path.getsize(self.archivo_csv) == 0
+            df_nuevo.to_csv(self.archivo_csv, mode='a', header=nuevo, index=False)
             print(f"[INFO] Saldo guardado en {self.archivo_csv}.")
         except Exception as e:
             print(f"[ERROR] Ocurrió un error al guardar el saldo en el archivo CSV: {e}")
@@ -0,0 +1,172 @@
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+import motor_backtest
+from memoria_compartida import compartir_array, adjuntar_array, liberar
+
+# Estado de cada proceso trabajador: arrays compartidos abiertos una sola vez
+_TRABAJADOR = {}
+
+def _inicializar_trabajador(descriptor_cierres, descriptor_direcciones, moneda_inicial):
+    """
+    Abre en el proceso trabajador los arrays de velas compartidos por el proceso principal.
+    """
+    bloque_cierres, cierres = adjuntar_array(descriptor_cierres)
+    bloque_direcciones, direcciones = adjuntar_array(descriptor_direcciones)
+    _TRABAJADOR.update({
+        'bloques': (bloque_cierres, bloque_direcciones),
+        'cierres': cierres,
+        'direcciones': direcciones,
+        'moneda_inicial': moneda_inicial,
+    })
+
+def _evaluar_lote(combinaciones):
+    """
+    Ejecuta el backtest para un lote de combinaciones de parámetros en el proceso trabajador.
+
+    :param combinaciones: Lista de diccionarios con cantidad_base, comision y umbral_ganancia.
+    :return: Lista de diccionarios con los parámetros y sus resultados.
+    """
+    cierres = _TRABAJADOR['cierres']
+    direcciones = _TRABAJADOR['direcciones']
+    moneda_inicial = _TRABAJADOR['moneda_inicial']
+
+    resultados = []
+    for parametros in combinaciones:
+        indices, _, obtenidos = motor_backtest.simular_con_costes(
+            cierres,
+            parametros['cantidad_base'],
+            moneda_inicial,
+            comision=parametros['comision'],
+            umbral_ganancia=parametros['umbral_ganancia'],
+            direcciones=direcciones,
+        )
+        resumen = motor_backtest.resumir(cierres, indices, obtenidos, parametros['cantidad_base'], moneda_inicial)
+        resultados.append({**parametros, **resumen})
+    return resultados
+
+class BarridoParametros:
+    def __init__(self, archivo_csv, moneda_inicial="BTC", fuente=None, procesos=None):
+        """
+        Inicializa el barrido de parámetros sobre la estrategia de AnalizadorETHBTC.
+
+        :param archivo_csv: Nombre del archivo CSV con los datos históricos.
+        :param moneda_inicial: Moneda inicial de la simulación ("BTC" o "ETH").
+        :param fuente: Fuente de velas opcional con método a_dataframe() (e.g., AlmacenVelas).
+        :param procesos: Número de procesos trabajadores (por defecto, todos los núcleos).
+        """
+        self.archivo_csv = archivo_csv
+        self.moneda_inicial = moneda_inicial.upper()
+        self.fuente = fuente
+        self.procesos = procesos or os.cpu_count()
+
+    def cargar_cierres(self):
+        """
+        Carga los precios de cierre desde la fuente de velas o el archivo CSV.
+
+        :return: Array de numpy con los cierres.
+        """
+        if self.fuente is not None:
+            datos = self.fuente.a_dataframe()
+        else:
+            print(f"Cargando datos desde {self.archivo_csv}...")
+            datos = pd.read_csv(self.archivo_csv, usecols=['close'])
+        print(f"Datos cargados exitosamente: {len(datos)} registros.")
+        return datos['close'].to_numpy(dtype=np.float64)
+
+    @staticmethod
+    def generar_combinaciones(rejilla):
+        """
+        Genera todas las combinaciones de la rejilla de parámetros.
+
+        :param rejilla: Diccionario con listas de valores para cantidad_base, comision
+                        y umbral_ganancia (en porcentaje; None desactiva el umbral).
+        :return: Lista de diccionarios, uno por combinación.
+        """
+        claves = ('cantidad_base', 'comision', 'umbral_ganancia')
+        valores = [rejilla.get(clave, [None] if clave == 'umbral_ganancia' else [0.0]) for clave in claves]
+        return [dict(zip(claves, combinacion)) for combinacion in itertools.product(*valores)]
+
+    def ejecutar(self, rejilla, tamano_lote=None):
+        """
+        Ejecuta el barrido repartiendo las combinaciones entre procesos. Los cierres y
+        las direcciones se comparten por memoria compartida en lugar de enviarse en
+        cada tarea.
+
+        :param rejilla: Rejilla de parámetros (ver generar_combinaciones).
+        :param tamano_lote: Combinaciones por tarea (por defecto se reparten en ~4 tareas por proceso).
+        :return: DataFrame ordenado de mejor a peor balance final.
+        """
+        cierres = self.cargar_cierres()
+        direcciones = motor_backtest.calcular_direcciones(cierres)
+        combinaciones = self.generar_combinaciones(rejilla)
+        if not combinaciones:
+            return pd.DataFrame()
+
+        tamano_lote = tamano_lote or max(1, len(combinaciones) // (self.procesos * 4))
+        lotes = [combinaciones[i:i + tamano_lote] for i in range(0, len(combinaciones), tamano_lote)]
+        print(f"[INFO] Evaluando {len(combinaciones)} combinaciones en {len(lotes)} lotes "
+              f"con {self.procesos} procesos...")
+
+        inicio = time.perf_counter()
+        bloque_cierres, descriptor_cierres = compartir_array(cierres)
+        bloque_direcciones, descriptor_direcciones = compartir_array(direcciones)
+        try:
+            with ProcessPoolExecutor(max_workers=self.procesos, initializer=_inicializar_trabajador,
+                                     initargs=(descriptor_cierres, descriptor_direcciones,
+                                               self.moneda_inicial)) as pool:
+                resultados = [fila for lote in pool.map(_evaluar_lote, lotes) for fila in lote]
+        finally:
+            liberar([bloque_cierres, bloque_direcciones])
+        print(f"[INFO] Barrido completado en {time.perf_counter() - inicio:.2f} segundos.")
+
+        return self.clasificar(resultados)
+
+    def clasificar(self, resultados):
+        """
+        Construye la tabla de resultados ordenada por balance final.
+
+        :param resultados: Lista de diccionarios devueltos por los trabajadores.
+        :return: DataFrame clasificado.
+        """
+        tabla = pd.DataFrame(resultados)
+        tabla['rendimiento_pct'] = (tabla['balance_final'] / tabla['cantidad_base'] - 1) * 100
+        tabla['drawdown_max_pct'] = tabla.pop('drawdown_max') * 100
+        tabla = tabla.sort_values(['rendimiento_pct', 'drawdown_max_pct'], ascending=[False, True])
+        tabla.insert(0, 'posicion', range(1, len(tabla) + 1))
+        return tabla.reset_index(drop=True)
+
+    def guardar_resultados(self, tabla, archivo_salida="resultados_barrido.csv"):
+        """
+        Guarda la tabla de resultados en un archivo CSV.
+
+        :param tabla: DataFrame con los resultados clasificados.
+        :param archivo_salida: Nombre del archivo CSV.
+        """
+        tabla.to_csv(archivo_salida, index=False)
+        print(f"Resultados del barrido guardados en {archivo_salida}.")
+
+    def mostrar_resultados(self, tabla, filas=10):
+        """
+        Muestra las mejores combinaciones en formato tabular.
+
+        :param tabla: DataFrame con los resultados clasificados.
+        :param filas: Número de filas a mostrar.
+        """
+        print("\nMejores combinaciones de parámetros:")
+        print(tabulate(tabla.head(filas), headers="keys", tablefmt="grid", showindex=False))
+
+if __name__ == "__main__":
+    barrido = BarridoParametros(archivo_csv="../datos/historial_ETH_BTC.csv", moneda_inicial="BTC")
+    rejilla = {
+        'cantidad_base': [0.001, 0.01],
+        'comision': [0.0, 0.00075, 0.001],
+        'umbral_ganancia': [None] + [round(u, 2) for u in np.arange(0.0, 2.01, 0.05)],
+    }
+    tabla = barrido.ejecutar(rejilla)
+    barrido.mostrar_resultados(tabla)
+    barrido.guardar_resultados(tabla, "../datos/resultados_barrido.csv")
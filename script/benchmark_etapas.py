@@ -0,0 +1,295 @@
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+
+# Tamaños de datos: nombre -> (timeframe, días de historial)
+TAMANOS = {
+    '1h_1a': ('1h', 365),
+    '15m_1a': ('15m', 365),
+    '1m_1a': ('1m', 365),
+    '1m_3a': ('1m', 3 * 365),
+}
+SEGUNDOS_TIMEFRAME = {'1m': 60, '15m': 900, '1h': 3600}
+ETAPAS = ['cargar_datos', 'entrenar_modelo_lote', 'entrenar_modelo_incremental', 'predecir',
+          'simular_operaciones', 'colocar_orden', 'leer_libro']
+
+class BenchmarkEtapas:
+    def __init__(self, directorio=None, repeticiones=3, archivo_csv=None, semilla=42):
+        """
+        Inicializa el benchmark de las etapas del ciclo de BotMaster, sin red.
+
+        Cada etapa se ejecuta varias veces y se guarda el menor tiempo, que es el menos
+        afectado por el ruido de la máquina. Las velas son sintéticas (paseo aleatorio
+        con semilla fija) o se toman de un historial grabado, y las órdenes se envían a
+        un ExchangeSimulado.
+
+        :param directorio: Carpeta de trabajo para los CSV y libros generados (por defecto, una temporal).
+        :param repeticiones: Ejecuciones de cada etapa.
+        :param archivo_csv: Historial grabado opcional (historial_*.csv), medido como tamaño "registrado".
+        :param semilla: Semilla de las velas sintéticas.
+        """
+        self.directorio = directorio or tempfile.mkdtemp(prefix="benchmark_etapas_")
+        os.makedirs(self.directorio, exist_ok=True)
+        self.repeticiones = repeticiones
+        self.archivo_csv = archivo_csv
+        self.semilla = semilla
+
+    @staticmethod
+    def generar_velas(filas, segundos_vela, semilla=42, precio_inicial=0.05):
+        """
+        Genera velas sintéticas con el formato de historial_*.csv.
+
+        :param filas: Número de velas.
+        :param segundos_vela: Duración de cada vela en segundos.
+        :return: DataFrame con timestamp, open, high, low, close y volume.
+        """
+        generador = np.random.default_rng(semilla)
+        rendimientos = generador.normal(0.0, 0.002, filas)
+        cierres = precio_inicial * np.exp(np.cumsum(rendimientos))
+        aperturas = np.r_[precio_inicial, cierres[:-1]]
+        extremos = np.abs(generador.normal(0.0, 0.001, (2, filas)))
+        fin = pd.Timestamp("2024-01-01")
+        return pd.DataFrame({
+            'timestamp': pd.date_range(end=fin, periods=filas, freq=pd.Timedelta(seconds=segundos_vela)),
+            'open': aperturas,
+            'high': np.maximum(aperturas, cierres) * (1 + extremos[0]),
+            'low': np.minimum(aperturas, cierres) * (1 - extremos[1]),
+            'close': cierres,
+            'volume': generador.gamma(2.0, 50.0, filas),
+        })
+
+    def preparar_historial(self, tamano):
+        """
+        Devuelve el CSV de historial de un tamaño, generándolo si no existe.
+
+        :param tamano: Nombre del tamaño (clave de TAMANOS o "registrado").
+        :return: Tupla (archivo CSV, timeframe).
+        """
+        if tamano == 'registrado':
+            return self.archivo_csv, '1h'
+        timeframe, dias = TAMANOS[tamano]
+        archivo = os.path.join(self.directorio, f"historial_{tamano}.csv")
+        if not os.path.exists(archivo):
+            segundos = SEGUNDOS_TIMEFRAME[timeframe]
+            print(f"[INFO] Generando {tamano}: {dias * 86400 // segundos} velas de {timeframe}...")
+            self.generar_velas(dias * 86400 // segundos, segundos, self.semilla).to_csv(archivo, index=False)
+        return archivo, timeframe
+
+    def medir(self, funcion, preparar=None):
+        """
+        Mide una función y devuelve el menor tiempo de las repeticiones. La salida por
+        consola de las etapas se descarta para no medir la terminal.
+
+        :param funcion: Función a medir; recibe el resultado de preparar (si se indica).
+        :param preparar: Función opcional que se ejecuta fuera de la medida antes de cada repetición.
+        :return: Segundos.
+        """
+        tiempos = []
+        for _ in range(self.repeticiones):
+            with contextlib.redirect_stdout(io.StringIO()):
+                argumentos = (preparar(),) if preparar is not None else ()
+                inicio = time.perf_counter()
+                funcion(*argumentos)
+                tiempos.append(time.perf_counter() - inicio)
+        return min(tiempos)
+
+    def medir_tamano(self, tamano):
+        """
+        Mide todas las etapas con un tamaño de datos.
+
+        :param tamano: Nombre del tamaño.
+        :return: Diccionario etapa -> segundos (más 'filas').
+        """
+        from reg_logistica import ModeloPrediccion
+        from evaluacion_arb_eth import AnalizadorETHBTC
+
+        archivo, timeframe = self.preparar_historial(tamano)
+        salida = os.path.join(self.directorio, "predicciones.json")
+        modelo = ModeloPrediccion(archivo_csv=archivo, archivo_salida=salida)
+        with contextlib.redirect_stdout(io.StringIO()):
+            datos = modelo.cargar_datos()
+        resultados = {'filas': len(datos)}
+        print(f"[INFO] Midiendo {tamano} ({len(datos)} velas)...")
+
+        resultados['cargar_datos'] = self.medir(modelo.cargar_datos)
+
+        def modelo_nuevo(modo):
+            return lambda: ModeloPrediccion(archivo_csv=archivo, archivo_salida=salida, modo=modo)
+        resultados['entrenar_modelo_lote'] = self.medir(lambda m: m.entrenar_modelo(datos), modelo_nuevo("lote"))
+        resultados['entrenar_modelo_incremental'] = self.medir(lambda m: m.entrenar_modelo(datos),
+                                                               modelo_nuevo("incremental"))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            modelo.entrenar_modelo(datos)
+        resultados['predecir'] = self.medir(lambda: modelo.predecir(datos))
+
+        analizador = AnalizadorETHBTC(archivo_csv=archivo, cantidad_base=0.001, moneda_inicial="BTC")
+        resultados['simular_operaciones'] = self.medir(lambda: analizador.simular_operaciones(datos))
+
+        resultados['colocar_orden'] = self.medir(lambda bot: bot.colocar_orden(),
+                                                 lambda: self.preparar_ordenes(datos, timeframe))
+        libro = self.preparar_libro(datos, max(100, len(datos) // 100))
+        desde = datos['timestamp'].iloc[-1] - pd.Timedelta(days=30)
+        resultados['leer_libro'] = self.medir(lambda: (libro.ultima_operacion(),
+                                                       libro.rango(desde=desde.to_pydatetime()),
+                                                       libro.pnl(), libro.pnl(desde=desde.to_pydatetime())))
+        return resultados
+
+    def preparar_ordenes(self, datos, timeframe):
+        """
+        Crea un OrdenesBot sobre un ExchangeSimulado y un libro nuevo cuya última
+        operación hace que la decisión termine en una compra (el camino más largo).
+        """
+        from exchange_simulado import ExchangeSimulado
+        from libro_operaciones import LibroOperaciones
+        from ordenes import OrdenesBot
+
+        exchange = ExchangeSimulado({"ETH/BTC": datos}, timeframe=timeframe, saldo_inicial={"BTC": 1.0},
+                                    inicio_ms=int(datos['timestamp'].iloc[-1].value // 1_000_000))
+        archivo_db = os.path.join(self.directorio, "ordenes.db")
+        for archivo in (archivo_db, f"{archivo_db}-wal", f"{archivo_db}-shm"):
+            if os.path.exists(archivo):
+                os.remove(archivo)
+        libro = LibroOperaciones(archivo_db)
+        libro.registrar({'moneda_inicial': 'BTC', 'cantidad_inicial': 0.0, 'moneda_final': 'BTC', 'cantidad_final': 1.0})
+        return OrdenesBot(par="ETH/BTC", timeframe=timeframe, exchange=exchange, libro=libro,
+                          operaciones_archivo=os.path.join(self.directorio, "operaciones.csv"))
+
+    def preparar_libro(self, datos, operaciones):
+        """
+        Crea un libro de operaciones con operaciones repartidas a lo largo del historial.
+
+        :param operaciones: Número de operaciones.
+        :return: LibroOperaciones.
+        """
+        from libro_operaciones import LibroOperaciones
+
+        archivo_db = os.path.join(self.directorio, f"libro_{len(datos)}_{operaciones}.db")
+        if os.path.exists(archivo_db):
+            return LibroOperaciones(archivo_db)
+        libro = LibroOperaciones(archivo_db)
+        filas = np.linspace(0, len(datos) - 1, operaciones).astype(int)
+        precios = datos['close'].to_numpy()[filas]
+        timestamps = datos['timestamp'].iloc[filas]
+        cantidad = 1.0
+        for k, (timestamp, precio) in enumerate(zip(timestamps, precios)):
+            compra = k % 2 == 0
+            final = cantidad / precio if compra else cantidad * precio
+            libro.registrar({'timestamp': timestamp.isoformat(),
+                             'moneda_inicial': 'BTC' if compra else 'ETH', 'cantidad_inicial': cantidad,
+                             'moneda_final': 'ETH' if compra else 'BTC', 'cantidad_final': final})
+            cantidad = final
+        return libro
+
+    def ejecutar(self, tamanos=tuple(TAMANOS)):
+        """
+        Mide todas las etapas con cada tamaño de datos.
+
+        :param tamanos: Nombres de los tamaños (claves de TAMANOS y/o "registrado").
+        :return: Diccionario con el entorno y los resultados por tamaño.
+        """
+        return {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'entorno': {
+                'python': platform.python_version(),
+                'plataforma': platform.platform(),
+                'procesador': platform.processor() or platform.machine(),
+                'numpy': np.__version__,
+                'pandas': pd.__version__,
+            },
+            'repeticiones': self.repeticiones,
+            'resultados': {tamano: self.medir_tamano(tamano) for tamano in tamanos},
+        }
+
+    @staticmethod
+    def comparar(actual, referencia, umbral=0.25, margen_minimo=0.002):
+        """
+        Compara unos resultados con una referencia.
+
+        :param actual: Resultados devueltos por ejecutar.
+        :param referencia: Resultados de referencia con el mismo formato.
+        :param umbral: Aumento relativo a partir del cual una etapa se considera una regresión (0.25 = 25%).
+        :param margen_minimo: Aumento absoluto mínimo en segundos, para no marcar ruido en etapas muy rápidas.
+        :return: Lista de regresiones (tamaño, etapa, segundos de referencia, segundos actuales).
+        """
+        regresiones = []
+        for tamano, etapas in actual['resultados'].items():
+            anteriores = referencia.get('resultados', {}).get(tamano, {})
+            for etapa in ETAPAS:
+                if etapa not in etapas or etapa not in anteriores:
+                    continue
+                antes, ahora = anteriores[etapa], etapas[etapa]
+                if ahora > antes * (1 + umbral) and ahora - antes > margen_minimo:
+                    regresiones.append((tamano, etapa, antes, ahora))
+        return regresiones
+
+    @staticmethod
+    def guardar_resultados(resultados, archivo_salida):
+        """
+        Guarda los resultados en un archivo JSON.
+        """
+        with open(archivo_salida, 'w') as f:
+            json.dump(resultados, f, indent=4)
+        print(f"Resultados del benchmark guardados en {archivo_salida}.")
+
+    @staticmethod
+    def mostrar_resultados(resultados, referencia=None):
+        """
+        Muestra los tiempos por etapa (en milisegundos) y, si hay referencia, la variación.
+        """
+        filas = []
+        for tamano, etapas in resultados['resultados'].items():
+            anteriores = (referencia or {}).get('resultados', {}).get(tamano, {})
+            for etapa in ETAPAS:
+                if etapa not in etapas:
+                    continue
+                fila = {'tamano': tamano, 'filas': etapas['filas'], 'etapa': etapa, 'ms': etapas[etapa] * 1000}
+                if etapa in anteriores:
+                    fila['ms_referencia'] = anteriores[etapa] * 1000
+                    fila['variacion_%'] = (etapas[etapa] / anteriores[etapa] - 1) * 100
+                filas.append(fila)
+        print(tabulate(filas, headers="keys", tablefmt="grid", floatfmt=".2f"))
+
+def argumento(nombre, defecto=None):
+    if nombre in sys.argv:
+        return sys.argv[sys.argv.index(nombre) + 1]
+    return defecto
+
+if __name__ == "__main__":
+    # e.g.: python benchmark_etapas.py --tamanos 1h_1a,1m_1a --umbral 0.25 --guardar-referencia
+    tamanos = argumento("--tamanos", ",".join(TAMANOS)).split(",")
+    archivo_csv = argumento("--historial")
+    if archivo_csv:
+        tamanos.append('registrado')
+    archivo_salida = argumento("--salida", "../datos/benchmark_etapas.json")
+    archivo_referencia = argumento("--referencia", "../datos/benchmark_referencia.json")
+    umbral = float(argumento("--umbral", 0.25))
+
+    benchmark = BenchmarkEtapas(directorio=argumento("--directorio"),
+                                repeticiones=int(argumento("--repeticiones", 3)), archivo_csv=archivo_csv)
+    resultados = benchmark.ejecutar(tamanos)
+    referencia = None
+    if os.path.exists(archivo_referencia):
+        with open(archivo_referencia) as f:
+            referencia = json.load(f)
+    benchmark.mostrar_resultados(resultados, referencia)
+    benchmark.guardar_resultados(resultados, archivo_salida)
+
+    if "--guardar-referencia" in sys.argv:
+        benchmark.guardar_resultados(resultados, archivo_referencia)
+    elif referencia is not None:
+        regresiones = benchmark.comparar(resultados, referencia, umbral)
+        for tamano, etapa, antes, ahora in regresiones:
+            print(f"[ERROR] Regresión en {etapa} ({tamano}): {antes * 1000:.2f} ms -> {ahora * 1000:.2f} ms.")
+        if regresiones:
+            sys.exit(1)
+        print(f"[INFO] Sin regresiones por encima del {umbral * 100:.0f}% respecto a {archivo_referencia}.")
@@ -1,90 +1,476 @@
 import os
+import sys
 import time
-from arbitraje_person_model import HistorialBinanceBot
-from balance import BinanceSaldoBot
-from reg_logistica import ModeloPrediccion
-from evaluacion_arb_eth import AnalizadorETHBTC
-from ordenes import OrdenesBot
+from metricas import METRICAS, DURACION_CICLO, DURACION_ETAPA, CICLOS_OMITIDOS, ETAPAS_FALLIDAS, ULTIMO_CICLO
+
+# Referencia para medir el tiempo de arranque hasta la primera decisión
+INICIO_PROCESO = time.perf_counter()
+
+# Las etapas se importan al usarse por primera vez: así una ejecución que solo
+# coloca órdenes no carga pandas, scikit-learn ni tabulate.
+MODULOS_ETAPAS = [
+    "sesion_exchange",
+    "almacen_velas",
+    "arbitraje_person_model",
+    "historial_saldo",
+    "balance",
+    "reg_logistica",
+    "evaluacion_arb_eth",
+    "libro_operaciones",
+    "ordenes",
+]
+
+def medir_importaciones(modulos=MODULOS_ETAPAS):
+    """
+    Mide el tiempo de importación de cada módulo en el orden indicado.
+    Cada tiempo es incremental: no incluye dependencias ya cargadas por los anteriores.
+
+    :param modulos: Lista de nombres de módulos a importar.
+    :return: Lista de tuplas (módulo, segundos).
+    """
+    import importlib
+    tiempos = []
+    for modulo in modulos:
+        inicio = time.perf_counter()
+        importlib.import_module(modulo)
+        tiempos.append((modulo, time.perf_counter() - inicio))
+    return tiempos
+
+class EstadoPar:
+    # El par original conserva los nombres de archivo anteriores al modo multipar
+    PAR_LEGADO = "ETH/BTC"
+
+    def __init__(self, par, timeframe, datos_dir):
+        """
+        Estado y archivos propios de un par: historial, predicciones, operaciones y modelo.
+
+        :param par: Par de criptomonedas (e.g., "ETH/BTC").
+        :param timeframe: Intervalo de tiempo de las velas.
+        :param datos_dir: Carpeta de datos.
+        """
+        self.par = par
+        self.timeframe = timeframe
+        self.datos_dir = datos_dir
+        self.sufijo = par.replace('/', '_')
+        self.historial_archivo = os.path.join(datos_dir, f"historial_{self.sufijo}.csv")
+        self.predicciones_archivo = os.path.join(datos_dir, self.nombre_archivo("predicciones.json"))
+        self.operaciones_archivo = os.path.join(datos_dir, self.nombre_archivo("operaciones.csv"))
+        self.libro_archivo = os.path.join(datos_dir, self.nombre_archivo("operaciones.db"))
+        self.modelo_cache_archivo = os.path.join(datos_dir, self.nombre_archivo("modelo_cache.json"))
+        self.favorables_archivo = os.path.join(datos_dir, self.nombre_archivo("operaciones_favorables.csv"))
+        self.modelo = None
+        self._almacen = None
+        self._libro = None
+        self._libro_l2 = None
+
+    def nombre_archivo(self, nombre):
+        """
+        Nombre de archivo del par: el par legado usa el nombre tal cual y el resto
+        añade el par como sufijo (e.g., predicciones_BNB_BTC.json).
+        """
+        if self.par == self.PAR_LEGADO:
+            return nombre
+        raiz, extension = os.path.splitext(nombre)
+        return f"{raiz}_{self.sufijo}{extension}"
+
+    @property
+    def almacen(self):
+        """
+        Almacén de velas del par, creado al usarse por primera vez.
+        """
+        if self._almacen is None:
+            from almacen_velas import AlmacenVelas
+            self._almacen = AlmacenVelas(os.path.join(self.datos_dir, "velas"), self.par, self.timeframe)
+        return self._almacen
+
+    @property
+    def libro(self):
+        """
+        Libro de operaciones indexado del par; importa su CSV de operaciones la primera vez.
+        """
+        if self._libro is None:
+            from libro_operaciones import LibroOperaciones
+            self._libro = LibroOperaciones(self.libro_archivo, archivo_csv_inicial=self.operaciones_archivo)
+        return self._libro
+
+    @property
+    def libro_l2(self):
+        """
+        Libro de órdenes L2 en memoria del par, creado al usarse por primera vez.
+        """
+        if self._libro_l2 is None:
+            from libro_ordenes_l2 import LibroL2
+            self._libro_l2 = LibroL2(self.par)
+        return self._libro_l2
 
 class BotMaster:
-    def __init__(self):
+    def __init__(self, pares=("ETH/BTC",), exchange=None, datos_dir="../datos/"):
         """
         Inicializa el bot maestro.
+
+        :param pares: Pares que se operan a la vez. Todos comparten la sesión de Binance
+                      y su presupuesto de peso de peticiones; cada uno tiene su propio
+                      historial, modelo, predicciones y libro de operaciones.
+        :param exchange: Cliente que sustituye a Binance (e.g., ExchangeSimulado para ejecutar
+                         el ciclo completo sin cuenta ni red).
+        :param datos_dir: Carpeta de datos del bot (con un exchange simulado conviene una
+                          carpeta aparte para no mezclar sus archivos con los reales).
         """
-        self.par = "ETH/BTC"
         self.timeframe = "1h"
         self.intervalo = 30  # 0.5 minutos
-        self.datos_dir = "../datos/"
-        self.historial_archivo = os.path.join(self.datos_dir, "historial_ETH_BTC.csv")
+        self.datos_dir = datos_dir
+        self.exchange = exchange
+        self.archivo_metricas = None  # Archivo .prom para el textfile collector
+        self.headless = False  # True: OrdenesBot registra en JSON lines en segundo plano, sin rich
+        self.stream_saldo = True  # False: el saldo se consulta con fetch_balance en cada uso
         self.saldo_archivo = os.path.join(self.datos_dir, "saldo_binance.csv")
-        self.predicciones_archivo = os.path.join(self.datos_dir, "predicciones.json")
-        self.operaciones_archivo = os.path.join(self.datos_dir, "operaciones.csv")
+        self.modo_modelo = "lote"  # "incremental" actualiza el modelo solo con las velas nuevas
+        self.peso_por_minuto = 1200  # Presupuesto compartido por todos los pares
+        self.profundidad_libro = 100  # Niveles por lado del snapshot del libro (peso 5 en Binance)
+        self.pares = {par: EstadoPar(par, self.timeframe, self.datos_dir) for par in pares}
+        self._sesion = None
+        self._almacen_saldo = None
+        self.cache_saldo = None  # CacheSaldo del stream de saldo, mientras está en marcha
+        self._tarea_saldo = None
+        self.tiempo_primera_decision = None
+
+    @property
+    def almacen_saldo(self):
+        """
+        Serie de saldos solo de anexado; importa saldo_binance.csv la primera vez.
+        """
+        if self._almacen_saldo is None:
+            from historial_saldo import AlmacenSaldo
+            self._almacen_saldo = AlmacenSaldo(os.path.join(self.datos_dir, "saldo_binance.db"),
+                                               archivo_csv_inicial=self.saldo_archivo)
+        return self._almacen_saldo
+
+    def crear_cache_saldo(self, registrar_saldo=True):
+        """
+        Crea la caché del saldo alimentada por el stream de datos de usuario.
+
+        :param registrar_saldo: Si es True, cada cambio de saldo se registra en almacen_saldo.
+        :return: CacheSaldo.
+        """
+        from cache_saldo import CacheSaldo
+        cache = CacheSaldo(self.sesion.exchange)
+        if registrar_saldo:
+            # El almacén se crea aquí y no desde el hilo del stream
+            self.almacen_saldo
+            cache.suscribir(self.registrar_cambio_saldo)
+        return cache
+
+    def crear_cliente_saldo(self):
+        """
+        Crea el cliente del stream de saldo: ccxt.pro con las credenciales de la sesión o,
+        con un exchange simulado, su vista asíncrona.
+        """
+        if self.exchange is None:
+            return self.sesion.crear_cliente_stream()
+        from exchange_simulado import ClienteSimuladoAsync
+        return ClienteSimuladoAsync(self.exchange)
+
+    def registrar_cambio_saldo(self, evento):
+        """
+        Registra en almacen_saldo un cambio de saldo recibido por la caché, con el mismo
+        criterio que BinanceSaldoBot (monedas con saldo positivo, 6 decimales).
+
+        :param evento: Evento de CacheSaldo.
+        """
+        saldos = {moneda: round(cantidad, 6) for moneda, cantidad in evento['totales'].items() if cantidad > 0}
+        self.almacen_saldo.registrar(saldos, evento['momento'])
 
-    def recopilar_datos(self):
+    @property
+    def sesion(self):
+        """
+        Sesión única: un cliente ccxt, una caché de mercados y un presupuesto de peso para todos los pares.
+        """
+        if self._sesion is None:
+            from sesion_exchange import SesionBinance
+            # El exchange simulado no tiene límite de peso que respetar
+            self._sesion = SesionBinance(archivo_cache_mercados=os.path.join(self.datos_dir, "cache_mercados.json"),
+                                         peso_por_minuto=self.peso_por_minuto if self.exchange is None else None,
+                                         exchange=self.exchange)
+        return self._sesion
+
+    def esperar(self, segundos):
+        """
+        Espera entre ciclos; con un exchange simulado avanza su reloj virtual.
+        """
+        if hasattr(self.exchange, 'dormir'):
+            self.exchange.dormir(segundos)
+        else:
+            time.sleep(segundos)
+
+    def recopilar_datos(self, estado):
         """
         Recopila datos históricos del mercado.
+
+        :param estado: EstadoPar del par.
         """
-        print("[INFO] Recopilando datos históricos...")
-        bot = HistorialBinanceBot(par=self.par, timeframe=self.timeframe)
+        from arbitraje_person_model import HistorialBinanceBot
+        print(f"[INFO] Recopilando datos históricos de {estado.par}...")
+        bot = HistorialBinanceBot(par=estado.par, timeframe=self.timeframe, archivo_csv=estado.historial_archivo,
+                                  almacen=estado.almacen, exchange=self.sesion.exchange)
         bot.ejecutar()
 
     def consultar_saldo(self):
         """
-        Consulta y registra el saldo actual.
+        Consulta y registra el saldo actual (uno para toda la cuenta, no por par).
         """
+        from balance import BinanceSaldoBot
         print("[INFO] Consultando saldo...")
-        bot = BinanceSaldoBot(par=self.par, timeframe=self.timeframe, archivo_csv=self.saldo_archivo)
+        bot = BinanceSaldoBot(timeframe=self.timeframe, archivo_csv=self.saldo_archivo,
+                              exchange=self.sesion.exchange, almacen=self.almacen_saldo,
+                              cache_saldo=self.cache_saldo)
         bot.consultar_saldo()
 
-    def generar_predicciones(self):
+    def generar_predicciones(self, estado):
         """
         Genera predicciones basadas en datos históricos.
+
+        :param estado: EstadoPar del par.
         """
-        print("[INFO] Generando predicciones...")
-        modelo = ModeloPrediccion(
-            archivo_csv=self.historial_archivo,
-            archivo_salida=self.predicciones_archivo,
-            formato_salida="json"
-        )
-        modelo.ejecutar()
+        from reg_logistica import ModeloPrediccion
+        print(f"[INFO] Generando predicciones de {estado.par}...")
+        # El modelo se conserva entre ciclos para que el modo incremental acumule sus estadísticos
+        if estado.modelo is None:
+            estado.modelo = ModeloPrediccion(
+                archivo_csv=estado.historial_archivo,
+                archivo_salida=estado.predicciones_archivo,
+                formato_salida="json",
+                fuente=estado.almacen,
+                modo=self.modo_modelo,
+                archivo_cache=estado.modelo_cache_archivo
+            )
+        estado.modelo.ejecutar()
 
-    def evaluar_estrategia(self):
+    def evaluar_estrategia(self, estado):
         """
         Evalúa estrategias basadas en datos históricos.
+
+        :param estado: EstadoPar del par.
         """
-        print("[INFO] Evaluando estrategias de arbitraje...")
+        from evaluacion_arb_eth import AnalizadorETHBTC
+        print(f"[INFO] Evaluando estrategias de arbitraje de {estado.par}...")
         analizador = AnalizadorETHBTC(
-            archivo_csv=self.historial_archivo,
+            archivo_csv=estado.historial_archivo,
             cantidad_base=0.001,  # Ajustar según el capital inicial
-            moneda_inicial="BTC"
+            moneda_inicial=estado.par.split('/')[1],
+            fuente=estado.almacen,
+            par=estado.par
         )
-        analizador.ejecutar()
+        analizador.ejecutar(estado.favorables_archivo)
+
+    def actualizar_libro_l2(self, estado):
+        """
+        Carga en el libro L2 del par un snapshot de fetch_order_book, para que las
+        cantidades estimadas de la decisión tengan en cuenta la profundidad del libro.
+
+        :param estado: EstadoPar del par.
+        :return: LibroL2 del par, o None si no se pudo obtener el snapshot.
+        """
+        try:
+            libro = self.sesion.exchange.fetch_order_book(estado.par, self.profundidad_libro)
+        except Exception as e:
+            print(f"[WARN] No se pudo obtener el libro de órdenes de {estado.par}; se usa el último precio: {e}")
+            return None
+        estado.libro_l2.cargar_snapshot(libro['bids'], libro['asks'], libro.get('nonce'), libro.get('timestamp'))
+        return estado.libro_l2
 
-    def ejecutar_ordenes(self):
+    def ejecutar_ordenes(self, estado):
         """
         Ejecuta órdenes en Binance basadas en la estrategia.
+
+        :param estado: EstadoPar del par.
         """
-        print("[INFO] Ejecutando órdenes...")
-        bot = OrdenesBot(operaciones_archivo=self.operaciones_archivo)
+        from ordenes import OrdenesBot
+        print(f"[INFO] Ejecutando órdenes de {estado.par}...")
+        libro_l2 = self.actualizar_libro_l2(estado)
+        bot = OrdenesBot(par=estado.par, operaciones_archivo=estado.operaciones_archivo,
+                         predicciones_archivo=estado.predicciones_archivo, exchange=self.sesion.exchange,
+                         libro=estado.libro, libro_l2=libro_l2, headless=self.headless,
+                         cache_saldo=self.cache_saldo)
         bot.colocar_orden()
+        self.registrar_primera_decision()
+
+    def registrar_primera_decision(self):
+        """
+        Registra y muestra el tiempo transcurrido desde el arranque del proceso hasta la primera decisión.
+        """
+        if self.tiempo_primera_decision is None:
+            self.tiempo_primera_decision = time.perf_counter() - INICIO_PROCESO
+            print(f"[INFO] Tiempo de arranque hasta la primera decisión: {self.tiempo_primera_decision:.2f} segundos.")
+
+    def etapas(self):
+        """
+        Declara las etapas del ciclo y sus dependencias para el orquestador asíncrono.
+        El saldo se consulta una vez por ciclo; el resto de etapas se declaran por par
+        ("etapa:PAR") y los pares avanzan de forma independiente.
+
+        :return: Lista de objetos Etapa.
+        """
+        from functools import partial
+        from orquestador import Etapa
+        etapas = [Etapa("consultar_saldo", self.consultar_saldo)]
+        for par, estado in self.pares.items():
+            recopilar, predecir = f"recopilar_datos:{par}", f"generar_predicciones:{par}"
+            etapas += [
+                Etapa(recopilar, partial(self.recopilar_datos, estado)),
+                Etapa(predecir, partial(self.generar_predicciones, estado), [recopilar], cpu=True),
+                Etapa(f"evaluar_estrategia:{par}", partial(self.evaluar_estrategia, estado), [recopilar], cpu=True),
+                Etapa(f"ejecutar_ordenes:{par}", partial(self.ejecutar_ordenes, estado), [predecir, "consultar_saldo"]),
+            ]
+        return etapas
 
-    def run(self):
+    async def run_async(self):
         """
-        Ejecuta el ciclo completo del bot.
+        Ejecuta el ciclo del bot con el orquestador asíncrono: historial y saldo se
+        consultan a la vez, los pares se procesan en paralelo y las órdenes se evalúan
+        en cuanto sus datos están listos.
+        """
+        import asyncio
+        from orquestador import OrquestadorAsync
+        if self.stream_saldo:
+            # Crear la caché carga los mercados de la sesión (bloqueante): fuera del bucle de eventos
+            self.cache_saldo = await asyncio.to_thread(self.crear_cache_saldo)
+            self._tarea_saldo = asyncio.create_task(self.cache_saldo.run_con_cliente(self.crear_cliente_saldo))
+            self._tarea_saldo.add_done_callback(self.al_terminar_stream_saldo)
+        try:
+            await OrquestadorAsync(self.etapas(), hilos_cpu=max(2, len(self.pares))).run(
+                self.intervalo, al_terminar_ciclo=self.exportar_metricas)
+        finally:
+            if self._tarea_saldo is not None:
+                self._tarea_saldo.cancel()
+                await asyncio.gather(self._tarea_saldo, return_exceptions=True)
+                self._tarea_saldo = None
+            self.cache_saldo = None
+
+    def al_terminar_stream_saldo(self, tarea):
         """
-        while True:
+        Informa si la tarea del stream de saldo terminó por un error (e.g., al crear el cliente).
+        """
+        if not tarea.cancelled() and tarea.exception() is not None:
+            print(f"[ERROR] El stream de saldo se detuvo: {tarea.exception()}")
+
+    def exportar_metricas(self):
+        """
+        Escribe las métricas en el archivo del textfile collector, si está configurado.
+        """
+        if self.archivo_metricas is None:
+            return
+        try:
+            METRICAS.escribir_textfile(self.archivo_metricas)
+        except OSError as e:
+            print(f"[WARN] No se pudieron escribir las métricas en {self.archivo_metricas}: {e}")
+
+    def ejecutar_etapa(self, nombre, funcion, *args):
+        """
+        Ejecuta una etapa del ciclo síncrono midiendo su duración (con el mismo nombre
+        de etapa que en el ciclo asíncrono).
+        """
+        try:
+            with DURACION_ETAPA.tramo(etapa=nombre):
+                return funcion(*args)
+        except Exception:
+            ETAPAS_FALLIDAS.incrementar(etapa=nombre, estado="error")
+            raise
+
+    def run(self, solo_ordenes=False, ciclos=None):
+        """
+        Ejecuta el ciclo completo del bot, par por par.
+
+        :param solo_ordenes: Si es True, cada ciclo solo evalúa y coloca órdenes (arranque rápido).
+        :param ciclos: Número de ciclos a ejecutar (None = sin fin).
+        """
+        try:
+            self.ejecutar_ciclos(solo_ordenes, ciclos)
+        finally:
+            if self.cache_saldo is not None:
+                self.cache_saldo.detener()
+                self.cache_saldo = None
+
+    def iniciar_stream_saldo(self, registrar_saldo=True):
+        """
+        Arranca la caché de saldo en su propio hilo si aún no está en marcha. Se llama tras
+        el primer ciclo para no retrasar la primera decisión; hasta entonces el saldo se
+        consulta con fetch_balance.
+
+        :param registrar_saldo: Si es True, los cambios de saldo se registran en almacen_saldo
+                                (con --solo-ordenes no se registra el saldo).
+        """
+        if not self.stream_saldo or self.cache_saldo is not None:
+            return
+        self.cache_saldo = self.crear_cache_saldo(registrar_saldo)
+        self.cache_saldo.iniciar_en_hilo(self.crear_cliente_saldo)
+
+    def ejecutar_ciclos(self, solo_ordenes, ciclos):
+        """
+        Bucle de ciclos de run().
+        """
+        ciclo = 0
+        while ciclos is None or ciclo < ciclos:
+            ciclo += 1
+            inicio = time.perf_counter()
             try:
-                self.recopilar_datos()
-                self.consultar_saldo()
-                self.generar_predicciones()
-                self.evaluar_estrategia()
-                self.ejecutar_ordenes()
-                print(f"[INFO] Ciclo completo ejecutado. Esperando {self.intervalo} segundos...")
-                time.sleep(self.intervalo)
+                if not solo_ordenes:
+                    self.ejecutar_etapa("consultar_saldo", self.consultar_saldo)
+                for par, estado in self.pares.items():
+                    if not solo_ordenes:
+                        self.ejecutar_etapa(f"recopilar_datos:{par}", self.recopilar_datos, estado)
+                        self.ejecutar_etapa(f"generar_predicciones:{par}", self.generar_predicciones, estado)
+                        self.ejecutar_etapa(f"evaluar_estrategia:{par}", self.evaluar_estrategia, estado)
+                    self.ejecutar_etapa(f"ejecutar_ordenes:{par}", self.ejecutar_ordenes, estado)
+                duracion = time.perf_counter() - inicio
+                DURACION_CICLO.observar(duracion)
+                ULTIMO_CICLO.fijar(time.time())
+                self.exportar_metricas()
+                print(f"[INFO] Ciclo completo ejecutado en {duracion:.2f} segundos. Esperando {self.intervalo} segundos...")
+                self.iniciar_stream_saldo(registrar_saldo=not solo_ordenes)
+                self.esperar(self.intervalo)
             except Exception as e:
                 print(f"[ERROR] Error en el ciclo principal: {e}")
-                time.sleep(self.intervalo)
+                CICLOS_OMITIDOS.incrementar()
+                self.exportar_metricas()
+                self.esperar(self.intervalo)
 
 if __name__ == "__main__":
-    bot_master = BotMaster()
-    bot_master.run()
+    # Pares a operar, e.g.: --pares ETH/BTC,BNB/BTC
+    pares = ("ETH/BTC",)
+    if "--pares" in sys.argv:
+        pares = tuple(sys.argv[sys.argv.index("--pares") + 1].upper().split(","))
+    # Métricas en formato Prometheus: --metricas-puerto 9108 y/o --metricas-textfile ruta.prom
+    if "--metricas-puerto" in sys.argv:
+        METRICAS.iniciar_servidor(int(sys.argv[sys.argv.index("--metricas-puerto") + 1]))
+    archivo_metricas = None
+    if "--metricas-textfile" in sys.argv:
+        archivo_metricas = sys.argv[sys.argv.index("--metricas-textfile") + 1]
+    # Modo headless: sin renderizado rich; el registro se escribe en ../datos/bot.jsonl desde otro hilo
+    headless = "--headless" in sys.argv
+    # Sin stream de saldo (e.g., sin acceso a WebSocket): fetch_balance en cada consulta
+    stream_saldo = "--sin-stream-saldo" not in sys.argv
+    # Modelo incremental (opcional): se conserva entre ciclos y solo se actualiza con las velas nuevas
+    modo_modelo = "incremental" if "--modelo-incremental" in sys.argv else "lote"
+    if headless:
+        from registro_async import configurar_registro
+        configurar_registro(archivo="../datos/bot.jsonl")
+
+    if "--medir-arranque" in sys.argv:
+        for modulo, segundos in medir_importaciones():
+            print(f"{modulo:<25} {segundos * 1000:8.1f} ms")
+        print(f"{'total':<25} {(time.perf_counter() - INICIO_PROCESO) * 1000:8.1f} ms")
+    elif "--async" in sys.argv:
+        import asyncio
+        bot_master = BotMaster(pares)
+        bot_master.archivo_metricas = archivo_metricas
+        bot_master.headless = headless
+        bot_master.stream_saldo = stream_saldo
+        bot_master.modo_modelo = modo_modelo
+        asyncio.run(bot_master.run_async())
+    else:
+        bot_master = BotMaster(pares)
+        bot_master.archivo_metricas = archivo_metricas
+        bot_master.headless = headless
+        bot_master.stream_saldo = stream_saldo
+        bot_master.modo_modelo = modo_modelo
+        bot_master.run(solo_ordenes="--solo-ordenes" in sys.argv)
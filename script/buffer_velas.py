@@ -0,0 +1,117 @@
+import threading
+import numpy as np
+import pandas as pd
+
+class BufferVelas:
+    COLUMNAS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, capacidad=10000, al_cerrar_vela=None):
+        """
+        Inicializa un buffer circular de velas en memoria respaldado por arrays de numpy.
+
+        La última vela del buffer es la vela abierta: se sobrescribe con cada
+        actualización del stream y se da por cerrada cuando llega una vela con
+        timestamp posterior.
+
+        :param capacidad: Número máximo de velas que se conservan.
+        :param al_cerrar_vela: Función opcional llamada con la vela [timestamp, o, h, l, c, v]
+                               cada vez que una vela se cierra.
+        """
+        self.capacidad = capacidad
+        self.al_cerrar_vela = al_cerrar_vela
+        self._timestamps = np.zeros(capacidad, dtype=np.int64)
+        self._valores = np.zeros((capacidad, len(self.COLUMNAS) - 1), dtype=np.float64)
+        self._inicio = 0
+        self._tamano = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._tamano
+
+    def _posicion(self, indice):
+        return (self._inicio + indice) % self.capacidad
+
+    def ultimo_timestamp(self):
+        """
+        Timestamp (epoch-ms) de la última vela del buffer o None si está vacío.
+        """
+        if self._tamano == 0:
+            return None
+        return int(self._timestamps[self._posicion(self._tamano - 1)])
+
+    def actualizar(self, vela):
+        """
+        Inserta o actualiza una vela [timestamp_ms, open, high, low, close, volume].
+
+        :param vela: Vela en formato ccxt.
+        :return: Lista de velas que quedaron cerradas con esta actualización.
+        """
+        cerradas = []
+        with self._lock:
+            timestamp = int(vela[0])
+            ultimo = self.ultimo_timestamp()
+            if ultimo is not None and timestamp < ultimo:
+                return cerradas
+
+            if ultimo is not None and timestamp == ultimo:
+                posicion = self._posicion(self._tamano - 1)
+            else:
+                if ultimo is not None:
+                    anterior = self._posicion(self._tamano - 1)
+                    cerradas.append([ultimo] + self._valores[anterior].tolist())
+                if self._tamano < self.capacidad:
+                    self._tamano += 1
+                else:
+                    self._inicio = (self._inicio + 1) % self.capacidad
+                posicion = self._posicion(self._tamano - 1)
+                self._timestamps[posicion] = timestamp
+
+            self._valores[posicion] = vela[1:6]
+
+        if self.al_cerrar_vela is not None:
+            for cerrada in cerradas:
+                self.al_cerrar_vela(cerrada)
+        return cerradas
+
+    def cargar(self, velas):
+        """
+        Carga velas en bloque (e.g., el historial inicial del almacén o de fetch_ohlcv)
+        sin disparar los avisos de cierre.
+
+        :param velas: Lista o array de velas [timestamp_ms, open, high, low, close, volume].
+        """
+        datos = np.asarray(velas, dtype=np.float64).reshape(-1, len(self.COLUMNAS))[-self.capacidad:]
+        with self._lock:
+            self._tamano = len(datos)
+            self._inicio = 0
+            self._timestamps[:self._tamano] = datos[:, 0].astype(np.int64)
+            self._valores[:self._tamano] = datos[:, 1:]
+
+    def como_arrays(self, solo_cerradas=False):
+        """
+        Devuelve las velas en orden cronológico como arrays por columna.
+
+        :param solo_cerradas: Si es True, excluye la vela abierta.
+        :return: Diccionario columna -> array de numpy (copia).
+        """
+        with self._lock:
+            tamano = self._tamano - 1 if solo_cerradas and self._tamano else self._tamano
+            orden = (self._inicio + np.arange(tamano)) % self.capacidad
+            columnas = {'timestamp': self._timestamps[orden]}
+            valores = self._valores[orden]
+        for indice, columna in enumerate(self.COLUMNAS[1:]):
+            columnas[columna] = valores[:, indice]
+        return columnas
+
+    def a_dataframe(self, solo_cerradas=False):
+        """
+        Devuelve las velas como DataFrame con el mismo formato que los CSV de historial,
+        de modo que el buffer puede usarse como fuente de ModeloPrediccion y AnalizadorETHBTC.
+
+        :param solo_cerradas: Si es True, excluye la vela abierta.
+        :return: DataFrame con columnas timestamp, open, high, low, close, volume.
+        """
+        columnas = self.como_arrays(solo_cerradas)
+        df = pd.DataFrame({columna: columnas[columna] for columna in self.COLUMNAS[1:]})
+        df.insert(0, 'timestamp', pd.to_datetime(columnas['timestamp'], unit='ms'))
+        return df
@@ -0,0 +1,244 @@
+import asyncio
+import threading
+import time
+from metricas import DISCREPANCIAS_SALDO
+
+class CacheSaldo:
+    def __init__(self, exchange=None, intervalo_conciliacion=300, tolerancia=1e-9):
+        """
+        Inicializa una caché en memoria del saldo de la cuenta.
+
+        El saldo se mantiene con el stream de datos de usuario (watch_balance de
+        ccxt.pro) y se concilia cada cierto tiempo con fetch_balance por si se perdió
+        algún evento. Las consultas de saldo libre o total por moneda son una búsqueda
+        en un diccionario y no llaman al exchange. Cada cambio de saldo se notifica a
+        los suscriptores (e.g., para registrarlo en un AlmacenSaldo).
+
+        :param exchange: Cliente para la conciliación REST (e.g., SesionBinance.exchange, que pasa
+                         por el planificador de peticiones). None = se usa el cliente del stream.
+        :param intervalo_conciliacion: Segundos entre conciliaciones con fetch_balance.
+        :param tolerancia: Diferencia mínima que se considera un cambio de saldo.
+        """
+        self.exchange = exchange
+        self.intervalo_conciliacion = intervalo_conciliacion
+        self.tolerancia = tolerancia
+        self._libre = {}
+        self._total = {}
+        self._suscriptores = []
+        self._vigente = False
+        self.conectado = False  # True mientras el stream de saldo está activo
+        self.actualizado_en = None
+        self.conciliado_en = None
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._bucle = None
+        self._tarea = None
+
+    @property
+    def vigente(self):
+        """
+        Indica si el saldo en memoria se puede usar sin consultar al exchange: el
+        stream está activo y no hay una orden propia pendiente de reflejarse.
+        """
+        return self._vigente and self.conectado
+
+    def libre(self, moneda):
+        """
+        Saldo disponible de una moneda (0 si no aparece en la cuenta).
+        """
+        return self._libre.get(moneda, 0.0)
+
+    def total(self, moneda):
+        """
+        Saldo total (disponible más bloqueado en órdenes) de una moneda.
+        """
+        return self._total.get(moneda, 0.0)
+
+    def libres(self, monedas):
+        """
+        Saldos disponibles de varias monedas leídos a la vez (e.g., las dos del par).
+
+        :return: Diccionario moneda -> saldo disponible.
+        """
+        with self._lock:
+            return {moneda: self._libre.get(moneda, 0.0) for moneda in monedas}
+
+    def balance(self):
+        """
+        Copia del saldo con la forma de fetch_balance ('free' y 'total'), para el código
+        que ya recibe un balance de ccxt.
+        """
+        with self._lock:
+            return {'free': dict(self._libre), 'total': dict(self._total), 'timestamp': self.actualizado_en}
+
+    def suscribir(self, funcion):
+        """
+        Registra una función que se llama tras cada cambio de saldo con un diccionario:
+        momento (epoch en segundos), origen ("stream" o "rest"), cambios (moneda -> saldo
+        total nuevo) y totales (saldo total de todas las monedas).
+
+        :param funcion: Función que recibe el evento. Se llama desde el hilo del stream.
+        """
+        self._suscriptores.append(funcion)
+
+    def invalidar(self):
+        """
+        Marca el saldo como pendiente de actualizar (e.g., tras enviar una orden): hasta
+        el siguiente evento del stream las lecturas deben consultar al exchange.
+        """
+        self._vigente = False
+
+    def actualizar(self, balance, origen="stream", completo=False):
+        """
+        Aplica un balance de ccxt a la caché. Las monedas que no vienen en el balance se
+        conservan, salvo si es completo (una respuesta de fetch_balance), en cuyo caso
+        pasan a 0.
+
+        :param balance: Balance con las claves 'free' y 'total' de ccxt.
+        :param origen: "stream" o "rest", para el evento de cambio.
+        :param completo: True si el balance contiene todas las monedas de la cuenta.
+        :return: Diccionario moneda -> saldo total de las monedas que cambiaron.
+        """
+        libres = {moneda: float(cantidad or 0.0) for moneda, cantidad in (balance.get('free') or {}).items()}
+        totales = {moneda: float(cantidad or 0.0) for moneda, cantidad in (balance.get('total') or {}).items()}
+        timestamp = balance.get('timestamp')
+        momento = timestamp / 1000 if timestamp else time.time()
+
+        with self._lock:
+            if completo:
+                for moneda in self._total.keys() - totales.keys():
+                    totales[moneda] = 0.0
+                    libres.setdefault(moneda, 0.0)
+            cambios = {moneda: cantidad for moneda, cantidad in totales.items()
+                       if abs(self._total.get(moneda, 0.0) - cantidad) > self.tolerancia}
+            self._libre.update(libres)
+            self._total.update(totales)
+            self.actualizado_en = momento
+            self._vigente = True
+            evento = {'momento': momento, 'origen': origen, 'cambios': cambios, 'totales': dict(self._total)}
+
+        if cambios:
+            for funcion in self._suscriptores:
+                try:
+                    funcion(evento)
+                except Exception as e:
+                    print(f"[ERROR] Error al notificar un cambio de saldo: {e}")
+        return cambios
+
+    def conciliar(self, balance):
+        """
+        Reemplaza la caché por un balance de fetch_balance y avisa si el stream se había
+        desviado (un evento perdido o una reconexión).
+
+        :param balance: Respuesta de fetch_balance.
+        :return: Diccionario con las monedas que no coincidían.
+        """
+        primera = self.conciliado_en is None
+        cambios = self.actualizar(balance, origen="rest", completo=True)
+        self.conciliado_en = time.time()
+        if cambios and not primera:
+            for moneda in cambios:
+                DISCREPANCIAS_SALDO.incrementar(moneda=moneda)
+            print(f"[WARN] Saldo corregido en la conciliación: {', '.join(sorted(cambios))}")
+        return cambios
+
+    async def conciliar_async(self, exchange):
+        """
+        Consulta fetch_balance sin bloquear el bucle de eventos y concilia la caché.
+
+        :param exchange: Cliente a usar si la caché no tiene uno propio para REST.
+        """
+        cliente = self.exchange if self.exchange is not None else exchange
+        if asyncio.iscoroutinefunction(cliente.fetch_balance):
+            balance = await cliente.fetch_balance()
+        else:
+            balance = await asyncio.to_thread(cliente.fetch_balance)
+        return self.conciliar(balance)
+
+    async def run_conciliacion(self, exchange):
+        """
+        Concilia la caché con fetch_balance cada intervalo_conciliacion segundos.
+        """
+        while True:
+            await asyncio.sleep(self.intervalo_conciliacion)
+            try:
+                await self.conciliar_async(exchange)
+            except Exception as e:
+                print(f"[ERROR] Error al conciliar el saldo: {e}")
+
+    async def run(self, exchange):
+        """
+        Mantiene la caché al día con watch_balance de ccxt.pro. Arranca con un
+        fetch_balance, y lo repite tras cada reconexión, para tener todas las monedas (el
+        stream solo envía las que cambian); además concilia periódicamente en una tarea aparte.
+
+        :param exchange: Cliente ccxt.pro.
+        """
+        conciliacion = asyncio.create_task(self.run_conciliacion(exchange))
+        try:
+            while True:
+                try:
+                    if not self.conectado:
+                        # Al (re)conectar se parte de un saldo completo
+                        await self.conciliar_async(exchange)
+                        self.conectado = True
+                    balance = await exchange.watch_balance()
+                    self.actualizar(balance)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Hasta reconectar las lecturas consultan al exchange
+                    self.conectado = False
+                    print(f"[ERROR] Error en el stream de saldo: {e}")
+                    await asyncio.sleep(5)
+        finally:
+            self.conectado = False
+            conciliacion.cancel()
+
+    async def run_con_cliente(self, crear_cliente):
+        """
+        Crea el cliente del stream, ejecuta run() hasta que se cancele y cierra el cliente.
+
+        :param crear_cliente: Función que crea el cliente ccxt.pro; se llama desde el bucle de
+                              eventos que lo va a usar para que el cliente quede ligado a él.
+        """
+        exchange = crear_cliente()
+        self._tarea = asyncio.current_task()
+        try:
+            await self.run(exchange)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await exchange.close()
+
+    def iniciar_en_hilo(self, crear_cliente):
+        """
+        Ejecuta run() en un hilo con su propio bucle de eventos, para los bots síncronos.
+
+        :param crear_cliente: Función que crea el cliente ccxt.pro; se llama dentro del hilo
+                              para que el cliente quede ligado a su bucle de eventos.
+        """
+        if self._hilo is not None:
+            return
+
+        def hilo():
+            self._bucle = asyncio.new_event_loop()
+            try:
+                self._bucle.run_until_complete(self.run_con_cliente(crear_cliente))
+            finally:
+                self._bucle.close()
+
+        self._hilo = threading.Thread(target=hilo, name="stream-saldo", daemon=True)
+        self._hilo.start()
+
+    def detener(self, espera=5):
+        """
+        Detiene el stream iniciado con iniciar_en_hilo.
+        """
+        if self._hilo is None:
+            return
+        if self._tarea is not None and self._bucle is not None and not self._bucle.is_closed():
+            self._bucle.call_soon_threadsafe(self._tarea.cancel)
+        self._hilo.join(espera)
+        self._hilo = None
+        self._tarea = None
@@ -0,0 +1,204 @@
+import asyncio
+import math
+import time
+import numpy as np
+
+class EscanerTriangular:
+    def __init__(self, mercados, comision=0.001, umbral_ganancia=0.0, monedas=None):
+        """
+        Inicializa el escáner de arbitraje triangular sobre los mercados spot de Binance.
+
+        Cada mercado BASE/COTIZADA aporta dos aristas al grafo de monedas: vender la
+        base al bid (BASE -> COTIZADA) y comprarla al ask (COTIZADA -> BASE), con
+        peso -log(tasa * (1 - comisión)). Un ciclo es rentable cuando la suma de sus
+        pesos es negativa. Los triángulos se enumeran una sola vez y se indexan por
+        símbolo, de modo que una actualización de bid/ask solo recalcula los
+        triángulos que pasan por ese símbolo.
+
+        :param mercados: Diccionario de mercados de ccxt (exchange.markets).
+        :param comision: Comisión por operación (default: 0.1% -> 0.001).
+        :param umbral_ganancia: Ganancia mínima del ciclo tras comisiones (en porcentaje).
+        :param monedas: Conjunto opcional de monedas a las que se limita el grafo.
+        """
+        self.comision = comision
+        self.umbral_ganancia = umbral_ganancia / 100  # Convertir porcentaje a decimal
+        # Suma de pesos por debajo de la cual un ciclo supera el umbral
+        self.limite_peso = -math.log1p(self.umbral_ganancia)
+        self.log_comision = -math.log1p(-comision)
+
+        self.simbolos = []
+        self.aristas = []  # (moneda_origen, moneda_destino, símbolo, lado)
+        for simbolo, mercado in mercados.items():
+            if not mercado.get('spot', True) or mercado.get('active') is False:
+                continue
+            base, cotizada = mercado['base'], mercado['quote']
+            if monedas is not None and (base not in monedas or cotizada not in monedas):
+                continue
+            self.simbolos.append(simbolo)
+            self.aristas.append((base, cotizada, simbolo, 'sell'))
+            self.aristas.append((cotizada, base, simbolo, 'buy'))
+        self.indice_simbolo = {simbolo: posicion for posicion, simbolo in enumerate(self.simbolos)}
+
+        # Sin precio, la arista no se puede recorrer
+        self.pesos = np.full(len(self.aristas), np.inf)
+        self.triangulos = self.enumerar_triangulos()
+        self.triangulos_por_simbolo = self.indexar_triangulos()
+        self.ultima_latencia = None
+        print(f"[INFO] Escáner triangular: {len(self.simbolos)} mercados, {len(self.triangulos)} triángulos.")
+
+    def enumerar_triangulos(self):
+        """
+        Enumera los ciclos de tres monedas A -> B -> C -> A. Cada ciclo se guarda una
+        sola vez (empezando por su arista de menor índice); el sentido contrario es
+        otro ciclo, con otras aristas.
+
+        :return: Array (triángulos, 3) con los índices de las aristas de cada ciclo.
+        """
+        salientes = {}
+        for indice, (origen, destino, _, _) in enumerate(self.aristas):
+            salientes.setdefault(origen, {})[destino] = indice
+
+        triangulos = []
+        for primera, (a, b, _, _) in enumerate(self.aristas):
+            for c, segunda in salientes.get(b, {}).items():
+                if c == a:
+                    continue
+                tercera = salientes.get(c, {}).get(a)
+                if tercera is not None and primera < segunda and primera < tercera:
+                    triangulos.append((primera, segunda, tercera))
+        return np.array(triangulos, dtype=np.int64).reshape(-1, 3)
+
+    def indexar_triangulos(self):
+        """
+        Construye el índice símbolo -> triángulos que lo usan.
+
+        :return: Lista (por posición de símbolo) de arrays de índices de triángulos.
+        """
+        # Las aristas 2i y 2i + 1 son las del símbolo i
+        simbolos = self.triangulos // 2
+        numeros = np.repeat(np.arange(len(self.triangulos)), 3)
+        orden = np.argsort(simbolos.ravel(), kind='stable')
+        planos = simbolos.ravel()[orden]
+        limites = np.searchsorted(planos, np.arange(len(self.simbolos) + 1))
+        return [np.unique(numeros[orden[limites[i]:limites[i + 1]]]) for i in range(len(self.simbolos))]
+
+    def fijar_precio(self, simbolo, bid, ask):
+        """
+        Actualiza los pesos de las dos aristas de un símbolo sin evaluar ciclos.
+
+        :return: Posición del símbolo o None si no forma parte del grafo.
+        """
+        posicion = self.indice_simbolo.get(simbolo)
+        if posicion is None:
+            return None
+        self.pesos[2 * posicion] = -math.log(bid) + self.log_comision if bid else np.inf
+        self.pesos[2 * posicion + 1] = math.log(ask) + self.log_comision if ask else np.inf
+        return posicion
+
+    def evaluar(self, indices):
+        """
+        Evalúa un conjunto de triángulos con los pesos actuales.
+
+        :param indices: Array de índices de triángulos.
+        :return: Lista de oportunidades ordenadas de mayor a menor ganancia.
+        """
+        if len(indices) == 0:
+            return []
+        sumas = self.pesos[self.triangulos[indices]].sum(axis=1)
+        rentables = np.flatnonzero(sumas < self.limite_peso)
+        rentables = rentables[np.argsort(sumas[rentables])]
+        return [self.describir(int(indices[k]), float(sumas[k])) for k in rentables]
+
+    def describir(self, triangulo, suma):
+        """
+        Describe un ciclo rentable.
+
+        :return: Diccionario con las monedas, los pasos (símbolo y lado) y la ganancia en porcentaje.
+        """
+        aristas = [self.aristas[indice] for indice in self.triangulos[triangulo]]
+        return {
+            'ciclo': [origen for origen, _, _, _ in aristas] + [aristas[0][0]],
+            'pasos': [(simbolo, lado) for _, _, simbolo, lado in aristas],
+            'ganancia_pct': math.expm1(-suma) * 100,
+        }
+
+    def actualizar(self, simbolo, bid, ask):
+        """
+        Actualiza el mejor bid/ask de un símbolo y recalcula solo los triángulos que lo usan.
+
+        :param simbolo: Símbolo del mercado (e.g., "ETH/BTC").
+        :param bid: Mejor precio de compra.
+        :param ask: Mejor precio de venta.
+        :return: Lista de oportunidades rentables tras comisiones.
+        """
+        inicio = time.perf_counter()
+        posicion = self.fijar_precio(simbolo, bid, ask)
+        oportunidades = [] if posicion is None else self.evaluar(self.triangulos_por_simbolo[posicion])
+        self.ultima_latencia = time.perf_counter() - inicio
+        return oportunidades
+
+    def actualizar_tickers(self, tickers):
+        """
+        Actualiza varios símbolos a la vez (e.g., el resultado de watch_tickers) y evalúa
+        una sola vez la unión de los triángulos afectados.
+
+        :param tickers: Diccionario símbolo -> ticker de ccxt con 'bid' y 'ask'.
+        :return: Lista de oportunidades rentables tras comisiones.
+        """
+        inicio = time.perf_counter()
+        afectados = []
+        for simbolo, ticker in tickers.items():
+            posicion = self.fijar_precio(simbolo, ticker.get('bid'), ticker.get('ask'))
+            if posicion is not None:
+                afectados.append(self.triangulos_por_simbolo[posicion])
+        indices = np.unique(np.concatenate(afectados)) if afectados else np.empty(0, dtype=np.int64)
+        oportunidades = self.evaluar(indices)
+        self.ultima_latencia = time.perf_counter() - inicio
+        return oportunidades
+
+    async def run(self, exchange, al_detectar=None, simbolos=None):
+        """
+        Mantiene los pesos al día con watch_tickers de ccxt.pro y avisa de cada oportunidad.
+
+        :param exchange: Cliente ccxt.pro con los mercados cargados.
+        :param al_detectar: Función opcional llamada con la lista de oportunidades detectadas.
+        :param simbolos: Símbolos a seguir (por defecto, todos los del grafo).
+        """
+        simbolos = simbolos or None  # None: todos los tickers en un único stream
+        while True:
+            try:
+                tickers = await exchange.watch_tickers(simbolos)
+                oportunidades = self.actualizar_tickers(tickers)
+                if oportunidades:
+                    if al_detectar is not None:
+                        al_detectar(oportunidades)
+                    else:
+                        self.mostrar_oportunidades(oportunidades)
+            except Exception as e:
+                print(f"[ERROR] Error en el stream de tickers: {e}")
+                await asyncio.sleep(5)
+
+    def mostrar_oportunidades(self, oportunidades, maximo=5):
+        """
+        Muestra las mejores oportunidades detectadas y la latencia de detección.
+
+        :param oportunidades: Lista de oportunidades.
+        :param maximo: Número máximo de oportunidades a mostrar.
+        """
+        for oportunidad in oportunidades[:maximo]:
+            pasos = ", ".join(f"{lado} {simbolo}" for simbolo, lado in oportunidad['pasos'])
+            print(f"[INFO] {' -> '.join(oportunidad['ciclo'])}: {oportunidad['ganancia_pct']:.4f}% ({pasos}) "
+                  f"detectada en {self.ultima_latencia * 1e6:.0f} µs")
+
+async def main():
+    import ccxt.pro as ccxtpro
+    exchange = ccxtpro.binance({'enableRateLimit': True, 'options': {'defaultType': 'spot'}})
+    try:
+        await exchange.load_markets()
+        escaner = EscanerTriangular(exchange.markets, comision=0.001)
+        await escaner.run(exchange)
+    finally:
+        await exchange.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,18 +1,26 @@
+import numpy as np
 import pandas as pd
-from tabulate import tabulate
+import motor_backtest
 
 class AnalizadorETHBTC:
-    def __init__(self, archivo_csv, cantidad_base=0.001, moneda_inicial="BTC"):
+    def __init__(self, archivo_csv, cantidad_base=0.001, moneda_inicial="BTC", fuente=None, par="ETH/BTC"):
         """
-        Inicializa el analizador para ETH/BTC.
+        Inicializa el analizador para ETH/BTC (o cualquier otro par base/cotizada).
 
         :param archivo_csv: Nombre del archivo CSV con los datos históricos.
         :param cantidad_base: Cantidad inicial para la simulación.
-        :param moneda_inicial: Moneda inicial de la simulación ("BTC" o "ETH").
+        :param moneda_inicial: Moneda inicial de la simulación (una de las dos del par, e.g., "BTC" o "ETH").
+        :param fuente: Fuente de velas opcional con método a_dataframe() (e.g., AlmacenVelas).
+        :param par: Par analizado (e.g., "ETH/BTC").
         """
         self.archivo_csv = archivo_csv
+        self.fuente = fuente
         self.cantidad_base = cantidad_base
-        self.moneda_inicial = moneda_inicial.upper()
+        self.par = par
+        self.base, self.cotizada = par.upper().split('/')
+        moneda_inicial = moneda_inicial.upper()
+        # El motor de backtest llama "BTC" a la moneda cotizada y "ETH" a la moneda base
+        self.moneda_inicial = {self.cotizada: "BTC", self.base: "ETH"}.get(moneda_inicial, moneda_inicial)
 
     def cargar_datos(self):
         """
@@ -21,8 +29,11 @@ class AnalizadorETHBTC:
         :return: DataFrame con los datos cargados.
         """
         try:
-            print(f"Cargando datos desde {self.archivo_csv}...")
-            datos = pd.read_csv(self.archivo_csv, parse_dates=['timestamp'])
+            if self.fuente is not None:
+                datos = self.fuente.a_dataframe()
+            else:
+                print(f"Cargando datos desde {self.archivo_csv}...")
+                datos = pd.read_csv(self.archivo_csv, parse_dates=['timestamp'])
             print(f"Datos cargados exitosamente: {len(datos)} registros.")
             return datos
         except Exception as e:
@@ -43,7 +54,7 @@ class AnalizadorETHBTC:
         elif self.moneda_inicial == "ETH":
             self.simular_desde_eth(datos, operaciones)
         else:
-            print("Moneda inicial no válida. Usa 'BTC' o 'ETH'.")
+            print(f"Moneda inicial no válida. Usa '{self.cotizada}' o '{self.base}'.")
             return []
 
         return operaciones
@@ -55,39 +66,30 @@ class AnalizadorETHBTC:
         :param datos: DataFrame con los datos históricos.
         :param operaciones: Lista donde se almacenarán las operaciones realizadas.
         """
-        btc_actual = self.cantidad_base
-        eth_actual = 0
-        en_posesion_eth = False
-
-        for i, fila in datos.iterrows():
-            precio_eth_btc = fila['close']
-
-            if not en_posesion_eth:
-                if i > 0 and fila['close'] < datos.iloc[i - 1]['close']:
-                    eth_actual = btc_actual / precio_eth_btc
-                    operaciones.append({
-                        'timestamp': fila['timestamp'],
-                        'accion': 'Comprar ETH',
-                        'precio_eth_btc': precio_eth_btc,
-                        'btc_usado': btc_actual,
-                        'eth_obtenido': eth_actual,
-                        'btc_final': 0
-                    })
-                    btc_actual = 0
-                    en_posesion_eth = True
+        indices, usados, obtenidos = motor_backtest.simular(datos['close'].to_numpy(), self.cantidad_base, "BTC")
+        timestamps = datos['timestamp'].iloc[indices].tolist()
+        precios = datos['close'].to_numpy()[indices].tolist()
+
+        for k, (timestamp, precio_eth_btc, usado, obtenido) in enumerate(
+                zip(timestamps, precios, usados.tolist(), obtenidos.tolist())):
+            if k % 2 == 0:
+                operaciones.append({
+                    'timestamp': timestamp,
+                    'accion': 'Comprar ETH',
+                    'precio_eth_btc': precio_eth_btc,
+                    'btc_usado': usado,
+                    'eth_obtenido': obtenido,
+                    'btc_final': 0
+                })
             else:
-                if i > 0 and fila['close'] > datos.iloc[i - 1]['close']:
-                    btc_actual = eth_actual * precio_eth_btc
-                    operaciones.append({
-                        'timestamp': fila['timestamp'],
-                        'accion': 'Vender ETH',
-                        'precio_eth_btc': precio_eth_btc,
-                        'eth_usado': eth_actual,
-                        'btc_obtenido': btc_actual,
-                        'btc_final': btc_actual
-                    })
-                    eth_actual = 0
-                    en_posesion_eth = False
+                operaciones.append({
+                    'timestamp': timestamp,
+                    'accion': 'Vender ETH',
+                    'precio_eth_btc': precio_eth_btc,
+                    'eth_usado': usado,
+                    'btc_obtenido': obtenido,
+                    'btc_final': obtenido
+                })
 
     def simular_desde_eth(self, datos, operaciones):
         """
@@ -96,39 +98,30 @@ class AnalizadorETHBTC:
         :param datos: DataFrame con los datos históricos.
         :param operaciones: Lista donde se almacenarán las operaciones realizadas.
         """
-        eth_actual = self.cantidad_base
-        btc_actual = 0
-        en_posesion_btc = False
-
-        for i, fila in datos.iterrows():
-            precio_eth_btc = fila['close']
-
-            if not en_posesion_btc:
-                if i > 0 and fila['close'] > datos.iloc[i - 1]['close']:
-                    btc_actual = eth_actual * precio_eth_btc
-                    operaciones.append({
-                        'timestamp': fila['timestamp'],
-                        'accion': 'Comprar BTC',
-                        'precio_eth_btc': precio_eth_btc,
-                        'eth_usado': eth_actual,
-                        'btc_obtenido': btc_actual,
-                        'eth_final': 0
-                    })
-                    eth_actual = 0
-                    en_posesion_btc = True
+        indices, usados, obtenidos = motor_backtest.simular(datos['close'].to_numpy(), self.cantidad_base, "ETH")
+        timestamps = datos['timestamp'].iloc[indices].tolist()
+        precios = datos['close'].to_numpy()[indices].tolist()
+
+        for k, (timestamp, precio_eth_btc, usado, obtenido) in enumerate(
+                zip(timestamps, precios, usados.tolist(), obtenidos.tolist())):
+            if k % 2 == 0:
+                operaciones.append({
+                    'timestamp': timestamp,
+                    'accion': 'Comprar BTC',
+                    'precio_eth_btc': precio_eth_btc,
+                    'eth_usado': usado,
+                    'btc_obtenido': obtenido,
+                    'eth_final': 0
+                })
             else:
-                if i > 0 and fila['close'] < datos.iloc[i - 1]['close']:
-                    eth_actual = btc_actual / precio_eth_btc
-                    operaciones.append({
-                        'timestamp': fila['timestamp'],
-                        'accion': 'Vender BTC',
-                        'precio_eth_btc': precio_eth_btc,
-                        'btc_usado': btc_actual,
-                        'eth_obtenido': eth_actual,
-                        'eth_final': eth_actual
-                    })
-                    btc_actual = 0
-                    en_posesion_btc = False
+                operaciones.append({
+                    'timestamp': timestamp,
+                    'accion': 'Vender BTC',
+                    'precio_eth_btc': precio_eth_btc,
+                    'btc_usado': usado,
+                    'eth_obtenido': obtenido,
+                    'eth_final': obtenido
+                })
 
     def filtrar_operaciones_favorables(self, operaciones):
         """
@@ -142,14 +135,48 @@ class AnalizadorETHBTC:
         elif self.moneda_inicial == "ETH":
             return [op for op in operaciones if op.get('eth_final', 0) > self.cantidad_base]
 
+    def operaciones_favorables_df(self, datos):
+        """
+        Simula y filtra las operaciones favorables construyendo directamente un
+        DataFrame a partir de los arrays del motor, sin pasar por la lista de
+        diccionarios. Equivale a filtrar_operaciones_favorables(simular_operaciones(datos)).
+
+        :param datos: DataFrame con los datos históricos.
+        :return: DataFrame con las operaciones favorables.
+        """
+        base, cotizada = self.base.lower(), self.cotizada.lower()
+        if self.moneda_inicial == "BTC":
+            columnas = (f'Vender {self.base}', f'{base}_usado', f'{cotizada}_obtenido', f'{cotizada}_final')
+        elif self.moneda_inicial == "ETH":
+            columnas = (f'Vender {self.cotizada}', f'{cotizada}_usado', f'{base}_obtenido', f'{base}_final')
+        else:
+            print(f"Moneda inicial no válida. Usa '{self.cotizada}' o '{self.base}'.")
+            return pd.DataFrame()
+
+        cierres = datos['close'].to_numpy()
+        indices, usados, obtenidos = motor_backtest.simular(cierres, self.cantidad_base, self.moneda_inicial)
+        # Solo las operaciones de vuelta a la moneda inicial tienen cantidad final distinta de 0
+        ventas = np.arange(1, len(indices), 2)
+        ventas = ventas[obtenidos[ventas] > self.cantidad_base]
+
+        accion, columna_usado, columna_obtenido, columna_final = columnas
+        return pd.DataFrame({
+            'timestamp': datos['timestamp'].to_numpy()[indices[ventas]],
+            'accion': accion,
+            f'precio_{base}_{cotizada}': cierres[indices[ventas]],
+            columna_usado: usados[ventas],
+            columna_obtenido: obtenidos[ventas],
+            columna_final: obtenidos[ventas],
+        })
+
     def guardar_operaciones_favorables(self, operaciones, archivo_salida="operaciones_favorables.csv"):
         """
         Guarda las operaciones favorables en un archivo CSV.
 
-        :param operaciones: Lista de operaciones favorables.
+        :param operaciones: Lista (o DataFrame) de operaciones favorables.
         :param archivo_salida: Nombre del archivo CSV donde se guardarán las operaciones.
         """
-        if not operaciones:
+        if len(operaciones) == 0:
             print("No se encontraron operaciones favorables para guardar.")
             return
 
@@ -157,18 +184,19 @@ class AnalizadorETHBTC:
         df.to_csv(archivo_salida, index=False)
         print(f"Operaciones favorables guardadas en {archivo_salida}.")
 
-    def ejecutar(self):
+    def ejecutar(self, archivo_salida="operaciones_favorables.csv"):
         """
         Ejecuta la simulación de operaciones.
+
+        :param archivo_salida: Nombre del archivo CSV donde se guardarán las operaciones favorables.
         """
         datos = self.cargar_datos()
         if datos.empty:
             print("No se pudieron cargar datos. Finalizando análisis.")
             return
 
-        operaciones = self.simular_operaciones(datos)
-        operaciones_favorables = self.filtrar_operaciones_favorables(operaciones)
-        self.guardar_operaciones_favorables(operaciones_favorables)
+        operaciones_favorables = self.operaciones_favorables_df(datos)
+        self.guardar_operaciones_favorables(operaciones_favorables, archivo_salida)
 
 if __name__ == "__main__":
     # Cambia "historial_ETH_BTC.csv" por el nombre de tu archivo generado.
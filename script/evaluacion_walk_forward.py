@@ -0,0 +1,228 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+from memoria_compartida import compartir_array, adjuntar_array, liberar
+from modelo_incremental import RegresionIncremental
+
+# Variables de entrada y objetivos, los mismos que usa ModeloPrediccion
+COLUMNAS_X = ['timestamp_num', 'open', 'close', 'volume']
+COLUMNAS_Y = ['high', 'low']
+VARIANTES = ('lineal', 'incremental')
+
+# Estado de cada proceso trabajador: arrays compartidos abiertos una sola vez
+_TRABAJADOR = {}
+
+def _inicializar_trabajador(descriptor_x, descriptor_y, factor_olvido):
+    """
+    Abre en el proceso trabajador las variables precalculadas por el proceso principal.
+    También importa scikit-learn aquí: si se importara en el primer pliegue 'lineal',
+    su importación contaría como tiempo de entrenamiento.
+    """
+    import sklearn.linear_model
+    import sklearn.preprocessing
+
+    bloque_x, X = adjuntar_array(descriptor_x)
+    bloque_y, Y = adjuntar_array(descriptor_y)
+    _TRABAJADOR.update({
+        'bloques': (bloque_x, bloque_y),
+        'X': X,
+        'Y': Y,
+        'factor_olvido': factor_olvido,
+    })
+
+def _ajustar(variante, X, Y, factor_olvido):
+    """
+    Ajusta una variante del modelo sobre la ventana de entrenamiento.
+
+    :return: Función que recibe X y devuelve la matriz (n, 2) de predicciones high/low.
+    """
+    if variante == 'lineal':
+        from sklearn.linear_model import LinearRegression
+        from sklearn.preprocessing import StandardScaler
+
+        escalador = StandardScaler().fit(X)
+        modelo = LinearRegression().fit(escalador.transform(X), Y)
+        return lambda X_prueba: modelo.predict(escalador.transform(X_prueba))
+
+    if variante == 'incremental':
+        regresion = RegresionIncremental(X.shape[1], Y.shape[1], factor_olvido)
+        regresion.actualizar_lote(X, Y)
+        escalador, modelos = regresion.resolver()
+        return lambda X_prueba: np.column_stack([modelo.predict(escalador.transform(X_prueba)) for modelo in modelos])
+
+    raise ValueError(f"Variante de modelo no reconocida: {variante}")
+
+def _evaluar_pliegue(tarea):
+    """
+    Entrena y evalúa una variante sobre un pliegue en el proceso trabajador.
+
+    :param tarea: Tupla (variante, pliegue, inicio, corte, fin): se entrena con las filas
+                  [inicio, corte) y se evalúa con [corte, fin).
+    :return: Diccionario con los errores y tiempos del pliegue.
+    """
+    variante, pliegue, inicio, corte, fin = tarea
+    X = _TRABAJADOR['X']
+    Y = _TRABAJADOR['Y']
+
+    momento = time.perf_counter()
+    predecir = _ajustar(variante, X[inicio:corte], Y[inicio:corte], _TRABAJADOR['factor_olvido'])
+    segundos_entrenamiento = time.perf_counter() - momento
+
+    momento = time.perf_counter()
+    predicciones = predecir(X[corte:fin])
+    segundos_prediccion = time.perf_counter() - momento
+
+    errores = predicciones - Y[corte:fin]
+    resultado = {
+        'variante': variante,
+        'pliegue': pliegue,
+        'filas_entrenamiento': corte - inicio,
+        'filas_prueba': fin - corte,
+    }
+    for indice, objetivo in enumerate(COLUMNAS_Y):
+        resultado[f'mae_{objetivo}'] = float(np.mean(np.abs(errores[:, indice])))
+        resultado[f'rmse_{objetivo}'] = float(np.sqrt(np.mean(errores[:, indice] ** 2)))
+    resultado['segundos_entrenamiento'] = segundos_entrenamiento
+    resultado['segundos_prediccion'] = segundos_prediccion
+    return resultado
+
+class EvaluacionWalkForward:
+    def __init__(self, archivo_csv, fuente=None, procesos=None):
+        """
+        Inicializa la evaluación walk-forward (origen móvil) de los modelos de predicción.
+
+        A diferencia del R² de entrenar_modelo, que sale de una partición aleatoria,
+        cada pliegue entrena solo con velas anteriores a las que evalúa.
+
+        :param archivo_csv: Nombre del archivo CSV con los datos históricos (historial_*.csv).
+        :param fuente: Fuente de velas opcional con método a_dataframe() (e.g., AlmacenVelas).
+        :param procesos: Número de procesos trabajadores (por defecto, todos los núcleos).
+        """
+        self.archivo_csv = archivo_csv
+        self.fuente = fuente
+        self.procesos = procesos or os.cpu_count()
+
+    def cargar_variables(self):
+        """
+        Carga el historial y calcula una sola vez las variables de todos los pliegues.
+
+        :return: Tupla (timestamps, X, Y) con X de forma (n, 4) e Y de forma (n, 2).
+        """
+        if self.fuente is not None:
+            datos = self.fuente.a_dataframe()
+        else:
+            print(f"Cargando datos desde {self.archivo_csv}...")
+            datos = pd.read_csv(self.archivo_csv, parse_dates=['timestamp'])
+        print(f"Datos cargados exitosamente: {len(datos)} registros.")
+
+        datos['timestamp_num'] = (datos['timestamp'] - pd.Timestamp(0)).dt.total_seconds()
+        X = datos[COLUMNAS_X].to_numpy(dtype=np.float64)
+        Y = datos[COLUMNAS_Y].to_numpy(dtype=np.float64)
+        return datos['timestamp'].to_numpy(), X, Y
+
+    @staticmethod
+    def generar_pliegues(num_filas, num_pliegues=5, tamano_prueba=None, ventana=None):
+        """
+        Genera los pliegues de origen móvil. Los bloques de prueba son consecutivos y
+        ocupan el final del historial; cada pliegue entrena con las filas anteriores
+        a su bloque de prueba.
+
+        :param num_filas: Número de velas del historial.
+        :param num_pliegues: Número de pliegues.
+        :param tamano_prueba: Velas por bloque de prueba (por defecto, el historial se
+                              divide en num_pliegues + 1 bloques).
+        :param ventana: Velas de entrenamiento por pliegue (None = ventana creciente desde el inicio).
+        :return: Lista de tuplas (inicio, corte, fin).
+        """
+        tamano_prueba = tamano_prueba or num_filas // (num_pliegues + 1)
+        primer_corte = num_filas - num_pliegues * tamano_prueba
+        if tamano_prueba <= 0 or primer_corte <= 1:
+            raise ValueError("No hay suficientes velas para el número de pliegues indicado.")
+
+        pliegues = []
+        for pliegue in range(num_pliegues):
+            corte = primer_corte + pliegue * tamano_prueba
+            inicio = 0 if ventana is None else max(0, corte - ventana)
+            pliegues.append((inicio, corte, corte + tamano_prueba))
+        return pliegues
+
+    def ejecutar(self, variantes=VARIANTES, num_pliegues=5, tamano_prueba=None, ventana=None, factor_olvido=1.0):
+        """
+        Ejecuta todos los pliegues de todas las variantes en paralelo. Las variables se
+        comparten por memoria compartida en lugar de recalcularse o enviarse en cada tarea.
+
+        :param variantes: Variantes de modelo a comparar ("lineal" y/o "incremental").
+        :param num_pliegues: Número de pliegues.
+        :param tamano_prueba: Velas por bloque de prueba.
+        :param ventana: Velas de entrenamiento por pliegue (None = ventana creciente).
+        :param factor_olvido: Factor de olvido de la variante incremental.
+        :return: DataFrame con una fila por variante y pliegue.
+        """
+        for variante in variantes:
+            if variante not in VARIANTES:
+                raise ValueError(f"Variante de modelo no reconocida: {variante}")
+
+        timestamps, X, Y = self.cargar_variables()
+        pliegues = self.generar_pliegues(len(X), num_pliegues, tamano_prueba, ventana)
+        tareas = [(variante, numero, *pliegue) for variante in variantes
+                  for numero, pliegue in enumerate(pliegues, start=1)]
+        print(f"[INFO] Evaluando {len(tareas)} pliegues ({', '.join(variantes)}) con {self.procesos} procesos...")
+
+        inicio = time.perf_counter()
+        bloque_x, descriptor_x = compartir_array(X)
+        bloque_y, descriptor_y = compartir_array(Y)
+        try:
+            with ProcessPoolExecutor(max_workers=min(self.procesos, len(tareas)), initializer=_inicializar_trabajador,
+                                     initargs=(descriptor_x, descriptor_y, factor_olvido)) as pool:
+                resultados = list(pool.map(_evaluar_pliegue, tareas))
+        finally:
+            liberar([bloque_x, bloque_y])
+        print(f"[INFO] Evaluación completada en {time.perf_counter() - inicio:.2f} segundos.")
+
+        tabla = pd.DataFrame(resultados)
+        tabla.insert(2, 'desde_prueba', [timestamps[corte] for _, _, _, corte, _ in tareas])
+        tabla.insert(3, 'hasta_prueba', [timestamps[fin - 1] for _, _, _, _, fin in tareas])
+        return tabla
+
+    @staticmethod
+    def resumir(tabla):
+        """
+        Resume los pliegues por variante (media de errores y tiempo total).
+
+        :param tabla: DataFrame devuelto por ejecutar.
+        :return: DataFrame con una fila por variante.
+        """
+        errores = [columna for columna in tabla.columns if columna.startswith(('mae_', 'rmse_'))]
+        resumen = tabla.groupby('variante')[errores].mean()
+        resumen['segundos_totales'] = tabla.groupby('variante')[['segundos_entrenamiento', 'segundos_prediccion']].sum().sum(axis=1)
+        return resumen.reset_index()
+
+    def guardar_resultados(self, tabla, archivo_salida="resultados_walk_forward.csv"):
+        """
+        Guarda los resultados por pliegue en un archivo CSV.
+
+        :param tabla: DataFrame con los resultados.
+        :param archivo_salida: Nombre del archivo CSV.
+        """
+        tabla.to_csv(archivo_salida, index=False)
+        print(f"Resultados de la evaluación guardados en {archivo_salida}.")
+
+    def mostrar_resultados(self, tabla):
+        """
+        Muestra los resultados por pliegue y el resumen por variante en formato tabular.
+
+        :param tabla: DataFrame con los resultados.
+        """
+        print("\nResultados por pliegue:")
+        print(tabulate(tabla, headers="keys", tablefmt="grid", showindex=False))
+        print("\nResumen por variante:")
+        print(tabulate(self.resumir(tabla), headers="keys", tablefmt="grid", showindex=False))
+
+if __name__ == "__main__":
+    evaluacion = EvaluacionWalkForward(archivo_csv="../datos/historial_ETH_BTC.csv")
+    tabla = evaluacion.ejecutar(variantes=VARIANTES, num_pliegues=5)
+    evaluacion.mostrar_resultados(tabla)
+    evaluacion.guardar_resultados(tabla, "../datos/resultados_walk_forward.csv")
@@ -0,0 +1,410 @@
+import asyncio
+import itertools
+import os
+import sys
+import time
+from datetime import datetime, timezone
+import ccxt
+import numpy as np
+import pandas as pd
+
+TIMEFRAMES_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '6h': 21_600_000, '8h': 28_800_000,
+    '12h': 43_200_000, '1d': 86_400_000, '3d': 259_200_000, '1w': 604_800_000,
+}
+
+class RelojVirtual:
+    def __init__(self, inicio_ms, velocidad=None):
+        """
+        Reloj del simulador en milisegundos.
+
+        :param inicio_ms: Momento virtual inicial (epoch en milisegundos).
+        :param velocidad: Milisegundos virtuales por milisegundo real. None = reloj manual,
+                          que solo avanza con avanzar()/fijar() y hace la simulación determinista.
+        """
+        self.velocidad = velocidad
+        self._base_virtual = inicio_ms
+        self._base_real = time.monotonic()
+
+    def ahora(self):
+        if self.velocidad is None:
+            return self._base_virtual
+        return self._base_virtual + int((time.monotonic() - self._base_real) * 1000 * self.velocidad)
+
+    def fijar(self, momento_ms):
+        """
+        Lleva el reloj a un momento virtual (nunca hacia atrás).
+        """
+        if momento_ms > self.ahora():
+            self._base_virtual = momento_ms
+            self._base_real = time.monotonic()
+
+    def avanzar(self, milisegundos):
+        self.fijar(self.ahora() + milisegundos)
+
+class ExchangeSimulado:
+    def __init__(self, historiales, timeframe="1h", saldo_inicial=None, comision=0.001, diferencial=0.0,
+                 latencia=0.0, velocidad=None, inicio_ms=None, velas_iniciales=500):
+        """
+        Exchange local que reproduce velas históricas con la parte de la API de ccxt que
+        usa el proyecto (load_markets, fetch_ohlcv, fetch_ticker, fetch_balance,
+        create_order y los watch_* de ccxt.pro), para ejecutar los bots sin cuenta de
+        Binance ni red.
+
+        El precio de un par en un momento virtual es la apertura de la vela en curso,
+        de modo que nunca se ve información futura: fetch_ohlcv devuelve las velas
+        cerradas y la vela en curso reducida a su apertura.
+
+        :param historiales: Diccionario par -> CSV de historial (historial_*.csv), DataFrame o
+                            fuente con método a_dataframe() (e.g., AlmacenVelas).
+        :param timeframe: Intervalo de las velas de los historiales.
+        :param saldo_inicial: Diccionario moneda -> cantidad (por defecto, 1 de la moneda cotizada de cada par).
+        :param comision: Comisión por operación, cobrada en la moneda recibida (default: 0.1% -> 0.001).
+        :param diferencial: Diferencial bid/ask relativo alrededor del precio (e.g., 0.0002; 0 = sin diferencial).
+        :param latencia: Segundos virtuales entre el envío de una orden y su ejecución.
+        :param velocidad: Milisegundos virtuales por milisegundo real (None = reloj manual).
+        :param inicio_ms: Momento virtual inicial (por defecto, tras velas_iniciales velas).
+        :param velas_iniciales: Velas visibles al empezar si no se indica inicio_ms.
+        """
+        self.id = 'simulado'
+        self.timeframe = timeframe
+        self.duracion_ms = TIMEFRAMES_MS[timeframe]
+        self.comision = comision
+        self.diferencial = diferencial
+        self.latencia_ms = int(latencia * 1000)
+        self.velas = {par: self.cargar_velas(historial) for par, historial in historiales.items()}
+
+        if inicio_ms is None:
+            inicio_ms = max(int(velas[min(velas_iniciales, len(velas) - 1), 0]) for velas in self.velas.values())
+        self.reloj = RelojVirtual(inicio_ms, velocidad)
+
+        if saldo_inicial is None:
+            saldo_inicial = {par.split('/')[1]: 1.0 for par in self.velas}
+        self.saldo = dict(saldo_inicial)
+        self.ordenes = []
+        self._ids = itertools.count(1)
+        self._version_saldo = 0
+        self._vistos = {}
+        self.markets = {}
+        self.currencies = {}
+        self.symbols = []
+        self.last_response_headers = {}
+
+    @staticmethod
+    def cargar_velas(historial):
+        """
+        Convierte un historial en un array (n, 6) [timestamp_ms, open, high, low, close, volume].
+        """
+        if isinstance(historial, str):
+            historial = pd.read_csv(historial, parse_dates=['timestamp'])
+        elif hasattr(historial, 'a_dataframe'):
+            historial = historial.a_dataframe()
+        timestamps = historial['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        columnas = [historial[columna].to_numpy(dtype=np.float64) for columna in ('open', 'high', 'low', 'close', 'volume')]
+        return np.column_stack([timestamps.astype(np.float64)] + columnas)
+
+    # --- Reloj ---
+
+    def milliseconds(self):
+        return self.reloj.ahora()
+
+    def iso8601(self, momento_ms):
+        return datetime.fromtimestamp(momento_ms / 1000, tz=timezone.utc).isoformat().replace('+00:00', 'Z')
+
+    def avanzar(self, segundos):
+        """
+        Avanza el reloj virtual.
+        """
+        self.reloj.avanzar(int(segundos * 1000))
+
+    def dormir(self, segundos):
+        """
+        Sustituto de time.sleep para los bucles de los bots: con reloj manual avanza el
+        reloj virtual al instante; con velocidad, espera el tiempo real equivalente.
+        """
+        if self.reloj.velocidad is None:
+            self.avanzar(segundos)
+        else:
+            time.sleep(segundos / self.reloj.velocidad)
+
+    # --- Mercados ---
+
+    def load_markets(self, reload=False, params={}):
+        if self.markets and not reload:
+            return self.markets
+        markets = {}
+        for par in self.velas:
+            base, cotizada = par.split('/')
+            markets[par] = {
+                'id': base + cotizada, 'symbol': par, 'base': base, 'quote': cotizada,
+                'baseId': base, 'quoteId': cotizada, 'active': True, 'type': 'spot', 'spot': True,
+                'taker': self.comision, 'maker': self.comision,
+                'precision': {'amount': 8, 'price': 8},
+                'limits': {'amount': {'min': 0.0, 'max': None}, 'cost': {'min': 0.0, 'max': None}},
+                'info': {},
+            }
+        monedas = sorted({moneda for par in self.velas for moneda in par.split('/')} | set(self.saldo))
+        self.set_markets(markets, {moneda: {'id': moneda, 'code': moneda, 'precision': 8} for moneda in monedas})
+        return self.markets
+
+    def set_markets(self, markets, currencies=None):
+        # Solo se aceptan los pares que el simulador puede reproducir
+        self.markets = {par: mercado for par, mercado in markets.items() if par in self.velas}
+        self.currencies = currencies or {}
+        self.symbols = sorted(self.markets)
+        return self.markets
+
+    def market(self, symbol):
+        if symbol not in self.velas:
+            raise ccxt.BadSymbol(f"{self.id} no tiene historial para {symbol}")
+        return self.markets.get(symbol) or self.load_markets()[symbol]
+
+    # --- Datos de mercado ---
+
+    def _posicion(self, symbol, momento_ms):
+        """
+        Índice de la vela en curso en un momento dado (-1 si aún no hay velas).
+        """
+        self.market(symbol)
+        return int(np.searchsorted(self.velas[symbol][:, 0], momento_ms, side='right')) - 1
+
+    def precio(self, symbol, momento_ms=None):
+        """
+        Precio de un par en un momento virtual: la apertura de la vela en curso.
+        """
+        posicion = self._posicion(symbol, self.milliseconds() if momento_ms is None else momento_ms)
+        if posicion < 0:
+            raise ccxt.ExchangeError(f"No hay precio para {symbol} antes del inicio del historial")
+        return float(self.velas[symbol][posicion, 1])
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params={}):
+        ahora = self.milliseconds()
+        fin = self._posicion(symbol, ahora) + 1
+        visibles = self.velas[symbol][:fin].copy()
+        if len(visibles):
+            # La vela en curso solo se conoce por su apertura
+            visibles[-1, 2:5] = visibles[-1, 1]
+            visibles[-1, 5] = 0.0
+
+        duracion = TIMEFRAMES_MS[timeframe]
+        if duracion != self.duracion_ms:
+            if duracion % self.duracion_ms:
+                raise ccxt.NotSupported(f"No se puede construir {timeframe} a partir de velas de {self.timeframe}")
+            visibles = self.agregar(visibles, duracion)
+
+        if since is not None:
+            visibles = visibles[visibles[:, 0] >= since]
+        if limit is not None:
+            visibles = visibles[:limit] if since is not None else visibles[-limit:]
+        return [[int(fila[0])] + fila[1:].tolist() for fila in visibles]
+
+    @staticmethod
+    def agregar(velas, duracion_ms):
+        """
+        Agrega velas a un intervalo mayor (e.g., de 1h a 1d).
+        """
+        if not len(velas):
+            return velas
+        grupos = (velas[:, 0] // duracion_ms).astype(np.int64)
+        inicios = np.flatnonzero(np.r_[True, grupos[1:] != grupos[:-1]])
+        finales = np.r_[inicios[1:], len(velas)] - 1
+        return np.column_stack([
+            grupos[inicios] * duracion_ms,
+            velas[inicios, 1],
+            np.maximum.reduceat(velas[:, 2], inicios),
+            np.minimum.reduceat(velas[:, 3], inicios),
+            velas[finales, 4],
+            np.add.reduceat(velas[:, 5], inicios),
+        ])
+
+    def fetch_ticker(self, symbol, params={}):
+        ahora = self.milliseconds()
+        precio = self.precio(symbol, ahora)
+        posicion = self._posicion(symbol, ahora)
+        dia = self.velas[symbol][max(0, posicion - 86_400_000 // self.duracion_ms):posicion]
+        return {
+            'symbol': symbol, 'timestamp': ahora, 'datetime': self.iso8601(ahora),
+            'last': precio, 'close': precio, 'open': float(dia[0, 1]) if len(dia) else precio,
+            'high': float(dia[:, 2].max()) if len(dia) else precio,
+            'low': float(dia[:, 3].min()) if len(dia) else precio,
+            'bid': precio * (1 - self.diferencial / 2), 'ask': precio * (1 + self.diferencial / 2),
+            'baseVolume': float(dia[:, 5].sum()) if len(dia) else 0.0, 'info': {},
+        }
+
+    def fetch_tickers(self, symbols=None, params={}):
+        return {symbol: self.fetch_ticker(symbol) for symbol in (symbols or self.velas)}
+
+    def fetch_order_book(self, symbol, limit=None, params={}):
+        """
+        Libro de un solo nivel por lado en el bid/ask del ticker, con el volumen de las
+        últimas 24 horas como cantidad: las órdenes simuladas se ejecutan enteras a ese precio.
+        """
+        ticker = self.fetch_ticker(symbol)
+        cantidad = ticker['baseVolume']
+        return {'symbol': symbol, 'bids': [[ticker['bid'], cantidad]], 'asks': [[ticker['ask'], cantidad]],
+                'timestamp': ticker['timestamp'], 'datetime': ticker['datetime'], 'nonce': None}
+
+    # --- Cuenta ---
+
+    def fetch_balance(self, params={}):
+        balance = {'info': {}, 'free': {}, 'used': {}, 'total': {}, 'timestamp': self.milliseconds()}
+        for moneda, cantidad in self.saldo.items():
+            balance[moneda] = {'free': cantidad, 'used': 0.0, 'total': cantidad}
+            balance['free'][moneda] = cantidad
+            balance['used'][moneda] = 0.0
+            balance['total'][moneda] = cantidad
+        return balance
+
+    def create_order(self, symbol, type, side, amount, price=None, params={}):
+        """
+        Ejecuta la orden por completo al bid/ask del momento de envío más la latencia,
+        cobrando la comisión en la moneda recibida. Las órdenes límite solo se aceptan
+        si son ejecutables al instante.
+        """
+        base, cotizada = self.market(symbol)['base'], self.market(symbol)['quote']
+        if side not in ('buy', 'sell'):
+            raise ccxt.InvalidOrder(f"Lado de orden no válido: {side}")
+        if amount is None or amount <= 0:
+            raise ccxt.InvalidOrder(f"Cantidad de orden no válida: {amount}")
+
+        ejecucion = self.milliseconds() + self.latencia_ms
+        referencia = self.precio(symbol, ejecucion)
+        precio = referencia * (1 + self.diferencial / 2) if side == 'buy' else referencia * (1 - self.diferencial / 2)
+        if type == 'limit':
+            if price is None or (side == 'buy' and price < precio) or (side == 'sell' and price > precio):
+                raise ccxt.NotSupported("El simulador solo ejecuta órdenes límite ejecutables al instante")
+            precio = price
+        elif type != 'market':
+            raise ccxt.NotSupported(f"Tipo de orden no soportado: {type}")
+
+        coste = amount * precio
+        if side == 'buy':
+            entregado, recibido, moneda_entregada, moneda_recibida = coste, amount, cotizada, base
+        else:
+            entregado, recibido, moneda_entregada, moneda_recibida = amount, coste, base, cotizada
+        # Margen relativo para los redondeos de los bots al gastar todo el saldo
+        if entregado > self.saldo.get(moneda_entregada, 0.0) * (1 + 1e-9):
+            raise ccxt.InsufficientFunds(f"Saldo insuficiente de {moneda_entregada}: "
+                                         f"{self.saldo.get(moneda_entregada, 0.0)} < {entregado}")
+
+        comision = recibido * self.comision
+        self.saldo[moneda_entregada] = max(0.0, self.saldo.get(moneda_entregada, 0.0) - entregado)
+        self.saldo[moneda_recibida] = self.saldo.get(moneda_recibida, 0.0) + recibido - comision
+        self._version_saldo += 1
+
+        orden = {
+            'id': str(next(self._ids)), 'clientOrderId': None, 'timestamp': ejecucion,
+            'datetime': self.iso8601(ejecucion), 'lastTradeTimestamp': ejecucion, 'symbol': symbol,
+            'type': type, 'side': side, 'price': precio, 'average': precio, 'amount': amount,
+            'filled': amount, 'remaining': 0.0, 'cost': coste, 'status': 'closed',
+            'fee': {'cost': comision, 'currency': moneda_recibida}, 'trades': [], 'info': {},
+        }
+        self.ordenes.append(orden)
+        return orden
+
+    # --- Streams (ccxt.pro) ---
+
+    async def _esperar_vela(self, clave, symbol):
+        """
+        Espera a la siguiente vela del par respecto a la última vista por este stream.
+        Con reloj manual, el propio stream hace avanzar el reloj hasta ella.
+        """
+        velas = self.velas[symbol]
+        visto = self._vistos.get(clave)
+        if visto is not None:
+            siguiente = int(np.searchsorted(velas[:, 0], visto, side='right'))
+            if siguiente >= len(velas):
+                raise ccxt.ExchangeError(f"Fin del historial de {symbol}")
+            objetivo = int(velas[siguiente, 0])
+            if self.reloj.velocidad is None:
+                self.reloj.fijar(objetivo)
+                await asyncio.sleep(0)
+            else:
+                while self.milliseconds() < objetivo:
+                    await asyncio.sleep(min(1.0, (objetivo - self.milliseconds()) / self.reloj.velocidad / 1000))
+        posicion = self._posicion(symbol, self.milliseconds())
+        self._vistos[clave] = int(velas[posicion, 0])
+
+    async def watch_ticker(self, symbol, params={}):
+        await self._esperar_vela(('ticker', symbol), symbol)
+        return self.fetch_ticker(symbol)
+
+    async def watch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params={}):
+        await self._esperar_vela(('ohlcv', symbol), symbol)
+        return self.fetch_ohlcv(symbol, self.timeframe)[-2:]
+
+    async def watch_balance(self, params={}):
+        version = self._version_saldo
+        while self._version_saldo == version:
+            await asyncio.sleep(0.01)
+        return self.fetch_balance()
+
+    async def close(self):
+        pass
+
+class ClienteSimuladoAsync:
+    METODOS_REST = ('load_markets', 'fetch_ohlcv', 'fetch_ticker', 'fetch_tickers', 'fetch_order_book', 'fetch_balance',
+                    'create_order')
+
+    def __init__(self, simulado):
+        """
+        Vista asíncrona de un ExchangeSimulado con la interfaz de un cliente de ccxt.pro:
+        las llamadas REST son corrutinas y los watch_* y el resto de atributos se
+        delegan sin cambios. Ambas vistas comparten reloj, saldo y órdenes.
+
+        :param simulado: ExchangeSimulado.
+        """
+        self.simulado = simulado
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self.simulado, nombre)
+        if nombre not in self.METODOS_REST:
+            return atributo
+
+        async def llamada(*args, **kwargs):
+            # Cede el bucle de eventos como lo haría una petición real
+            await asyncio.sleep(0)
+            return atributo(*args, **kwargs)
+        return llamada
+
+def simular_bot_master(historiales, datos_dir, ciclos=100, saldo_inicial=None, **opciones):
+    """
+    Ejecuta ciclos completos de BotMaster contra un ExchangeSimulado, a la velocidad
+    que permita la CPU: cada espera entre ciclos avanza el reloj virtual.
+
+    :param historiales: Diccionario par -> historial, como en ExchangeSimulado.
+    :param datos_dir: Carpeta de datos del bot simulado (distinta de la real).
+    :param ciclos: Número de ciclos a ejecutar.
+    :param saldo_inicial: Saldo inicial de la cuenta simulada.
+    :param opciones: Resto de parámetros de ExchangeSimulado (comision, latencia, ...).
+    :return: Tupla (exchange, bot_master) al terminar.
+    """
+    from bot_master import BotMaster
+
+    exchange = ExchangeSimulado(historiales, saldo_inicial=saldo_inicial, **opciones)
+    os.makedirs(datos_dir, exist_ok=True)
+    bot_master = BotMaster(tuple(historiales), exchange=exchange, datos_dir=datos_dir)
+    bot_master.intervalo = exchange.duracion_ms // 1000
+
+    # Operación inicial de cada par para que OrdenesBot no la pida por consola
+    momento = datetime.fromtimestamp(exchange.milliseconds() / 1000).isoformat()
+    for par, estado in bot_master.pares.items():
+        if estado.libro.ultima_operacion() is None:
+            cotizada = par.split('/')[1]
+            cantidad = exchange.saldo.get(cotizada, 0.0)
+            estado.libro.registrar({'timestamp': momento, 'moneda_inicial': cotizada, 'cantidad_inicial': cantidad,
+                                    'moneda_final': cotizada, 'cantidad_final': cantidad})
+
+    inicio_virtual, inicio = exchange.milliseconds(), time.perf_counter()
+    bot_master.run(ciclos=ciclos)
+    segundos = time.perf_counter() - inicio
+    horas = (exchange.milliseconds() - inicio_virtual) / 3_600_000
+    print(f"[INFO] Simulación: {ciclos} ciclos, {horas:.0f} horas simuladas en {segundos:.2f} segundos "
+          f"({horas / segundos:.1f} h/s), {len(exchange.ordenes)} órdenes. Saldo final: {exchange.saldo}")
+    return exchange, bot_master
+
+if __name__ == "__main__":
+    simular_bot_master({"ETH/BTC": "../datos/historial_ETH_BTC.csv"}, datos_dir="../datos/simulacion/",
+                       ciclos=int(sys.argv[1]) if len(sys.argv) > 1 else 100, saldo_inicial={"BTC": 0.01},
+                       latencia=0.2)
@@ -0,0 +1,188 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+import pandas as pd
+
+class AlmacenSaldo:
+    # Niveles de agregación: (tabla, tamaño del bucket en segundos, retención en segundos o None)
+    NIVELES = (
+        ('saldo_minuto', 60, 30 * 86400),
+        ('saldo_hora', 3600, 365 * 86400),
+        ('saldo_dia', 86400, None),
+    )
+
+    def __init__(self, archivo_db="../datos/saldo_binance.db", retencion_cambios=2 * 86400,
+                 archivo_csv_inicial=None):
+        """
+        Inicializa el almacén de saldos: una serie temporal solo de anexado que
+        guarda únicamente los cambios de saldo y los agrega en buckets de minuto,
+        hora y día con retención configurable.
+
+        :param archivo_db: Archivo SQLite donde se guarda la serie.
+        :param retencion_cambios: Segundos que se conservan los cambios sin agregar.
+        :param archivo_csv_inicial: CSV de saldos existente (e.g., saldo_binance.csv) a importar
+                                    la primera vez que se crea la base de datos.
+        """
+        nueva = not os.path.exists(archivo_db)
+        self.archivo_db = archivo_db
+        self.retencion_cambios = retencion_cambios
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(archivo_db, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self.crear_tablas()
+        self.estado = dict(self._conexion.execute("SELECT symbol, amount FROM estado").fetchall())
+        self._ultima_compactacion = 0
+
+        if nueva and archivo_csv_inicial and os.path.exists(archivo_csv_inicial):
+            self.importar_csv(archivo_csv_inicial)
+
+    def crear_tablas(self):
+        """
+        Crea las tablas e índices si no existen.
+        """
+        with self._conexion:
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS estado (symbol TEXT PRIMARY KEY, amount REAL, ts REAL)")
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS cambios (ts REAL, symbol TEXT, amount REAL)")
+            self._conexion.execute(
+                "CREATE INDEX IF NOT EXISTS idx_cambios_symbol_ts ON cambios (symbol, ts)")
+            self._conexion.execute(
+                "CREATE INDEX IF NOT EXISTS idx_cambios_ts ON cambios (ts)")
+            for tabla, _, _ in self.NIVELES:
+                self._conexion.execute(
+                    f"CREATE TABLE IF NOT EXISTS {tabla} "
+                    f"(bucket INTEGER, symbol TEXT, amount REAL, PRIMARY KEY (symbol, bucket))")
+                self._conexion.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{tabla}_bucket ON {tabla} (bucket)")
+
+    @staticmethod
+    def a_segundos(momento):
+        """
+        Convierte un momento (epoch en segundos, datetime o texto ISO) a epoch en segundos.
+        """
+        if momento is None:
+            return time.time()
+        if isinstance(momento, (int, float)):
+            return float(momento)
+        if isinstance(momento, str):
+            momento = datetime.fromisoformat(momento)
+        return momento.timestamp()
+
+    def registrar(self, saldos, momento=None):
+        """
+        Registra un snapshot de saldos guardando solo los símbolos que cambiaron.
+        Los símbolos que desaparecen del snapshot se registran con saldo 0.
+
+        :param saldos: Diccionario símbolo -> cantidad.
+        :param momento: Momento del snapshot (por defecto, ahora).
+        :return: Diccionario con los cambios registrados.
+        """
+        ts = self.a_segundos(momento)
+        cambios = {symbol: amount for symbol, amount in saldos.items() if self.estado.get(symbol) != amount}
+        cambios.update({symbol: 0 for symbol, amount in self.estado.items() if symbol not in saldos and amount != 0})
+        if not cambios:
+            return cambios
+
+        filas = [(ts, symbol, amount) for symbol, amount in cambios.items()]
+        with self._lock, self._conexion:
+            self._conexion.executemany("INSERT INTO cambios (ts, symbol, amount) VALUES (?, ?, ?)", filas)
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO estado (symbol, amount, ts) VALUES (?, ?, ?)",
+                [(symbol, amount, ts) for ts, symbol, amount in filas])
+            for tabla, tamano, _ in self.NIVELES:
+                bucket = int(ts // tamano * tamano)
+                # El valor de cada bucket es el saldo al cierre del bucket
+                self._conexion.executemany(
+                    f"INSERT OR REPLACE INTO {tabla} (bucket, symbol, amount) VALUES (?, ?, ?)",
+                    [(bucket, symbol, amount) for _, symbol, amount in filas])
+        self.estado.update(cambios)
+
+        if ts - self._ultima_compactacion > 3600:
+            self.compactar(ts)
+        return cambios
+
+    def compactar(self, ahora=None):
+        """
+        Elimina los cambios y buckets que superan su retención; su información
+        queda representada en el siguiente nivel de agregación.
+
+        :param ahora: Momento de referencia (por defecto, ahora).
+        """
+        ahora = self.a_segundos(ahora)
+        with self._lock, self._conexion:
+            self._conexion.execute("DELETE FROM cambios WHERE ts < ?", (ahora - self.retencion_cambios,))
+            for tabla, _, retencion in self.NIVELES:
+                if retencion is not None:
+                    self._conexion.execute(f"DELETE FROM {tabla} WHERE bucket < ?", (ahora - retencion,))
+        self._ultima_compactacion = ahora
+
+    def saldo_en(self, momento):
+        """
+        Devuelve el saldo de cada símbolo en un momento dado usando los índices,
+        sin cargar el historial. Se usa el dato más preciso disponible: el cambio
+        exacto si sigue dentro de la retención, o el último bucket cerrado.
+
+        :param momento: Momento a consultar (epoch en segundos, datetime o texto ISO).
+        :return: Diccionario símbolo -> cantidad (solo saldos distintos de 0).
+        """
+        ts = self.a_segundos(momento)
+        saldos = {}
+        with self._lock:
+            for symbol in self.estado:
+                candidatos = []
+                fila = self._conexion.execute(
+                    "SELECT ts, amount FROM cambios WHERE symbol = ? AND ts <= ? ORDER BY ts DESC LIMIT 1",
+                    (symbol, ts)).fetchone()
+                if fila:
+                    candidatos.append(fila)
+                for tabla, tamano, _ in self.NIVELES:
+                    fila = self._conexion.execute(
+                        f"SELECT bucket + ?, amount FROM {tabla} WHERE symbol = ? AND bucket <= ? "
+                        f"ORDER BY bucket DESC LIMIT 1",
+                        (tamano, symbol, ts - tamano)).fetchone()
+                    if fila:
+                        candidatos.append(fila)
+                if candidatos:
+                    saldos[symbol] = max(candidatos)[1]
+        return {symbol: amount for symbol, amount in saldos.items() if amount}
+
+    def serie(self, desde, hasta=None, nivel='saldo_hora', symbol=None):
+        """
+        Devuelve la serie de saldos agregada para un rango de tiempo.
+
+        :param desde: Inicio del rango.
+        :param hasta: Fin del rango (por defecto, ahora).
+        :param nivel: Tabla de agregación ('saldo_minuto', 'saldo_hora' o 'saldo_dia') o 'cambios'.
+        :param symbol: Símbolo a consultar (por defecto, todos).
+        :return: DataFrame con columnas timestamp, symbol, amount.
+        """
+        if nivel != 'cambios' and nivel not in [tabla for tabla, _, _ in self.NIVELES]:
+            raise ValueError(f"Nivel de agregación no reconocido: {nivel}")
+        columna = 'ts' if nivel == 'cambios' else 'bucket'
+        consulta = f"SELECT {columna}, symbol, amount FROM {nivel} WHERE {columna} >= ? AND {columna} <= ?"
+        parametros = [self.a_segundos(desde), self.a_segundos(hasta)]
+        if symbol is not None:
+            consulta += " AND symbol = ?"
+            parametros.append(symbol)
+        consulta += f" ORDER BY {columna}"
+
+        with self._lock:
+            filas = self._conexion.execute(consulta, parametros).fetchall()
+        df = pd.DataFrame(filas, columns=['timestamp', 'symbol', 'amount'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+        return df
+
+    def importar_csv(self, archivo_csv):
+        """
+        Importa un CSV de saldos con columnas timestamp, symbol, amount.
+
+        :param archivo_csv: Archivo CSV a importar.
+        """
+        print(f"Importando saldos desde {archivo_csv}...")
+        df = pd.read_csv(archivo_csv)
+        for timestamp, grupo in df.groupby('timestamp', sort=True):
+            self.registrar(dict(zip(grupo['symbol'], grupo['amount'])), timestamp)
+        print(f"Saldos importados: {df['timestamp'].nunique()} snapshots.")
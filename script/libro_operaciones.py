@@ -0,0 +1,215 @@
+import csv
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+class LibroOperaciones:
+    COLUMNAS = ('timestamp', 'moneda_inicial', 'cantidad_inicial', 'moneda_final', 'cantidad_final')
+    # PRAGMA user_version del libro: 1 = CSV inicial importado (o no había nada que importar)
+    VERSION_IMPORTADO = 1
+
+    def __init__(self, archivo_db="../datos/operaciones.db", archivo_csv_inicial=None):
+        """
+        Inicializa el libro de operaciones respaldado por SQLite.
+
+        La última operación y los agregados (número de operaciones y PnL por moneda)
+        se mantienen en memoria, de modo que consultarlos no depende del tamaño del
+        historial. Cada operación se confirma en disco antes de devolver el control
+        (WAL con synchronous=FULL).
+
+        :param archivo_db: Archivo SQLite del libro.
+        :param archivo_csv_inicial: CSV de operaciones existente (e.g., operaciones.csv) a importar
+                                    mientras el libro no tenga registrada una importación completa.
+        """
+        self.archivo_db = archivo_db
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(archivo_db, check_same_thread=False)
+        self._conexion.row_factory = sqlite3.Row
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=FULL")
+        with self._conexion:
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS operaciones ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, ts REAL, "
+                "moneda_inicial TEXT, cantidad_inicial REAL, moneda_final TEXT, cantidad_final REAL, "
+                "pnl REAL, extra TEXT)")
+            self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_operaciones_ts ON operaciones (ts)")
+
+        self.cargar_estado()
+        if self._conexion.execute("PRAGMA user_version").fetchone()[0] < self.VERSION_IMPORTADO:
+            if archivo_csv_inicial and os.path.exists(archivo_csv_inicial) and self.total_operaciones == 0:
+                self.importar_csv(archivo_csv_inicial)
+            else:
+                # Sin CSV, o un libro anterior a la marca de importación que ya tiene operaciones
+                self._conexion.execute(f"PRAGMA user_version = {self.VERSION_IMPORTADO}")
+
+    def cargar_estado(self):
+        """
+        Carga en memoria la última operación y los agregados del libro.
+        """
+        fila = self._conexion.execute("SELECT * FROM operaciones ORDER BY id DESC LIMIT 1").fetchone()
+        self.ultima = self._fila_a_operacion(fila) if fila else None
+        self.total_operaciones = self._conexion.execute("SELECT COUNT(*) FROM operaciones").fetchone()[0]
+        self.pnl_acumulado = {
+            moneda: total for moneda, total in self._conexion.execute(
+                "SELECT moneda_final, SUM(pnl) FROM operaciones WHERE pnl IS NOT NULL GROUP BY moneda_final")
+        }
+
+    @staticmethod
+    def _fila_a_operacion(fila):
+        """
+        Convierte una fila de la base de datos en el diccionario de la operación.
+        """
+        operacion = {columna: fila[columna] for columna in LibroOperaciones.COLUMNAS}
+        if fila['extra']:
+            operacion.update(json.loads(fila['extra']))
+        return operacion
+
+    def calcular_pnl(self, operacion):
+        """
+        Calcula la ganancia de una operación que cierra un ciclo: cuando se vuelve a la
+        moneda entregada en la operación anterior, es la diferencia entre lo obtenido
+        ahora y lo entregado entonces.
+
+        :param operacion: Diccionario de la operación a registrar.
+        :return: PnL en la moneda final o None si la operación no cierra un ciclo.
+        """
+        anterior = self.ultima
+        if (anterior is None or operacion.get('moneda_final') is None
+                or operacion.get('moneda_inicial') == operacion.get('moneda_final')
+                or anterior.get('moneda_inicial') != operacion.get('moneda_final')
+                or anterior.get('cantidad_inicial') is None):
+            return None
+        return float(operacion['cantidad_final']) - float(anterior['cantidad_inicial'])
+
+    def _preparar(self, operacion):
+        """
+        Normaliza una operación (timestamp por defecto, cantidades numéricas) y separa
+        las claves que no son columnas del libro.
+
+        :return: Tupla (operación, extra).
+        """
+        operacion = dict(operacion)
+        operacion.setdefault('timestamp', datetime.now().isoformat())
+        for columna in ('cantidad_inicial', 'cantidad_final'):
+            if operacion.get(columna) not in (None, ''):
+                operacion[columna] = float(operacion[columna])
+        extra = {clave: valor for clave, valor in operacion.items() if clave not in self.COLUMNAS}
+        return operacion, extra
+
+    def registrar(self, operacion):
+        """
+        Registra una operación. Las claves que no son columnas del libro se guardan como extra.
+
+        :param operacion: Diccionario con timestamp, moneda_inicial, cantidad_inicial,
+                          moneda_final, cantidad_final y campos adicionales opcionales.
+        """
+        operacion, extra = self._preparar(operacion)
+
+        with self._lock:
+            with self._conexion:
+                self._insertar(operacion, extra)
+
+    def _insertar(self, operacion, extra):
+        """
+        Inserta una operación en la transacción en curso y actualiza el estado en memoria.
+        """
+        pnl = self.calcular_pnl(operacion)
+        self._conexion.execute(
+            "INSERT INTO operaciones (timestamp, ts, moneda_inicial, cantidad_inicial, moneda_final, "
+            "cantidad_final, pnl, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (operacion['timestamp'], datetime.fromisoformat(operacion['timestamp']).timestamp(),
+             operacion.get('moneda_inicial'), operacion.get('cantidad_inicial'),
+             operacion.get('moneda_final'), operacion.get('cantidad_final'),
+             pnl, json.dumps(extra) if extra else None))
+
+        self.ultima = operacion
+        self.total_operaciones += 1
+        if pnl is not None:
+            moneda = operacion['moneda_final']
+            self.pnl_acumulado[moneda] = self.pnl_acumulado.get(moneda, 0.0) + pnl
+
+    def ultima_operacion(self):
+        """
+        Devuelve la última operación registrada (en memoria, O(1)) o None.
+        """
+        return self.ultima
+
+    @staticmethod
+    def _a_timestamp(momento):
+        if momento is None:
+            return None
+        if isinstance(momento, (int, float)):
+            return float(momento)
+        if isinstance(momento, str):
+            momento = datetime.fromisoformat(momento)
+        return momento.timestamp()
+
+    def _condicion_rango(self, desde, hasta):
+        condiciones = []
+        parametros = []
+        if desde is not None:
+            condiciones.append("ts >= ?")
+            parametros.append(self._a_timestamp(desde))
+        if hasta is not None:
+            condiciones.append("ts < ?")
+            parametros.append(self._a_timestamp(hasta))
+        return (" WHERE " + " AND ".join(condiciones)) if condiciones else "", parametros
+
+    def rango(self, desde=None, hasta=None):
+        """
+        Devuelve las operaciones dentro de un rango de tiempo usando el índice sobre ts.
+
+        :param desde: Inicio del rango (incluido); epoch, datetime o texto ISO.
+        :param hasta: Fin del rango (excluido).
+        :return: Lista de diccionarios de operaciones.
+        """
+        condicion, parametros = self._condicion_rango(desde, hasta)
+        with self._lock:
+            filas = self._conexion.execute(
+                f"SELECT * FROM operaciones{condicion} ORDER BY ts, id", parametros).fetchall()
+        return [self._fila_a_operacion(fila) for fila in filas]
+
+    def pnl(self, desde=None, hasta=None):
+        """
+        Devuelve el PnL por moneda. Sin rango se responde desde los agregados en memoria.
+
+        :param desde: Inicio del rango (incluido).
+        :param hasta: Fin del rango (excluido).
+        :return: Diccionario moneda -> PnL.
+        """
+        if desde is None and hasta is None:
+            return dict(self.pnl_acumulado)
+
+        condicion, parametros = self._condicion_rango(desde, hasta)
+        condicion = (condicion + " AND" if condicion else " WHERE") + " pnl IS NOT NULL"
+        with self._lock:
+            filas = self._conexion.execute(
+                f"SELECT moneda_final, SUM(pnl) FROM operaciones{condicion} GROUP BY moneda_final",
+                parametros).fetchall()
+        return {moneda: total for moneda, total in filas}
+
+    def importar_csv(self, archivo_csv):
+        """
+        Importa un CSV de operaciones existente en una sola transacción que también marca
+        el libro como importado (PRAGMA user_version). Si la importación falla no queda
+        ninguna fila y se reintenta en el siguiente arranque.
+
+        :param archivo_csv: Archivo CSV de operaciones.
+        """
+        print(f"Importando operaciones desde {archivo_csv}...")
+        with open(archivo_csv, mode="r") as f:
+            operaciones = list(csv.DictReader(f))
+        with self._lock:
+            try:
+                with self._conexion:
+                    for operacion in operaciones:
+                        self._insertar(*self._preparar(operacion))
+                    self._conexion.execute(f"PRAGMA user_version = {self.VERSION_IMPORTADO}")
+            except Exception:
+                # La transacción se deshizo: el estado en memoria vuelve a leerse de la base
+                self.cargar_estado()
+                raise
+        print(f"Operaciones importadas: {len(operaciones)}.")
@@ -0,0 +1,238 @@
+import asyncio
+import json
+import threading
+import numpy as np
+
+class DesfaseLibro(Exception):
+    """
+    Se lanza cuando falta alguna actualización del stream de diferencias del libro.
+    """
+
+class LibroL2:
+    LADOS = ('bids', 'asks')
+
+    def __init__(self, par, profundidad=5000):
+        """
+        Inicializa un libro de órdenes L2 en memoria para un par.
+
+        Cada lado se guarda como dos arrays de numpy (precios y cantidades) ordenados
+        por clave: el precio en asks y el precio negado en bids, de modo que el
+        primer nivel es siempre el mejor. Las sumas acumuladas de cantidad e importe
+        se calculan al consultar y se reutilizan hasta la siguiente actualización, así
+        que cada consulta de precio medio es una búsqueda binaria.
+
+        :param par: Par de criptomonedas (e.g., "ETH/BTC").
+        :param profundidad: Número máximo de niveles que se conservan por lado.
+        """
+        self.par = par
+        self.profundidad = profundidad
+        self.claves = {lado: np.empty(0) for lado in self.LADOS}
+        self.cantidades = {lado: np.empty(0) for lado in self.LADOS}
+        self._acumulados = {lado: None for lado in self.LADOS}
+        self.nonce = None
+        self.timestamp = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _signo(lado):
+        return -1.0 if lado == 'bids' else 1.0
+
+    def precios(self, lado):
+        """
+        Precios de un lado, del mejor al peor.
+        """
+        return self.claves[lado] * self._signo(lado)
+
+    @staticmethod
+    def _niveles(niveles):
+        """
+        Convierte una lista de niveles [precio, cantidad, ...] en un array (n, 2).
+        """
+        if not len(niveles):
+            return np.empty((0, 2))
+        return np.asarray(niveles, dtype=np.float64).reshape(len(niveles), -1)[:, :2]
+
+    def _fijar_lado(self, lado, claves, cantidades):
+        orden = np.argsort(claves, kind='stable')[:self.profundidad]
+        self.claves[lado] = claves[orden]
+        self.cantidades[lado] = cantidades[orden]
+        self._acumulados[lado] = None
+
+    def cargar_snapshot(self, bids, asks, nonce=None, timestamp=None):
+        """
+        Reemplaza el libro completo (e.g., con fetch_order_book o el libro de watch_order_book).
+
+        :param bids: Lista de niveles [precio, cantidad] de compra.
+        :param asks: Lista de niveles [precio, cantidad] de venta.
+        :param nonce: Identificador de actualización del snapshot (lastUpdateId en Binance).
+        :param timestamp: Momento del snapshot en milisegundos.
+        """
+        with self._lock:
+            for lado, niveles in zip(self.LADOS, (bids, asks)):
+                niveles = self._niveles(niveles)
+                niveles = niveles[niveles[:, 1] > 0]
+                self._fijar_lado(lado, niveles[:, 0] * self._signo(lado), niveles[:, 1])
+            self.nonce = nonce
+            self.timestamp = timestamp
+
+    def aplicar_diferencias(self, bids, asks, nonce=None, timestamp=None):
+        """
+        Aplica una actualización incremental: cada nivel [precio, cantidad] reemplaza al
+        existente y una cantidad 0 lo elimina. Se ignoran las actualizaciones con un
+        nonce anterior o igual al del libro.
+
+        :param bids: Niveles de compra modificados.
+        :param asks: Niveles de venta modificados.
+        :param nonce: Identificador de la última actualización incluida.
+        :param timestamp: Momento de la actualización en milisegundos.
+        :return: True si la actualización se aplicó.
+        """
+        with self._lock:
+            if nonce is not None and self.nonce is not None and nonce <= self.nonce:
+                return False
+            for lado, niveles in zip(self.LADOS, (bids, asks)):
+                if not len(niveles):
+                    continue
+                niveles = self._niveles(niveles)
+                claves_nuevas = niveles[:, 0] * self._signo(lado)
+                conservar = ~np.isin(self.claves[lado], claves_nuevas)
+                visibles = niveles[:, 1] > 0
+                self._fijar_lado(lado,
+                                 np.concatenate([self.claves[lado][conservar], claves_nuevas[visibles]]),
+                                 np.concatenate([self.cantidades[lado][conservar], niveles[visibles, 1]]))
+            if nonce is not None:
+                self.nonce = nonce
+            self.timestamp = timestamp or self.timestamp
+            return True
+
+    def mejor_precio(self, lado):
+        """
+        Mejor precio de un lado ('bids' o 'asks') o None si está vacío.
+        """
+        claves = self.claves[lado]
+        return float(claves[0] * self._signo(lado)) if len(claves) else None
+
+    def _acumulado(self, lado):
+        acumulados = self._acumulados[lado]
+        if acumulados is None:
+            cantidades = self.cantidades[lado]
+            acumulados = (np.cumsum(cantidades), np.cumsum(cantidades * self.precios(lado)))
+            self._acumulados[lado] = acumulados
+        return acumulados
+
+    def _resultado(self, lado, cantidad, importe, niveles):
+        precio_medio = importe / cantidad
+        mejor = self.mejor_precio(lado)
+        # Positivo cuando el precio medio es peor que el mejor precio del libro
+        deslizamiento = (precio_medio / mejor - 1) * self._signo(lado)
+        return {'cantidad': cantidad, 'importe': importe, 'precio_medio': precio_medio,
+                'deslizamiento': deslizamiento, 'niveles': niveles}
+
+    def precio_medio(self, lado_orden, cantidad):
+        """
+        Precio medio de ejecución y deslizamiento de una orden de mercado por una
+        cantidad de moneda base.
+
+        :param lado_orden: 'buy' (consume asks) o 'sell' (consume bids).
+        :param cantidad: Cantidad de moneda base.
+        :return: Diccionario con cantidad, importe, precio_medio, deslizamiento (fracción)
+                 y niveles consumidos, o None si el libro no tiene profundidad suficiente.
+        """
+        lado = 'asks' if lado_orden == 'buy' else 'bids'
+        with self._lock:
+            if cantidad <= 0 or not len(self.claves[lado]):
+                return None
+            cantidad_acumulada, importe_acumulado = self._acumulado(lado)
+            nivel = int(np.searchsorted(cantidad_acumulada, cantidad))
+            if nivel >= len(cantidad_acumulada):
+                return None
+            cantidad_previa = cantidad_acumulada[nivel - 1] if nivel else 0.0
+            importe_previo = importe_acumulado[nivel - 1] if nivel else 0.0
+            importe = importe_previo + (cantidad - cantidad_previa) * self.precios(lado)[nivel]
+            return self._resultado(lado, float(cantidad), float(importe), nivel + 1)
+
+    def cantidad_por_importe(self, importe):
+        """
+        Cantidad de moneda base que se obtiene comprando a mercado con un importe de
+        moneda cotizada (e.g., cuánto ETH se compra con un saldo de BTC).
+
+        :param importe: Importe en moneda cotizada.
+        :return: Diccionario como en precio_medio o None si no hay profundidad suficiente.
+        """
+        lado = 'asks'
+        with self._lock:
+            if importe <= 0 or not len(self.claves[lado]):
+                return None
+            cantidad_acumulada, importe_acumulado = self._acumulado(lado)
+            nivel = int(np.searchsorted(importe_acumulado, importe))
+            if nivel >= len(importe_acumulado):
+                return None
+            cantidad_previa = cantidad_acumulada[nivel - 1] if nivel else 0.0
+            importe_previo = importe_acumulado[nivel - 1] if nivel else 0.0
+            cantidad = cantidad_previa + (importe - importe_previo) / self.precios(lado)[nivel]
+            return self._resultado(lado, float(cantidad), float(importe), nivel + 1)
+
+    def procesar_evento(self, evento):
+        """
+        Aplica un evento depthUpdate del stream de diferencias de Binance. Los eventos ya
+        incluidos en el libro (u <= nonce) se descartan; el siguiente debe empezar como
+        mucho en nonce + 1 (U <= nonce + 1), si no se ha perdido alguna actualización.
+
+        :param evento: Mensaje del stream con U, u, b, a y E.
+        :return: True si se aplicó, False si ya estaba incluido en el libro.
+        :raises DesfaseLibro: Si falta alguna actualización y hay que volver a cargar el snapshot.
+        """
+        primero, ultimo = int(evento['U']), int(evento['u'])
+        if self.nonce is not None and ultimo <= self.nonce:
+            return False
+        if self.nonce is None or primero > self.nonce + 1:
+            raise DesfaseLibro(f"{self.par}: evento {primero}-{ultimo} tras el nonce {self.nonce}")
+        return self.aplicar_diferencias(evento['b'], evento['a'], ultimo, evento.get('E'))
+
+    async def cargar_snapshot_rest(self, exchange, limite):
+        """
+        Reemplaza el libro por un snapshot de fetch_order_book (su nonce es el lastUpdateId de Binance).
+        """
+        libro = await exchange.fetch_order_book(self.par, limite)
+        self.cargar_snapshot(libro['bids'][:self.profundidad], libro['asks'][:self.profundidad],
+                             libro.get('nonce'), libro.get('timestamp'))
+
+    async def run(self, exchange, limite=1000, url_stream=None):
+        """
+        Mantiene el libro al día con el stream de diferencias de Binance
+        (<par>@depth@100ms), siguiendo su procedimiento para un libro local: se abre el
+        stream, se carga un snapshot REST y se aplica encima cada diferencia con
+        aplicar_diferencias. Un hueco en los identificadores de actualización obliga a
+        cargar de nuevo el snapshot.
+
+        :param exchange: Cliente ccxt.pro (para el snapshot, el id del mercado y la URL del stream).
+        :param limite: Niveles del snapshot REST (e.g., 100, 1000 o 5000).
+        :param url_stream: URL base del stream (por defecto, la de spot del cliente).
+        """
+        import aiohttp
+
+        url_stream = url_stream or exchange.urls['api']['ws']['spot']
+        url = f"{url_stream}/{exchange.market_id(self.par).lower()}@depth@100ms"
+        eventos = asyncio.Queue()
+        async with aiohttp.ClientSession() as sesion, sesion.ws_connect(url, heartbeat=30) as ws:
+            async def leer():
+                # Los eventos se encolan desde que se abre el stream, también mientras carga el snapshot
+                async for mensaje in ws:
+                    if mensaje.type == aiohttp.WSMsgType.TEXT:
+                        eventos.put_nowait(json.loads(mensaje.data))
+                eventos.put_nowait(None)
+
+            lector = asyncio.create_task(leer())
+            try:
+                await self.cargar_snapshot_rest(exchange, limite)
+                while True:
+                    evento = await eventos.get()
+                    if evento is None:
+                        raise ConnectionError(f"Stream de diferencias de {self.par} cerrado")
+                    try:
+                        self.procesar_evento(evento)
+                    except DesfaseLibro as e:
+                        print(f"[WARN] Libro de órdenes desincronizado ({e}); se vuelve a cargar el snapshot.")
+                        await self.cargar_snapshot_rest(exchange, limite)
+            finally:
+                lector.cancel()
@@ -0,0 +1,41 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+def compartir_array(array):
+    """
+    Copia un array de numpy a un bloque de memoria compartida para que los
+    procesos trabajadores lo lean sin recibirlo serializado en cada tarea.
+
+    :param array: Array de numpy a compartir.
+    :return: Tupla (bloque SharedMemory, descriptor) donde el descriptor es
+             (nombre, forma, dtype) y se pasa a adjuntar_array en el trabajador.
+    """
+    array = np.ascontiguousarray(array)
+    bloque = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    destino = np.ndarray(array.shape, dtype=array.dtype, buffer=bloque.buf)
+    destino[...] = array
+    return bloque, (bloque.name, array.shape, array.dtype.str)
+
+def adjuntar_array(descriptor):
+    """
+    Abre un array compartido creado con compartir_array.
+
+    :param descriptor: Tupla (nombre, forma, dtype).
+    :return: Tupla (bloque SharedMemory, array de solo lectura). El bloque debe
+             mantenerse referenciado mientras se use el array.
+    """
+    nombre, forma, tipo = descriptor
+    bloque = shared_memory.SharedMemory(name=nombre)
+    array = np.ndarray(forma, dtype=np.dtype(tipo), buffer=bloque.buf)
+    array.flags.writeable = False
+    return bloque, array
+
+def liberar(bloques):
+    """
+    Cierra y elimina los bloques de memoria compartida creados por el proceso principal.
+
+    :param bloques: Lista de bloques SharedMemory.
+    """
+    for bloque in bloques:
+        bloque.close()
+        bloque.unlink()
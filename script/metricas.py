@@ -0,0 +1,282 @@
+import asyncio
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Límites (en segundos) de los histogramas de latencia: de 1 ms a 2 minutos
+LIMITES_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _etiquetas(nombres, valores, extra=None):
+    pares = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra is not None:
+        pares.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+def _numero(valor):
+    if valor == float('inf'):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+class Metrica:
+    TIPO = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        """
+        Métrica con nombre, texto de ayuda y nombres de etiquetas; cada combinación de
+        valores de etiquetas es una serie.
+
+        :param nombre: Nombre de la métrica en Prometheus (e.g., "bot_ciclo_segundos").
+        :param ayuda: Descripción de la métrica.
+        :param etiquetas: Nombres de las etiquetas (e.g., ("etapa",)).
+        """
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def _clave(self, etiquetas):
+        return tuple(str(etiquetas.get(nombre, "")) for nombre in self.etiquetas)
+
+    def texto(self):
+        """
+        Devuelve la métrica en el formato de texto de Prometheus.
+        """
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.TIPO}"]
+        with self._lock:
+            series = {clave: self._copiar(valor) for clave, valor in self.series.items()}
+        for clave, valor in sorted(series.items()):
+            lineas.extend(self._lineas(clave, valor))
+        return "\n".join(lineas)
+
+    @staticmethod
+    def _copiar(valor):
+        return valor
+
+    def _lineas(self, clave, valor):
+        return [f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}"]
+
+class Contador(Metrica):
+    TIPO = "counter"
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        super().__init__(nombre, ayuda, etiquetas)
+        if not self.etiquetas:
+            # Sin etiquetas la serie existe desde el inicio, aunque valga 0
+            self.series[()] = 0
+
+    def incrementar(self, cantidad=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self.series[clave] = self.series.get(clave, 0) + cantidad
+
+    def valor(self, **etiquetas):
+        return self.series.get(self._clave(etiquetas), 0)
+
+class Indicador(Metrica):
+    TIPO = "gauge"
+
+    def fijar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self.series[clave] = valor
+
+    def valor(self, **etiquetas):
+        return self.series.get(self._clave(etiquetas))
+
+class Histograma(Metrica):
+    TIPO = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), limites=LIMITES_LATENCIA):
+        """
+        Histograma acumulativo de Prometheus.
+
+        :param limites: Límites superiores de los intervalos, en orden creciente.
+        """
+        super().__init__(nombre, ayuda, etiquetas)
+        self.limites = tuple(limites)
+
+    def observar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            serie = self.series.get(clave)
+            if serie is None:
+                # [cuentas por intervalo (+Inf al final), suma, total]
+                serie = self.series[clave] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            serie[0][bisect.bisect_left(self.limites, valor)] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    @contextmanager
+    def tramo(self, **etiquetas):
+        """
+        Mide la duración del bloque (aunque termine con una excepción) y la observa.
+        """
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def total(self, **etiquetas):
+        serie = self.series.get(self._clave(etiquetas))
+        return serie[2] if serie else 0
+
+    @staticmethod
+    def _copiar(valor):
+        return [list(valor[0]), valor[1], valor[2]]
+
+    def _lineas(self, clave, valor):
+        cuentas, suma, total = valor
+        lineas = []
+        acumulado = 0
+        for limite, cuenta in zip(self.limites + (float('inf'),), cuentas):
+            acumulado += cuenta
+            lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, ('le', _numero(limite)))} {acumulado}")
+        etiquetas = _etiquetas(self.etiquetas, clave)
+        lineas.append(f"{self.nombre}_sum{etiquetas} {_numero(suma)}")
+        lineas.append(f"{self.nombre}_count{etiquetas} {total}")
+        return lineas
+
+class RegistroMetricas:
+    def __init__(self):
+        """
+        Registro de las métricas del proceso. Se exporta en formato de texto de
+        Prometheus por un endpoint HTTP local o por un archivo para el textfile
+        collector de node_exporter.
+        """
+        self.metricas = {}
+        self._lock = threading.Lock()
+        self.servidor = None
+
+    def _registrar(self, clase, nombre, *args, **kwargs):
+        with self._lock:
+            metrica = self.metricas.get(nombre)
+            if metrica is None:
+                metrica = self.metricas[nombre] = clase(nombre, *args, **kwargs)
+            elif not isinstance(metrica, clase):
+                raise ValueError(f"La métrica {nombre} ya está registrada como {metrica.TIPO}")
+            return metrica
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._registrar(Contador, nombre, ayuda, etiquetas)
+
+    def indicador(self, nombre, ayuda, etiquetas=()):
+        return self._registrar(Indicador, nombre, ayuda, etiquetas)
+
+    def histograma(self, nombre, ayuda, etiquetas=(), limites=LIMITES_LATENCIA):
+        return self._registrar(Histograma, nombre, ayuda, etiquetas, limites)
+
+    def texto_prometheus(self):
+        """
+        Devuelve todas las métricas en el formato de texto de Prometheus.
+        """
+        with self._lock:
+            metricas = list(self.metricas.values())
+        return "\n".join(metrica.texto() for metrica in metricas) + "\n"
+
+    def escribir_textfile(self, archivo):
+        """
+        Escribe las métricas de forma atómica para el textfile collector (archivo *.prom).
+
+        :param archivo: Ruta del archivo .prom.
+        """
+        temporal = f"{archivo}.tmp"
+        with open(temporal, 'w') as f:
+            f.write(self.texto_prometheus())
+        os.replace(temporal, archivo)
+
+    def iniciar_servidor(self, puerto=9108, direccion="127.0.0.1"):
+        """
+        Sirve las métricas en http://direccion:puerto/metrics desde un hilo en segundo plano.
+
+        :param puerto: Puerto TCP (0 = uno libre).
+        :param direccion: Dirección de escucha (por defecto, solo local).
+        :return: Puerto en el que escucha el servidor.
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registro = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                cuerpo = registro.texto_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, formato, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer((direccion, puerto), Manejador)
+        threading.Thread(target=self.servidor.serve_forever, name="metricas-http", daemon=True).start()
+        puerto = self.servidor.server_address[1]
+        print(f"[INFO] Métricas disponibles en http://{direccion}:{puerto}/metrics")
+        return puerto
+
+class ClienteMedido:
+    def __init__(self, exchange):
+        """
+        Envuelve un cliente ccxt (síncrono o asíncrono de ccxt.pro) para medir en
+        PETICION_REST la ida y vuelta de cada llamada a la API REST. El resto de
+        atributos (mercados, streams watch_*, cabeceras) se delegan sin cambios.
+
+        :param exchange: Cliente ccxt o ccxt.pro.
+        """
+        self._exchange = exchange
+
+    @staticmethod
+    def es_peticion(nombre):
+        return nombre == 'load_markets' or nombre.startswith(('fetch_', 'create_', 'cancel_'))
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._exchange, nombre)
+        if not callable(atributo) or not self.es_peticion(nombre):
+            return atributo
+
+        if asyncio.iscoroutinefunction(atributo):
+            async def llamada_medida_async(*args, **kwargs):
+                with PETICION_REST.tramo(metodo=nombre):
+                    return await atributo(*args, **kwargs)
+            return llamada_medida_async
+
+        def llamada_medida(*args, **kwargs):
+            with PETICION_REST.tramo(metodo=nombre):
+                return atributo(*args, **kwargs)
+        return llamada_medida
+
+# Registro del proceso y métricas del bucle de trading
+METRICAS = RegistroMetricas()
+
+DURACION_CICLO = METRICAS.histograma("bot_ciclo_segundos", "Duración de un ciclo completo de BotMaster.")
+DURACION_ETAPA = METRICAS.histograma("bot_etapa_segundos", "Duración de cada etapa del ciclo.", ("etapa",))
+PETICION_REST = METRICAS.histograma("bot_peticion_rest_segundos",
+                                    "Ida y vuelta de cada llamada REST al exchange.", ("metodo",))
+ESPERA_PLANIFICADOR = METRICAS.histograma("bot_espera_planificador_segundos",
+                                          "Espera en la cola del planificador antes de enviar la llamada.", ("metodo",))
+TICK_A_DECISION = METRICAS.histograma("bot_tick_a_decision_segundos",
+                                      "Tiempo desde que se recibe el precio hasta la decisión de operar.", ("par",))
+ANTIGUEDAD_PRECIO = METRICAS.histograma("bot_antiguedad_precio_segundos",
+                                        "Antigüedad del precio (según su timestamp) al decidir.", ("par",))
+DECISION_A_CONFIRMACION = METRICAS.histograma("bot_decision_a_confirmacion_segundos",
+                                              "Tiempo desde la decisión hasta la respuesta de create_order.", ("par", "lado"))
+REINTENTOS = METRICAS.contador("bot_reintentos_total", "Llamadas reintentadas por límite de peticiones.", ("metodo",))
+CICLOS_OMITIDOS = METRICAS.contador("bot_ciclos_omitidos_total",
+                                    "Ciclos interrumpidos por un error o con etapas fallidas u omitidas.")
+ETAPAS_FALLIDAS = METRICAS.contador("bot_etapas_fallidas_total", "Etapas con error u omitidas.", ("etapa", "estado"))
+ORDENES_RECHAZADAS = METRICAS.contador("bot_ordenes_rechazadas_total",
+                                       "Órdenes rechazadas por el exchange.", ("par", "motivo"))
+ORDENES_EJECUTADAS = METRICAS.contador("bot_ordenes_ejecutadas_total", "Órdenes aceptadas por el exchange.",
+                                       ("par", "lado"))
+ULTIMO_CICLO = METRICAS.indicador("bot_ultimo_ciclo_timestamp_segundos", "Momento (epoch) del último ciclo completado.")
+DISCREPANCIAS_SALDO = METRICAS.contador("bot_saldo_discrepancias_total",
+                                        "Monedas cuyo saldo en caché corrigió la conciliación REST.", ("moneda",))
@@ -0,0 +1,121 @@
+import numpy as np
+
+class EscaladorEstandar:
+    def __init__(self, media, escala):
+        """
+        Escalador equivalente a StandardScaler ya ajustado, sin depender de scikit-learn.
+
+        :param media: Media de cada variable.
+        :param escala: Desviación típica de cada variable (1 donde es 0).
+        """
+        self.mean_ = np.asarray(media, dtype=np.float64)
+        self.scale_ = np.asarray(escala, dtype=np.float64)
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+class ModeloLineal:
+    def __init__(self, coeficientes, intercepto):
+        """
+        Modelo lineal ya ajustado con la misma interfaz de predicción que LinearRegression.
+
+        :param coeficientes: Coeficientes sobre las variables escaladas.
+        :param intercepto: Término independiente.
+        """
+        self.coef_ = np.asarray(coeficientes, dtype=np.float64)
+        self.intercept_ = float(intercepto)
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef_ + self.intercept_
+
+class RegresionIncremental:
+    def __init__(self, num_variables, num_objetivos=2, factor_olvido=1.0):
+        """
+        Regresión lineal por mínimos cuadrados que se actualiza vela a vela.
+
+        Mantiene como estadísticos suficientes la matriz Z'Z y Z'Y con Z = [1, X]
+        (de la que salen también la media y la varianza del escalador). Cada
+        actualización cuesta O(variables²) y el ajuste se resuelve bajo demanda.
+        Con factor_olvido < 1 las velas antiguas pesan exponencialmente menos.
+
+        :param num_variables: Número de variables de entrada.
+        :param num_objetivos: Número de objetivos (e.g., 2 para high y low).
+        :param factor_olvido: Factor de olvido exponencial en (0, 1].
+        """
+        if not 0 < factor_olvido <= 1:
+            raise ValueError("El factor de olvido debe estar en (0, 1].")
+        self.num_variables = num_variables
+        self.factor_olvido = factor_olvido
+        self.zz = np.zeros((num_variables + 1, num_variables + 1))
+        self.zy = np.zeros((num_variables + 1, num_objetivos))
+        # Origen para desplazar las variables y evitar cancelaciones (e.g., timestamps ~1e9)
+        self.origen = None
+        self.muestras = 0
+
+    def actualizar(self, x, y):
+        """
+        Incorpora una observación.
+
+        :param x: Vector de variables.
+        :param y: Vector de objetivos.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        if self.origen is None:
+            self.origen = x.copy()
+        z = np.empty(self.num_variables + 1)
+        z[0] = 1.0
+        z[1:] = x - self.origen
+        y = np.asarray(y, dtype=np.float64)
+        self.zz *= self.factor_olvido
+        self.zy *= self.factor_olvido
+        self.zz += np.outer(z, z)
+        self.zy += np.outer(z, y)
+        self.muestras += 1
+
+    def actualizar_lote(self, X, Y):
+        """
+        Incorpora varias observaciones en orden cronológico; equivale a llamar a
+        actualizar() fila a fila.
+
+        :param X: Matriz (n, variables).
+        :param Y: Matriz (n, objetivos).
+        """
+        X = np.asarray(X, dtype=np.float64)
+        Y = np.asarray(Y, dtype=np.float64)
+        if len(X) == 0:
+            return
+        if self.origen is None:
+            self.origen = X[0].copy()
+        Z = np.column_stack([np.ones(len(X)), X - self.origen])
+        # La observación i-ésima pesa factor^(n-1-i) respecto a la última
+        pesos = self.factor_olvido ** np.arange(len(X) - 1, -1, -1, dtype=np.float64)
+        decaimiento = self.factor_olvido ** len(X)
+        self.zz = self.zz * decaimiento + (Z * pesos[:, None]).T @ Z
+        self.zy = self.zy * decaimiento + (Z * pesos[:, None]).T @ Y
+        self.muestras += len(X)
+
+    def resolver(self):
+        """
+        Resuelve los coeficientes a partir de los estadísticos acumulados.
+
+        :return: Tupla (EscaladorEstandar, lista de ModeloLineal, uno por objetivo),
+                 equivalentes a StandardScaler + LinearRegression ajustados sobre los mismos datos.
+        """
+        peso = self.zz[0, 0]
+        if peso <= 0:
+            raise ValueError("No hay observaciones para resolver el modelo.")
+
+        media = self.zz[0, 1:] / peso
+        media_y = self.zy[0] / peso
+        covarianza = self.zz[1:, 1:] / peso - np.outer(media, media)
+        covarianza_xy = self.zy[1:] / peso - np.outer(media, media_y)
+        escala = np.sqrt(np.clip(np.diag(covarianza), 0, None))
+        escala[escala == 0] = 1.0
+
+        # Resolver en el espacio escalado (matriz de correlaciones) para un mejor condicionamiento
+        correlacion = covarianza / np.outer(escala, escala)
+        coeficientes = np.linalg.lstsq(correlacion, covarianza_xy / escala[:, None], rcond=None)[0]
+
+        escalador = EscaladorEstandar(media + self.origen, escala)
+        modelos = [ModeloLineal(coeficientes[:, k], media_y[k]) for k in range(self.zy.shape[1])]
+        return escalador, modelos
@@ -0,0 +1,204 @@
+import numpy as np
+
+def calcular_direcciones(cierres):
+    """
+    Calcula la dirección de cada vela respecto al cierre anterior.
+
+    :param cierres: Array con los precios de cierre.
+    :return: Array int8 con 1 (sube), -1 (baja) o 0 (igual, sin dato o primera vela).
+    """
+    cierres = np.asarray(cierres, dtype=np.float64)
+    direcciones = np.zeros(len(cierres), dtype=np.int8)
+    if len(cierres) > 1:
+        diferencias = cierres[1:] - cierres[:-1]
+        direcciones[1:] = (diferencias > 0).astype(np.int8) - (diferencias < 0).astype(np.int8)
+    return direcciones
+
+def resolver_operaciones(direcciones, primera_direccion):
+    """
+    Resuelve la máquina de estados compra/venta en una sola pasada vectorizada.
+
+    La primera operación ocurre en la primera vela cuya dirección coincide con
+    primera_direccion; a partir de ahí se opera en cada cambio de dirección,
+    ignorando las velas sin movimiento.
+
+    :param direcciones: Array de direcciones (ver calcular_direcciones).
+    :param primera_direccion: -1 si se empieza comprando en una bajada, 1 si en una subida.
+    :return: Array con los índices de las velas donde se opera.
+    """
+    indices = np.flatnonzero(direcciones)
+    signos = direcciones[indices]
+    coincidencias = np.flatnonzero(signos == primera_direccion)
+    if len(coincidencias) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    indices = indices[coincidencias[0]:]
+    signos = signos[coincidencias[0]:]
+    cambios = np.empty(len(signos), dtype=bool)
+    cambios[0] = True
+    cambios[1:] = signos[1:] != signos[:-1]
+    return indices[cambios]
+
+def encadenar_montos(precios, cantidad_base, moneda_inicial="BTC"):
+    """
+    Calcula las cantidades usadas y obtenidas en cada operación alternada.
+
+    Se recorre solo la lista de operaciones (no las velas) y con la misma
+    secuencia de divisiones y multiplicaciones que la simulación original,
+    para obtener exactamente los mismos valores.
+
+    :param precios: Precios ETH/BTC de cada operación.
+    :param cantidad_base: Cantidad inicial en la moneda inicial.
+    :param moneda_inicial: "BTC" (primero se compra ETH) o "ETH" (primero se compra BTC).
+    :return: Tupla (usados, obtenidos) como arrays de numpy.
+    """
+    usados = []
+    obtenidos = []
+    actual = cantidad_base
+    dividir = moneda_inicial == "BTC"
+    for precio in np.asarray(precios, dtype=np.float64).tolist():
+        usados.append(actual)
+        actual = actual / precio if dividir else actual * precio
+        obtenidos.append(actual)
+        dividir = not dividir
+    return np.asarray(usados, dtype=np.float64), np.asarray(obtenidos, dtype=np.float64)
+
+def simular(cierres, cantidad_base, moneda_inicial="BTC"):
+    """
+    Simula la estrategia de seguir la dirección del cierre anterior.
+
+    :param cierres: Array con los precios de cierre.
+    :param cantidad_base: Cantidad inicial en la moneda inicial.
+    :param moneda_inicial: "BTC" o "ETH".
+    :return: Tupla (indices, usados, obtenidos) con una entrada por operación.
+    """
+    cierres = np.asarray(cierres, dtype=np.float64)
+    primera_direccion = -1 if moneda_inicial == "BTC" else 1
+    indices = resolver_operaciones(calcular_direcciones(cierres), primera_direccion)
+    usados, obtenidos = encadenar_montos(cierres[indices], cantidad_base, moneda_inicial)
+    return indices, usados, obtenidos
+
+def _siguiente_operacion(candidatos, precios_candidatos, desde, limite, comprar):
+    """
+    Busca la primera vela candidata posterior a 'desde' cuyo precio cumple el límite,
+    revisando los candidatos por bloques vectorizados de tamaño creciente.
+
+    :return: Posición dentro de candidatos o -1 si no hay ninguna.
+    """
+    posicion = int(np.searchsorted(candidatos, desde, side='right'))
+    bloque = 64
+    while posicion < len(candidatos):
+        fin = min(len(candidatos), posicion + bloque)
+        tramo = precios_candidatos[posicion:fin]
+        cumple = tramo < limite if comprar else tramo > limite
+        if cumple.any():
+            return posicion + int(np.argmax(cumple))
+        posicion = fin
+        bloque = min(bloque * 2, 4096)
+    return -1
+
+def simular_con_costes(cierres, cantidad_base, moneda_inicial="BTC", comision=0.0, umbral_ganancia=None,
+                       direcciones=None):
+    """
+    Simula la estrategia aplicando comisión por operación y, opcionalmente, un umbral
+    de ganancia como el de OrdenesBot: solo se opera si la cantidad obtenida supera en
+    umbral_ganancia a la cantidad entregada en la operación contraria anterior.
+
+    Sin umbral la secuencia de operaciones es la misma que en simular().
+
+    :param cierres: Array con los precios de cierre.
+    :param cantidad_base: Cantidad inicial en la moneda inicial.
+    :param moneda_inicial: "BTC" o "ETH".
+    :param comision: Comisión por operación (e.g., 0.001 para 0.1%).
+    :param umbral_ganancia: Ganancia mínima en porcentaje o None para no exigirla.
+    :param direcciones: Direcciones precalculadas (ver calcular_direcciones).
+    :return: Tupla (indices, usados, obtenidos) con una entrada por operación.
+    """
+    cierres = np.asarray(cierres, dtype=np.float64)
+    if direcciones is None:
+        direcciones = calcular_direcciones(cierres)
+    neto = 1.0 - comision
+    dividir = moneda_inicial == "BTC"
+
+    if umbral_ganancia is None:
+        indices = resolver_operaciones(direcciones, -1 if dividir else 1)
+        usados = []
+        obtenidos = []
+        actual = cantidad_base
+        for precio in cierres[indices].tolist():
+            usados.append(actual)
+            actual = actual * neto / precio if dividir else actual * neto * precio
+            obtenidos.append(actual)
+            dividir = not dividir
+        return indices, np.asarray(usados, dtype=np.float64), np.asarray(obtenidos, dtype=np.float64)
+
+    factor = 1.0 + umbral_ganancia / 100
+    bajadas = np.flatnonzero(direcciones == -1)
+    subidas = np.flatnonzero(direcciones == 1)
+    precios_bajadas = cierres[bajadas]
+    precios_subidas = cierres[subidas]
+
+    indices = []
+    usados = []
+    obtenidos = []
+    actual = cantidad_base
+    referencia = None
+    ultima = -1
+    while True:
+        # Pasar de BTC a ETH ocurre en bajadas (comprar barato); de ETH a BTC en subidas
+        candidatos, precios = (bajadas, precios_bajadas) if dividir else (subidas, precios_subidas)
+        if referencia is None:
+            limite = np.inf if dividir else -np.inf
+        elif dividir:
+            limite = actual * neto / (referencia * factor)
+        else:
+            limite = referencia * factor / (actual * neto)
+        posicion = _siguiente_operacion(candidatos, precios, ultima, limite, dividir)
+        if posicion < 0:
+            break
+
+        ultima = int(candidatos[posicion])
+        precio = float(precios[posicion])
+        indices.append(ultima)
+        usados.append(actual)
+        referencia = actual
+        actual = actual * neto / precio if dividir else actual * neto * precio
+        obtenidos.append(actual)
+        dividir = not dividir
+
+    return (np.asarray(indices, dtype=np.int64), np.asarray(usados, dtype=np.float64),
+            np.asarray(obtenidos, dtype=np.float64))
+
+def resumir(cierres, indices, obtenidos, cantidad_base, moneda_inicial="BTC"):
+    """
+    Calcula el balance final, el número de operaciones y el drawdown máximo
+    valorando la posición en la moneda inicial vela a vela.
+
+    :param cierres: Array con los precios de cierre.
+    :param indices: Índices de las operaciones.
+    :param obtenidos: Cantidad obtenida en cada operación.
+    :param cantidad_base: Cantidad inicial en la moneda inicial.
+    :param moneda_inicial: "BTC" o "ETH".
+    :return: Diccionario con balance_final, operaciones y drawdown_max (fracción).
+    """
+    cierres = np.asarray(cierres, dtype=np.float64)
+    if len(cierres) == 0:
+        return {'balance_final': cantidad_base, 'operaciones': 0, 'drawdown_max': 0.0}
+
+    realizadas = np.searchsorted(indices, np.arange(len(cierres)), side='right') - 1
+    cantidades = np.where(realizadas >= 0, obtenidos[np.maximum(realizadas, 0)] if len(obtenidos) else 0.0,
+                          cantidad_base)
+    # Tras un número impar de operaciones se mantiene la otra moneda
+    en_otra_moneda = (realizadas >= 0) & (realizadas % 2 == 0)
+    if moneda_inicial == "BTC":
+        valorado = np.where(en_otra_moneda, cantidades * cierres, cantidades)
+    else:
+        valorado = np.where(en_otra_moneda, cantidades / cierres, cantidades)
+
+    maximos = np.maximum.accumulate(valorado)
+    drawdown = np.where(maximos > 0, (maximos - valorado) / maximos, 0.0)
+    return {
+        'balance_final': float(valorado[-1]),
+        'operaciones': int(len(indices)),
+        'drawdown_max': float(np.nanmax(drawdown)),
+    }
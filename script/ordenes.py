@@ -2,14 +2,14 @@ import ccxt
 import json
 import logging
 import os
+import time
 from datetime import datetime, timedelta
 import csv
 from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
+from metricas import ClienteMedido, TICK_A_DECISION, ANTIGUEDAD_PRECIO, DECISION_A_CONFIRMACION, ORDENES_RECHAZADAS, ORDENES_EJECUTADAS
 
 class OrdenesBot:
-    def __init__(self, par="ETH/BTC", timeframe="1h", operaciones_archivo="../datos/operaciones.csv", comision=0.001, predicciones_archivo="../datos/predicciones.json", umbral_ganancia=0.5):
+    def __init__(self, par="ETH/BTC", timeframe="1h", operaciones_archivo="../datos/operaciones.csv", comision=0.001, predicciones_archivo="../datos/predicciones.json", umbral_ganancia=0.5, exchange=None, libro=None, libro_l2=None, headless=False, cache_saldo=None):
         """
         Inicializa el bot para colocar órdenes de compra o venta en Binance.
 
@@ -19,6 +19,14 @@ class OrdenesBot:
         :param comision: Comisión aplicada por operación (default: 0.1% -> 0.001).
         :param predicciones_archivo: Archivo JSON con predicciones de precios.
         :param umbral_ganancia: Ganancia mínima requerida para ejecutar la operación (en porcentaje).
+        :param exchange: Cliente ccxt ya inicializado (e.g., SesionBinance.exchange) para reutilizar la conexión.
+        :param libro: LibroOperaciones opcional; si se indica, reemplaza al CSV de operaciones.
+        :param libro_l2: LibroL2 opcional del par; si se indica, las cantidades estimadas se calculan
+                         con el precio medio de ejecución según la profundidad del libro.
+        :param headless: Si es True, no se renderiza nada con rich: los mensajes se encolan en el
+                         registro JSON asíncrono (ver registro_async) y se escriben en segundo plano.
+        :param cache_saldo: CacheSaldo opcional alimentado por el stream de saldo; mientras está
+                            vigente el saldo se lee de memoria en lugar de llamar a fetch_balance.
         """
         logging.basicConfig(level=logging.INFO, 
                             format='%(asctime)s - %(levelname)s - %(message)s')
@@ -27,21 +35,33 @@ class OrdenesBot:
         self.api_key = os.getenv('BINANCE_API_KEY')
         self.api_secret = os.getenv('BINANCE_API_SECRET')
         self.operaciones_archivo = operaciones_archivo
+        self.libro = libro
+        self.libro_l2 = libro_l2
+        self.cache_saldo = cache_saldo
         self.comision = comision
         self.predicciones_archivo = predicciones_archivo
         self.umbral_ganancia = umbral_ganancia / 100  # Convertir porcentaje a decimal
+        self.momento_precio = None  # perf_counter en que se recibió el último precio
 
-        # Inicializar Rich Console
-        self.console = Console()
+        # Inicializar Rich Console (o el registro asíncrono en modo headless)
+        self.headless = headless
+        if headless:
+            from registro_async import ConsolaRegistro, configurar_registro
+            self.console = ConsolaRegistro(configurar_registro().getChild("ordenes"))
+        else:
+            self.console = Console()
 
         # Confirmar inicialización de atributos
         self.console.log(f"Inicializando bot para colocar órdenes en par: {par} y timeframe: {timeframe}")
 
-        if not self.api_key or not self.api_secret:
-            self.cargar_credenciales_desde_archivo()
+        if exchange is None:
+            if not self.api_key or not self.api_secret:
+                self.cargar_credenciales_desde_archivo()
+            exchange = self.inicializar_exchange()
 
-        self.exchange = self.inicializar_exchange()
+        self.exchange = exchange
         self.par = par
+        self.base, self.cotizada = par.split('/')
         self.timeframe = timeframe
 
     def cargar_credenciales_desde_archivo(self):
@@ -65,12 +85,12 @@ class OrdenesBot:
         """
         try:
             self.console.log("Inicializando conexión con Binance...")
-            exchange = ccxt.binance({
+            exchange = ClienteMedido(ccxt.binance({
                 'apiKey': self.api_key,
                 'secret': self.api_secret,
                 'enableRateLimit': True,
                 'options': {'defaultType': 'spot'}
-            })
+            }))
             exchange.load_markets()
             self.console.log("Conexión con Binance establecida exitosamente.")
             return exchange
@@ -80,18 +100,21 @@ class OrdenesBot:
 
     def obtener_saldo(self):
         """
-        Obtiene el saldo disponible de ETH y BTC.
+        Obtiene el saldo disponible de las dos monedas del par (e.g., ETH y BTC).
 
-        :return: Diccionario con saldos de ETH y BTC.
+        :return: Diccionario con los saldos de la moneda base y la cotizada.
         """
+        monedas = (self.base, self.cotizada)
+        if self.cache_saldo is not None and self.cache_saldo.vigente:
+            return self.cache_saldo.libres(monedas)
         try:
             balance = self.exchange.fetch_balance()
-            saldo_eth = balance['free'].get('ETH', 0)
-            saldo_btc = balance['free'].get('BTC', 0)
-            return {"ETH": saldo_eth, "BTC": saldo_btc}
+            if self.cache_saldo is not None:
+                self.cache_saldo.actualizar(balance, origen="rest", completo=True)
+            return {moneda: balance['free'].get(moneda, 0) for moneda in monedas}
         except Exception as e:
             self.console.log(f"[ERROR] Error al obtener el saldo: {e}")
-            return {"ETH": 0, "BTC": 0}
+            return {self.base: 0, self.cotizada: 0}
 
     def obtener_precio_actual(self):
         """
@@ -100,17 +123,67 @@ class OrdenesBot:
         :return: Precio actual del par.
         """
         try:
-            return self.exchange.fetch_ticker(self.par)['last']
+            ticker = self.exchange.fetch_ticker(self.par)
+            self.registrar_precio(ticker)
+            return ticker['last']
         except Exception as e:
             self.console.log(f"[ERROR] Error al obtener el precio actual: {e}")
             return None
 
+    def registrar_precio(self, ticker):
+        """
+        Anota cuándo se recibió el precio y su antigüedad según el timestamp del exchange.
+
+        :param ticker: Ticker de ccxt.
+        """
+        self.momento_precio = time.perf_counter()
+        if ticker.get('timestamp'):
+            antiguedad = (self.exchange.milliseconds() - ticker['timestamp']) / 1000
+            ANTIGUEDAD_PRECIO.observar(max(0.0, antiguedad), par=self.par)
+
+    def estimar_compra(self, importe, precio_actual):
+        """
+        Estima la cantidad de moneda base que se obtiene comprando con un importe de moneda cotizada.
+
+        :param importe: Importe en moneda cotizada.
+        :param precio_actual: Último precio, usado si no hay libro L2 o no tiene profundidad suficiente.
+        :return: Cantidad estimada de moneda base.
+        """
+        if self.libro_l2 is not None:
+            ejecucion = self.libro_l2.cantidad_por_importe(importe)
+            if ejecucion is not None:
+                self.console.log(f"[INFO] Precio medio estimado de compra: {ejecucion['precio_medio']:.8f} "
+                                 f"(deslizamiento: {ejecucion['deslizamiento'] * 100:.4f}%).")
+                return ejecucion['cantidad']
+            self.console.log("[WARN] El libro de órdenes no tiene profundidad suficiente; se usa el último precio.")
+        return importe / precio_actual
+
+    def estimar_venta(self, cantidad, precio_actual):
+        """
+        Estima el importe en moneda cotizada que se obtiene vendiendo una cantidad de moneda base.
+
+        :param cantidad: Cantidad de moneda base.
+        :param precio_actual: Último precio, usado si no hay libro L2 o no tiene profundidad suficiente.
+        :return: Importe estimado en moneda cotizada.
+        """
+        if self.libro_l2 is not None:
+            ejecucion = self.libro_l2.precio_medio("sell", cantidad)
+            if ejecucion is not None:
+                self.console.log(f"[INFO] Precio medio estimado de venta: {ejecucion['precio_medio']:.8f} "
+                                 f"(deslizamiento: {ejecucion['deslizamiento'] * 100:.4f}%).")
+                return ejecucion['importe']
+            self.console.log("[WARN] El libro de órdenes no tiene profundidad suficiente; se usa el último precio.")
+        return cantidad * precio_actual
+
     def obtener_ultima_operacion(self):
         """
         Obtiene la última operación registrada en el archivo CSV.
 
         :return: Diccionario con los detalles de la última operación o None si no hay operaciones registradas.
         """
+        if self.libro is not None:
+            return self.libro.ultima_operacion()
+
         try:
             if not os.path.exists(self.operaciones_archivo):
                 self.console.log("[INFO] No se encontró el archivo de operaciones. Comenzando desde cero.")
@@ -144,6 +217,14 @@ class OrdenesBot:
             "cantidad_final": cantidad_final
         }
 
+        if self.libro is not None:
+            try:
+                self.libro.registrar(detalles)
+                self.console.log(f"[INFO] Operación registrada en {self.libro.archivo_db}.")
+            except Exception as e:
+                self.console.log(f"[ERROR] Error al registrar la operación: {e}")
+            return
+
         try:
             with open(self.operaciones_archivo, mode="a") as f:
                 writer = csv.DictWriter(f, fieldnames=detalles.keys())
@@ -158,10 +239,15 @@ class OrdenesBot:
         """
         Implementa la lógica principal del bot para decidir si comprar o vender basándose en las cantidades iniciales y finales.
         """
-        # Verificar si el archivo de operaciones existe
-        if not os.path.exists(self.operaciones_archivo):
+        # Verificar si hay operaciones registradas (libro) o si existe el archivo de operaciones
+        if self.libro is not None:
+            sin_operaciones = self.libro.ultima_operacion() is None
+        else:
+            sin_operaciones = not os.path.exists(self.operaciones_archivo)
+
+        if sin_operaciones:
             self.console.log("[INFO] Archivo de operaciones no encontrado. Creando uno nuevo...")
-            moneda_inicial = input("Ingresa la moneda inicial (ETH o BTC): ").strip().upper()
+            moneda_inicial = input(f"Ingresa la moneda inicial ({self.base} o {self.cotizada}): ").strip().upper()
             cantidad_inicial = float(input(f"Ingresa la cantidad inicial de {moneda_inicial}: ").strip())
             
             # Registrar la operación inicial
@@ -192,36 +278,34 @@ class OrdenesBot:
         moneda_final = ultima_operacion["moneda_final"]
         cantidad_final = float(ultima_operacion["cantidad_final"])
 
-        if moneda_final == "BTC" and saldo["BTC"] > 0:
-            # Evaluar si se puede comprar ETH con BTC y obtener más ETH del inicial
-            cantidad_estimada_eth = saldo["BTC"] / precio_actual
+        base, cotizada = self.base, self.cotizada
+        if moneda_final == cotizada and saldo[cotizada] > 0:
+            # Evaluar si se puede comprar la moneda base con la cotizada y obtener más que la cantidad inicial
+            cantidad_estimada_base = self.estimar_compra(saldo[cotizada], precio_actual)
             ganancia_requerida = cantidad_inicial * (1 + self.umbral_ganancia)
 
-            if cantidad_estimada_eth > ganancia_requerida:
-                self.console.log(f"[INFO] Decisión: Comprar ETH con BTC. Cantidad inicial: {cantidad_inicial:.6f} ETH, "
-                                 f"Cantidad estimada: {cantidad_estimada_eth:.6f} ETH, "
-                                 f"Ganancia mínima requerida: {ganancia_requerida:.6f} ETH")
-                self.colocar_orden_mercado("buy", saldo["BTC"] / precio_actual)
-                self.registrar_operacion("BTC", saldo["BTC"], "ETH", cantidad_estimada_eth)
+            if cantidad_estimada_base > ganancia_requerida:
+                self.console.log(f"[INFO] Decisión: Comprar {base} con {cotizada}. Cantidad inicial: {cantidad_inicial:.6f} {base}, "
+                                 f"Cantidad estimada: {cantidad_estimada_base:.6f} {base}, "
+                                 f"Ganancia mínima requerida: {ganancia_requerida:.6f} {base}")
+                self.colocar_orden_mercado("buy", cantidad_estimada_base)
+                self.registrar_operacion(cotizada, saldo[cotizada], base, cantidad_estimada_base)
             else:
-                self.console.log(f"[WARN] No se realiza compra: Cantidad estimada ({cantidad_estimada_eth:.6f} ETH) no supera la ganancia mínima requerida ({ganancia_requerida:.6f} ETH).")
+                self.console.log(f"[WARN] No se realiza compra: Cantidad estimada ({cantidad_estimada_base:.6f} {base}) no supera la ganancia mínima requerida ({ganancia_requerida:.6f} {base}).")
 
-        if moneda_final == "ETH" and saldo["ETH"] > 0:
-            # Evaluar si se puede vender ETH por BTC y obtener más BTC del inicial
-            cantidad_estimada_btc = saldo["ETH"] * precio_actual
+        if moneda_final == base and saldo[base] > 0:
+            # Evaluar si se puede vender la moneda base por la cotizada y obtener más que la cantidad inicial
+            cantidad_estimada_cotizada = self.estimar_venta(saldo[base], precio_actual)
             ganancia_requerida = cantidad_inicial * (1 + self.umbral_ganancia)
 
-            if cantidad_estimada_btc > ganancia_requerida:
-                self.console.log(f"[INFO] Decisión: Vender ETH por BTC. Cantidad inicial: {cantidad_inicial:.6f} BTC, "
-                                 f"Cantidad estimada: {cantidad_estimada_btc:.6f} BTC, "
-                                 f"Ganancia mínima requerida: {ganancia_requerida:.6f} BTC")
-                self.colocar_orden_mercado("sell", saldo["ETH"])
-                self.registrar_operacion("ETH", saldo["ETH"], "BTC", cantidad_estimada_btc)
+            if cantidad_estimada_cotizada > ganancia_requerida:
+                self.console.log(f"[INFO] Decisión: Vender {base} por {cotizada}. Cantidad inicial: {cantidad_inicial:.6f} {cotizada}, "
+                                 f"Cantidad estimada: {cantidad_estimada_cotizada:.6f} {cotizada}, "
+                                 f"Ganancia mínima requerida: {ganancia_requerida:.6f} {cotizada}")
+                self.colocar_orden_mercado("sell", saldo[base])
+                self.registrar_operacion(base, saldo[base], cotizada, cantidad_estimada_cotizada)
             else:
-                self.console.log(f"[WARN] No se realiza venta: Cantidad estimada ({cantidad_estimada_btc:.6f} BTC) no supera la ganancia mínima requerida ({ganancia_requerida:.6f} BTC).")
-
-
-    from rich.panel import Panel
+                self.console.log(f"[WARN] No se realiza venta: Cantidad estimada ({cantidad_estimada_cotizada:.6f} {cotizada}) no supera la ganancia mínima requerida ({ganancia_requerida:.6f} {cotizada}).")
 
     def mostrar_detalle_orden(self, orden):
         """
@@ -229,6 +313,12 @@ class OrdenesBot:
 
         :param orden: Detalles de la orden retornados por la API.
         """
+        if self.headless:
+            self.console.log("[INFO] Operación ejecutada", orden_id=orden.get('id'), par=orden.get('symbol'),
+                             tipo=orden.get('type'), lado=orden.get('side'), cantidad=orden.get('amount'),
+                             precio_promedio=orden.get('average'), estado=orden.get('status'))
+            return
+        from rich.panel import Panel
         panel = Panel.fit(
             f"[cyan bold]Operación Ejecutada[/cyan bold]\n"
             f"[bold white]ID de la Orden:[/bold white] {orden.get('id')}\n"
@@ -251,21 +341,30 @@ class OrdenesBot:
         :param tipo: 'buy' o 'sell'.
         :param cantidad: Cantidad a operar.
         """
+        if self.momento_precio is not None:
+            TICK_A_DECISION.observar(time.perf_counter() - self.momento_precio, par=self.par)
         try:
             self.console.log(f"Intentando colocar una orden de tipo {tipo} para {cantidad:.6f} en {self.par}...")
-            orden = self.exchange.create_order(
-                symbol=self.par,
-                type="market",
-                side=tipo,
-                amount=cantidad
-            )
+            if self.cache_saldo is not None:
+                # El saldo en caché no vale hasta que el stream refleje la orden
+                self.cache_saldo.invalidar()
+            with DECISION_A_CONFIRMACION.tramo(par=self.par, lado=tipo):
+                orden = self.exchange.create_order(
+                    symbol=self.par,
+                    type="market",
+                    side=tipo,
+                    amount=cantidad
+                )
 
             if orden:
+                ORDENES_EJECUTADAS.incrementar(par=self.par, lado=tipo)
                 self.console.log(f"[INFO] Orden de tipo {tipo} ejecutada exitosamente.")
                 self.mostrar_detalle_orden(orden)  # Llamada a la nueva función
             else:
+                ORDENES_RECHAZADAS.incrementar(par=self.par, motivo="sin_respuesta")
                 self.console.log(f"[ERROR] La orden de tipo {tipo} no se ejecutó correctamente.")
         except Exception as e:
+            ORDENES_RECHAZADAS.incrementar(par=self.par, motivo=type(e).__name__)
             self.console.log(f"[ERROR] Ocurrió un error al colocar la orden de tipo {tipo}: {e}")
 
 
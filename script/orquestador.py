@@ -0,0 +1,144 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from metricas import DURACION_CICLO, DURACION_ETAPA, CICLOS_OMITIDOS, ETAPAS_FALLIDAS, ULTIMO_CICLO
+
+class Etapa:
+    def __init__(self, nombre, funcion, dependencias=(), cpu=False):
+        """
+        Define una etapa del ciclo del bot.
+
+        :param nombre: Nombre de la etapa.
+        :param funcion: Función síncrona que ejecuta la etapa.
+        :param dependencias: Nombres de las etapas que deben terminar antes.
+        :param cpu: True si la etapa es de cálculo (entrenamiento, simulación) y no de red.
+        """
+        self.nombre = nombre
+        self.funcion = funcion
+        self.dependencias = tuple(dependencias)
+        self.cpu = cpu
+
+class EtapaOmitida(Exception):
+    """
+    Se lanza cuando una etapa no se ejecuta porque falló alguna de sus dependencias.
+    """
+
+class OrquestadorAsync:
+    def __init__(self, etapas, hilos_cpu=2):
+        """
+        Inicializa el orquestador asíncrono de etapas.
+
+        Cada etapa arranca en cuanto terminan sus dependencias: las etapas
+        independientes (e.g., historial y saldo) corren a la vez y una decisión usa
+        los datos más recientes en cuanto están listos. Las etapas de red se ejecutan
+        en hilos con asyncio.to_thread y las de cálculo en un pool propio, de modo que
+        ninguna bloquea el bucle de eventos. Se usan hilos y no procesos porque las
+        etapas comparten el cliente del exchange y los almacenes abiertos.
+
+        :param etapas: Lista de objetos Etapa.
+        :param hilos_cpu: Número de hilos del pool de etapas de cálculo.
+        """
+        self.etapas = {etapa.nombre: etapa for etapa in etapas}
+        for etapa in etapas:
+            for dependencia in etapa.dependencias:
+                if dependencia not in self.etapas:
+                    raise ValueError(f"La etapa {etapa.nombre} depende de una etapa desconocida: {dependencia}")
+        self.orden = self.ordenar_etapas()
+        self.pool_cpu = ThreadPoolExecutor(max_workers=hilos_cpu, thread_name_prefix="etapa-cpu")
+
+    def ordenar_etapas(self):
+        """
+        Ordena las etapas topológicamente según sus dependencias.
+
+        :return: Lista de nombres de etapas.
+        """
+        orden = []
+        visitando = set()
+
+        def visitar(nombre):
+            if nombre in orden:
+                return
+            if nombre in visitando:
+                raise ValueError(f"Dependencia circular en la etapa {nombre}")
+            visitando.add(nombre)
+            for dependencia in self.etapas[nombre].dependencias:
+                visitar(dependencia)
+            visitando.discard(nombre)
+            orden.append(nombre)
+
+        for nombre in self.etapas:
+            visitar(nombre)
+        return orden
+
+    async def _ejecutar_etapa(self, etapa, tareas):
+        """
+        Espera a las dependencias de la etapa y la ejecuta fuera del bucle de eventos.
+
+        :return: Segundos que tardó la etapa.
+        """
+        if etapa.dependencias:
+            resultados = await asyncio.gather(*(tareas[nombre] for nombre in etapa.dependencias),
+                                              return_exceptions=True)
+            fallidas = [nombre for nombre, resultado in zip(etapa.dependencias, resultados)
+                        if isinstance(resultado, BaseException)]
+            if fallidas:
+                raise EtapaOmitida(f"dependencias fallidas: {', '.join(fallidas)}")
+
+        inicio = time.perf_counter()
+        if etapa.cpu:
+            await asyncio.get_running_loop().run_in_executor(self.pool_cpu, etapa.funcion)
+        else:
+            await asyncio.to_thread(etapa.funcion)
+        duracion = time.perf_counter() - inicio
+        DURACION_ETAPA.observar(duracion, etapa=etapa.nombre)
+        return duracion
+
+    async def ejecutar_ciclo(self):
+        """
+        Ejecuta un ciclo completo respetando las dependencias entre etapas.
+
+        :return: Diccionario nombre -> (estado, segundos o mensaje de error).
+        """
+        tareas = {}
+        for nombre in self.orden:
+            tareas[nombre] = asyncio.create_task(self._ejecutar_etapa(self.etapas[nombre], tareas), name=nombre)
+
+        resultados = await asyncio.gather(*tareas.values(), return_exceptions=True)
+        resumen = {}
+        for nombre, resultado in zip(tareas, resultados):
+            if isinstance(resultado, EtapaOmitida):
+                print(f"[WARN] Etapa {nombre} omitida: {resultado}")
+                resumen[nombre] = ("omitida", str(resultado))
+            elif isinstance(resultado, BaseException):
+                print(f"[ERROR] Error en la etapa {nombre}: {resultado}")
+                resumen[nombre] = ("error", str(resultado))
+            else:
+                resumen[nombre] = ("ok", resultado)
+                continue
+            ETAPAS_FALLIDAS.incrementar(etapa=nombre, estado=resumen[nombre][0])
+        if any(estado != "ok" for estado, _ in resumen.values()):
+            CICLOS_OMITIDOS.incrementar()
+        return resumen
+
+    async def run(self, intervalo, al_terminar_ciclo=None):
+        """
+        Ejecuta ciclos indefinidamente. El intervalo se cuenta desde el inicio de cada
+        ciclo, así que la espera descuenta lo que tardó el ciclo.
+
+        :param intervalo: Segundos entre inicios de ciclo.
+        :param al_terminar_ciclo: Función opcional llamada tras cada ciclo (e.g., para exportar métricas).
+        """
+        while True:
+            inicio = time.perf_counter()
+            resumen = await self.ejecutar_ciclo()
+            duracion = time.perf_counter() - inicio
+            DURACION_CICLO.observar(duracion)
+            ULTIMO_CICLO.fijar(time.time())
+            if al_terminar_ciclo is not None:
+                al_terminar_ciclo()
+            tiempos = ", ".join(f"{nombre}={valor:.2f}s" for nombre, (estado, valor) in resumen.items()
+                                if estado == "ok")
+            print(f"[INFO] Ciclo completo ejecutado en {duracion:.2f} segundos ({tiempos}).")
+            espera = max(0.0, intervalo - duracion)
+            print(f"[INFO] Esperando {espera:.1f} segundos...")
+            await asyncio.sleep(espera)
@@ -0,0 +1,190 @@
+import heapq
+import itertools
+import threading
+import time
+from metricas import ESPERA_PLANIFICADOR, REINTENTOS
+
+# Peso aproximado de cada llamada en el límite de peso por minuto de Binance
+PESOS_PETICIONES = {
+    'load_markets': 20,
+    'fetch_markets': 20,
+    'fetch_balance': 20,
+    'fetch_ohlcv': 2,
+    'fetch_ticker': 2,
+    'fetch_tickers': 80,
+    'fetch_order_book': 5,
+    'fetch_my_trades': 20,
+    'fetch_order': 4,
+    'fetch_open_orders': 6,
+    'create_order': 1,
+    'cancel_order': 1,
+}
+
+# Prioridad de cada llamada (0 = más urgente); las no listadas van con el historial
+ORDEN = 0
+CONSULTA = 1
+HISTORIAL = 2
+PRIORIDADES = {
+    'create_order': ORDEN,
+    'cancel_order': ORDEN,
+    'fetch_order': ORDEN,
+    'fetch_balance': CONSULTA,
+    'fetch_ticker': CONSULTA,
+    'fetch_tickers': CONSULTA,
+    'fetch_order_book': CONSULTA,
+    'fetch_open_orders': CONSULTA,
+}
+
+# Fracción del límite por minuto que puede ocupar cada prioridad: el historial
+# deja siempre margen para consultas y órdenes
+FRACCION_LIMITE = {ORDEN: 1.0, CONSULTA: 0.9, HISTORIAL: 0.7}
+
+class PlanificadorPeticiones:
+    def __init__(self, peso_por_minuto=1200, reintentos=3):
+        """
+        Planificador de peticiones REST a Binance compartido por todos los hilos.
+
+        Cada llamada espera turno en una cola de prioridad (órdenes, después saldo y
+        tickers, después historial) y solo sale cuando el peso usado en el minuto
+        actual lo permite. El peso usado se estima localmente y se corrige con la
+        cabecera X-MBX-USED-WEIGHT-1M de cada respuesta. Ante un 429 o un 418 se
+        respeta Retry-After para todas las peticiones y la llamada se reintenta.
+
+        :param peso_por_minuto: Límite de peso por minuto de la cuenta o IP (e.g., 1200).
+        :param reintentos: Reintentos de una llamada rechazada por límite de peticiones.
+        """
+        self.peso_por_minuto = peso_por_minuto
+        self.reintentos = reintentos
+        self.peso_usado = 0
+        self.minuto = self._minuto_actual()
+        self.bloqueado_hasta = 0.0
+        self.peticiones = 0
+        self._cola = []
+        self._secuencia = itertools.count()
+        self._condicion = threading.Condition()
+
+    @staticmethod
+    def _minuto_actual():
+        return int(time.time() // 60)
+
+    def _renovar_minuto(self):
+        minuto = self._minuto_actual()
+        if minuto != self.minuto:
+            self.minuto = minuto
+            self.peso_usado = 0
+
+    def _espera_necesaria(self, peso, prioridad):
+        """
+        Segundos que debe esperar la petición en cabeza de la cola (0 si puede salir ya).
+        """
+        ahora = time.time()
+        if ahora < self.bloqueado_hasta:
+            return self.bloqueado_hasta - ahora
+        self._renovar_minuto()
+        limite = self.peso_por_minuto * FRACCION_LIMITE.get(prioridad, FRACCION_LIMITE[HISTORIAL])
+        if self.peso_usado + peso <= limite or self.peso_usado == 0:
+            return 0.0
+        return (self.minuto + 1) * 60 - ahora
+
+    def _esperar_turno(self, peso, prioridad):
+        with self._condicion:
+            turno = (prioridad, next(self._secuencia))
+            heapq.heappush(self._cola, turno)
+            while True:
+                if self._cola[0] == turno:
+                    espera = self._espera_necesaria(peso, prioridad)
+                    if espera <= 0:
+                        heapq.heappop(self._cola)
+                        self.peso_usado += peso
+                        self.peticiones += 1
+                        self._condicion.notify_all()
+                        return
+                    # Una petición más urgente puede llegar mientras se espera
+                    self._condicion.wait(min(espera, 1.0))
+                else:
+                    self._condicion.wait(1.0)
+
+    @staticmethod
+    def _cabecera(cabeceras, nombre):
+        for clave, valor in (cabeceras or {}).items():
+            if clave.lower() == nombre:
+                return valor
+        return None
+
+    def registrar_respuesta(self, cabeceras):
+        """
+        Ajusta el peso usado con la cabecera de peso de Binance. Se toma el máximo con la
+        estimación local porque puede haber peticiones en curso que la cabecera aún no cuenta.
+
+        :param cabeceras: Cabeceras de la última respuesta (exchange.last_response_headers).
+        """
+        usado = self._cabecera(cabeceras, 'x-mbx-used-weight-1m')
+        if usado is None:
+            return
+        with self._condicion:
+            self._renovar_minuto()
+            self.peso_usado = max(self.peso_usado, int(usado))
+            self._condicion.notify_all()
+
+    def registrar_limite(self, cabeceras):
+        """
+        Bloquea todas las peticiones hasta que venza el Retry-After de un 429 o 418.
+
+        :param cabeceras: Cabeceras de la respuesta rechazada.
+        """
+        retry_after = self._cabecera(cabeceras, 'retry-after')
+        espera = float(retry_after) if retry_after else 60 - time.time() % 60
+        with self._condicion:
+            self.bloqueado_hasta = max(self.bloqueado_hasta, time.time() + espera)
+            self._condicion.notify_all()
+        print(f"[WARN] Límite de peticiones de Binance alcanzado; se esperan {espera:.0f} segundos.")
+
+    def ejecutar(self, exchange, metodo, *args, **kwargs):
+        """
+        Ejecuta una llamada del cliente ccxt respetando prioridad y peso.
+
+        :param exchange: Cliente ccxt.
+        :param metodo: Nombre del método (e.g., "create_order").
+        :return: Resultado de la llamada.
+        """
+        import ccxt
+
+        peso = PESOS_PETICIONES.get(metodo, 1)
+        prioridad = PRIORIDADES.get(metodo, HISTORIAL)
+        for intento in range(self.reintentos + 1):
+            with ESPERA_PLANIFICADOR.tramo(metodo=metodo):
+                self._esperar_turno(peso, prioridad)
+            try:
+                # La ida y vuelta la mide el cliente (ClienteMedido), se use o no el planificador
+                resultado = getattr(exchange, metodo)(*args, **kwargs)
+            except ccxt.DDoSProtection:
+                # 429 (RateLimitExceeded) y 418 (baneo temporal de IP)
+                self.registrar_limite(getattr(exchange, 'last_response_headers', None))
+                if intento == self.reintentos:
+                    raise
+                REINTENTOS.incrementar(metodo=metodo)
+                continue
+            self.registrar_respuesta(getattr(exchange, 'last_response_headers', None))
+            return resultado
+
+class ClientePlanificado:
+    def __init__(self, exchange, planificador):
+        """
+        Envuelve un cliente ccxt para que sus llamadas a la API pasen por el planificador.
+        El resto de atributos se delegan sin cambios.
+
+        :param exchange: Cliente ccxt.
+        :param planificador: PlanificadorPeticiones compartido.
+        """
+        self._exchange = exchange
+        self._planificador = planificador
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._exchange, nombre)
+        if not callable(atributo) or not (nombre in PESOS_PETICIONES
+                                           or nombre.startswith(('fetch_', 'create_', 'cancel_'))):
+            return atributo
+
+        def llamada_planificada(*args, **kwargs):
+            return self._planificador.ejecutar(self._exchange, nombre, *args, **kwargs)
+        return llamada_planificada
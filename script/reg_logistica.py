@@ -1,27 +1,45 @@
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler
 from datetime import datetime
-from tabulate import tabulate
+import hashlib
 import json
 import os
 
 class ModeloPrediccion:
-    def __init__(self, archivo_csv, archivo_salida, formato_salida="json"):
+    COLUMNAS_X = ['timestamp_num', 'open', 'close', 'volume']
+
+    COLUMNAS_HUELLA = ['timestamp_num', 'open', 'high', 'low', 'close', 'volume']
+    MAX_PREDICCIONES_CACHE = 32
+
+    def __init__(self, archivo_csv, archivo_salida, formato_salida="json", fuente=None, modo="lote",
+                 factor_olvido=1.0, archivo_cache=None):
         """
         Inicializa el modelo de predicción para valores máximos y mínimos.
 
         :param archivo_csv: Nombre del archivo CSV con los datos históricos.
         :param archivo_salida: Nombre del archivo donde se guardarán las predicciones.
         :param formato_salida: Formato de salida para las predicciones ("json" o "csv").
+        :param fuente: Fuente de velas opcional con método a_dataframe() (e.g., AlmacenVelas).
+        :param modo: "lote" reentrena con todo el historial; "incremental" actualiza los
+                     estadísticos de mínimos cuadrados solo con las velas nuevas ya cerradas.
+        :param factor_olvido: Factor de olvido exponencial del modo incremental (1 = sin olvido).
+        :param archivo_cache: Archivo JSON opcional donde se guardan el modelo ajustado y las
+                              predicciones junto con la huella de los datos de entrenamiento.
         """
         self.archivo_csv = archivo_csv
+        self.fuente = fuente
         self.archivo_salida = archivo_salida
         self.formato_salida = formato_salida.lower()
         self.modelo_high = None
         self.modelo_low = None
-        self.scaler = StandardScaler()
+        # scikit-learn se importa solo al reentrenar (ver entrenar_modelo)
+        self.scaler = None
+        self.modo = modo
+        self.factor_olvido = factor_olvido
+        self.regresion = None
+        self.ultimo_timestamp_entrenado = None
+        self.archivo_cache = archivo_cache
+        self.cache = None
 
     def cargar_datos(self):
         """
@@ -30,12 +48,15 @@ class ModeloPrediccion:
         :return: DataFrame preprocesado.
         """
         try:
-            print(f"Cargando datos desde {self.archivo_csv}...")
-            datos = pd.read_csv(self.archivo_csv, parse_dates=['timestamp'])
+            if self.fuente is not None:
+                datos = self.fuente.a_dataframe()
+            else:
+                print(f"Cargando datos desde {self.archivo_csv}...")
+                datos = pd.read_csv(self.archivo_csv, parse_dates=['timestamp'])
             print(f"Datos cargados exitosamente: {len(datos)} registros.")
             
             # Agregar una columna numérica para el timestamp
-            datos['timestamp_num'] = datos['timestamp'].apply(lambda x: x.timestamp())
+            datos['timestamp_num'] = (datos['timestamp'] - pd.Timestamp(0)).dt.total_seconds()
             return datos
         except Exception as e:
             print(f"Error cargando el archivo: {e}")
@@ -47,7 +68,17 @@ class ModeloPrediccion:
 
         :param datos: DataFrame con los datos históricos.
         """
+        if self.modo == "incremental":
+            self.entrenar_incremental(datos)
+            return
+
+        from sklearn.model_selection import train_test_split
+        from sklearn.linear_model import LinearRegression
+        from sklearn.preprocessing import StandardScaler
+
         print("Entrenando modelo...")
+        self.scaler = StandardScaler()
+        datos = self.ventana_entrenamiento(datos)
         X = datos[['timestamp_num', 'open', 'close', 'volume']]
         y_high = datos['high']
         y_low = datos['low']
@@ -71,6 +102,136 @@ class ModeloPrediccion:
         print(f"Modelo High - R^2: {score_high:.2f}")
         print(f"Modelo Low - R^2: {score_low:.2f}")
 
+    @staticmethod
+    def ventana_entrenamiento(datos):
+        """
+        Devuelve las velas usadas para entrenar: todas menos la última, que sigue abierta.
+
+        :param datos: DataFrame con los datos históricos.
+        :return: DataFrame con las velas cerradas.
+        """
+        return datos.iloc[:-1] if len(datos) > 1 else datos
+
+    def huella_datos(self, datos):
+        """
+        Calcula la huella de la ventana de entrenamiento: número de velas, último
+        timestamp y hash del contenido.
+
+        :param datos: DataFrame con los datos históricos.
+        :return: Diccionario con la huella.
+        """
+        ventana = self.ventana_entrenamiento(datos)
+        contenido = ventana[self.COLUMNAS_HUELLA].to_numpy(dtype='float64')
+        return {
+            'modo': self.modo,
+            'filas': len(ventana),
+            'ultimo_timestamp': float(ventana['timestamp_num'].iloc[-1]) if len(ventana) else None,
+            'hash': hashlib.sha1(contenido.tobytes()).hexdigest(),
+        }
+
+    def cargar_modelo_cache(self, huella):
+        """
+        Restaura el escalador y los coeficientes desde la caché si la huella coincide.
+
+        :param huella: Huella de los datos actuales.
+        :return: True si el modelo se restauró y no hace falta entrenar.
+        """
+        from modelo_incremental import EscaladorEstandar, ModeloLineal
+
+        if self.cache is None and self.archivo_cache and os.path.exists(self.archivo_cache):
+            try:
+                with open(self.archivo_cache, "r") as f:
+                    self.cache = json.load(f)
+            except Exception as e:
+                print(f"No se pudo leer la caché del modelo: {e}")
+        if not self.cache or self.cache.get('huella') != huella:
+            return False
+
+        if self.modelo_high is None:
+            self.scaler = EscaladorEstandar(self.cache['escalador']['mean'], self.cache['escalador']['scale'])
+            self.modelo_high = ModeloLineal(self.cache['high']['coef'], self.cache['high']['intercept'])
+            self.modelo_low = ModeloLineal(self.cache['low']['coef'], self.cache['low']['intercept'])
+        print("Datos de entrenamiento sin cambios: se reutiliza el modelo en caché.")
+        return True
+
+    def guardar_modelo_cache(self, huella):
+        """
+        Guarda el escalador y los coeficientes ajustados junto con la huella de los datos.
+
+        :param huella: Huella de los datos con los que se entrenó.
+        """
+        self.cache = {
+            'huella': huella,
+            'escalador': {'mean': list(map(float, self.scaler.mean_)), 'scale': list(map(float, self.scaler.scale_))},
+            'high': {'coef': list(map(float, self.modelo_high.coef_)), 'intercept': float(self.modelo_high.intercept_)},
+            'low': {'coef': list(map(float, self.modelo_low.coef_)), 'intercept': float(self.modelo_low.intercept_)},
+            'predicciones': {},
+        }
+        self.escribir_cache()
+
+    def escribir_cache(self):
+        """
+        Persiste la caché en disco de forma atómica.
+        """
+        if not self.archivo_cache or self.cache is None:
+            return
+        try:
+            temporal = f"{self.archivo_cache}.tmp"
+            with open(temporal, "w") as f:
+                json.dump(self.cache, f)
+            os.replace(temporal, self.archivo_cache)
+        except Exception as e:
+            print(f"No se pudo guardar la caché del modelo: {e}")
+
+    def clave_prediccion(self, datos, *parametros):
+        """
+        Clave de la caché de predicciones: huella del modelo, vela base y parámetros de la petición.
+        """
+        base = datos.iloc[-1][['timestamp_num', 'open', 'close', 'volume']].astype(float).tolist()
+        return hashlib.sha1(json.dumps([self.cache['huella']['hash'] if self.cache else None, base,
+                                        list(parametros)], default=str).encode()).hexdigest()
+
+    def entrenar_incremental(self, datos):
+        """
+        Actualiza el modelo incremental con las velas cerradas que aún no se habían
+        incorporado (la última vela del historial sigue abierta y no se usa).
+
+        :param datos: DataFrame con los datos históricos.
+        """
+        from modelo_incremental import RegresionIncremental
+
+        cerradas = self.ventana_entrenamiento(datos)
+        if self.ultimo_timestamp_entrenado is not None:
+            cerradas = cerradas[cerradas['timestamp_num'] > self.ultimo_timestamp_entrenado]
+        if self.regresion is None:
+            self.regresion = RegresionIncremental(len(self.COLUMNAS_X), 2, self.factor_olvido)
+
+        if len(cerradas):
+            self.regresion.actualizar_lote(cerradas[self.COLUMNAS_X].to_numpy(dtype=float),
+                                           cerradas[['high', 'low']].to_numpy(dtype=float))
+            self.ultimo_timestamp_entrenado = float(cerradas['timestamp_num'].iloc[-1])
+        print(f"Modelo incremental actualizado con {len(cerradas)} velas nuevas "
+              f"({self.regresion.muestras} en total).")
+
+        self.scaler, (self.modelo_high, self.modelo_low) = self.regresion.resolver()
+
+    def actualizar_vela(self, vela):
+        """
+        Incorpora una vela cerrada al modelo incremental en O(variables²).
+
+        :param vela: Vela [timestamp_ms, open, high, low, close, volume].
+        """
+        from modelo_incremental import RegresionIncremental
+
+        if self.regresion is None:
+            self.regresion = RegresionIncremental(len(self.COLUMNAS_X), 2, self.factor_olvido)
+        timestamp = vela[0] / 1000
+        if self.ultimo_timestamp_entrenado is not None and timestamp <= self.ultimo_timestamp_entrenado:
+            return
+        self.regresion.actualizar([timestamp, vela[1], vela[4], vela[5]], [vela[2], vela[3]])
+        self.ultimo_timestamp_entrenado = timestamp
+        self.scaler, (self.modelo_high, self.modelo_low) = self.regresion.resolver()
+
     def predecir(self, datos):
         """
         Predice los próximos valores máximos y mínimos.
@@ -78,34 +239,100 @@ class ModeloPrediccion:
         :param datos: DataFrame con los datos históricos.
         :return: Lista con las predicciones de 'high' y 'low' para los próximos periodos.
         """
+        clave = self.clave_prediccion(datos, 'diarias', 5) if self.cache is not None else None
+        if clave and clave in self.cache['predicciones']:
+            print("Predicciones servidas desde la caché.")
+            return [dict(prediccion) for prediccion in self.cache['predicciones'][clave]]
+
         print("Realizando predicciones...")
-        
-        # Tomar el último registro como base para las predicciones
-        ultimo_registro = datos.iloc[-1]
-        timestamp_base = ultimo_registro['timestamp_num']
-        open_base = ultimo_registro['open']
-        close_base = ultimo_registro['close']
-        volume_base = ultimo_registro['volume']
-
-        # Crear datos para predicciones futuras
-        predicciones = []
-        for dias in range(1, 6):  # Predicciones para los próximos 5 días
-            timestamp_pred = timestamp_base + (dias * 24 * 3600)  # Incrementar 1 día en segundos
-            X_pred = pd.DataFrame([[timestamp_pred, open_base, close_base, volume_base]], 
-                                  columns=['timestamp_num', 'open', 'close', 'volume'])
-            X_pred_scaled = self.scaler.transform(X_pred)
-
-            high_pred = self.modelo_high.predict(X_pred_scaled)[0]
-            low_pred = self.modelo_low.predict(X_pred_scaled)[0]
-
-            predicciones.append({
+
+        # Predicciones para los próximos 5 días a partir del último registro
+        horizontes = self.predecir_horizontes(datos, np.arange(1, 6) * 24 * 3600, unidad="segundos")
+        predicciones = [
+            {
                 'timestamp': datetime.fromtimestamp(timestamp_pred).isoformat(),
                 'high_pred': high_pred,
                 'low_pred': low_pred
-            })
+            }
+            for timestamp_pred, high_pred, low_pred in horizontes.itertuples(index=False)
+        ]
 
+        if clave:
+            self.guardar_prediccion_cache(clave, predicciones)
         return predicciones
 
+    @staticmethod
+    def duracion_vela(datos):
+        """
+        Duración de una vela en segundos, deducida de la separación más frecuente entre timestamps.
+
+        :param datos: DataFrame con los datos históricos.
+        :return: Segundos por vela.
+        """
+        separaciones = np.diff(datos['timestamp_num'].to_numpy()[-1000:])
+        separaciones = separaciones[separaciones > 0]
+        if len(separaciones) == 0:
+            raise ValueError("No hay suficientes velas para deducir la duración de una vela.")
+        valores, cuentas = np.unique(separaciones, return_counts=True)
+        return float(valores[np.argmax(cuentas)])
+
+    def predecir_horizontes(self, datos, horizontes, unidad="velas", escenarios=None):
+        """
+        Predice high y low para un conjunto arbitrario de horizontes con una sola
+        transformación y una sola predicción por modelo.
+
+        :param datos: DataFrame con los datos históricos (la última vela es la base).
+        :param horizontes: Array de horizontes. Según la unidad: número de velas, segundos
+                           desde la última vela o timestamps absolutos (epoch en segundos,
+                           datetime o texto ISO).
+        :param unidad: "velas", "segundos" o "timestamps".
+        :param escenarios: Diccionario opcional con valores de 'open', 'close' o 'volume'
+                           (escalares o arrays de la misma longitud que horizontes) que
+                           sustituyen a los de la última vela.
+        :return: DataFrame con columnas timestamp_num, high_pred y low_pred.
+        """
+        ultimo_registro = datos.iloc[-1]
+        timestamp_base = float(ultimo_registro['timestamp_num'])
+
+        if unidad == "velas":
+            timestamps = timestamp_base + np.asarray(horizontes, dtype=np.float64) * self.duracion_vela(datos)
+        elif unidad == "segundos":
+            timestamps = timestamp_base + np.asarray(horizontes, dtype=np.float64)
+        elif unidad == "timestamps":
+            horizontes = np.atleast_1d(horizontes)
+            if horizontes.dtype.kind in 'if':
+                timestamps = horizontes.astype(np.float64)
+            else:
+                timestamps = ((pd.to_datetime(horizontes) - pd.Timestamp(0)).total_seconds()).to_numpy()
+        else:
+            raise ValueError(f"Unidad de horizonte no reconocida: {unidad}")
+        timestamps = np.atleast_1d(timestamps)
+
+        escenarios = escenarios or {}
+        X_pred = pd.DataFrame({
+            columna: (np.broadcast_to(np.asarray(escenarios[columna], dtype=np.float64), timestamps.shape)
+                      if columna in escenarios else np.full(len(timestamps), float(ultimo_registro[columna])))
+            for columna in self.COLUMNAS_X[1:]
+        })
+        X_pred.insert(0, 'timestamp_num', timestamps)
+        X_pred_scaled = self.scaler.transform(X_pred[self.COLUMNAS_X])
+
+        return pd.DataFrame({
+            'timestamp_num': timestamps,
+            'high_pred': self.modelo_high.predict(X_pred_scaled),
+            'low_pred': self.modelo_low.predict(X_pred_scaled),
+        })
+
+    def guardar_prediccion_cache(self, clave, predicciones):
+        """
+        Guarda unas predicciones en la caché, conservando solo las más recientes.
+        """
+        guardadas = self.cache['predicciones']
+        guardadas[clave] = [{k: (float(v) if k != 'timestamp' else v) for k, v in p.items()} for p in predicciones]
+        while len(guardadas) > self.MAX_PREDICCIONES_CACHE:
+            guardadas.pop(next(iter(guardadas)))
+        self.escribir_cache()
+
     def guardar_predicciones(self, predicciones):
         """
         Guarda las predicciones en un archivo en formato JSON o CSV.
@@ -129,6 +356,7 @@ class ModeloPrediccion:
 
         :param predicciones: Lista con las predicciones.
         """
+        from tabulate import tabulate
         print("\nPredicciones de Valores Máximos y Mínimos:")
         print(tabulate(predicciones, headers="keys", tablefmt="grid"))
 
@@ -141,7 +369,11 @@ class ModeloPrediccion:
             print("No se pudieron cargar datos. Finalizando análisis.")
             return
 
-        self.entrenar_modelo(datos)
+        huella = self.huella_datos(datos) if self.archivo_cache else None
+        if huella is None or not self.cargar_modelo_cache(huella):
+            self.entrenar_modelo(datos)
+            if huella is not None:
+                self.guardar_modelo_cache(huella)
         predicciones = self.predecir(datos)
         self.guardar_predicciones(predicciones)
         self.mostrar_predicciones(predicciones)
@@ -0,0 +1,132 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+from datetime import datetime, timezone
+
+# Prefijos de nivel que usan los mensajes de los bots (e.g., "[ERROR] ...")
+PREFIJO_NIVEL = re.compile(r"^\s*\[(INFO|WARN|WARNING|ERROR|DEBUG)\]\s*")
+NIVELES = {'INFO': logging.INFO, 'WARN': logging.WARNING, 'WARNING': logging.WARNING,
+           'ERROR': logging.ERROR, 'DEBUG': logging.DEBUG}
+# Atributos propios de LogRecord; el resto son campos extra del mensaje
+ATRIBUTOS_REGISTRO = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+class FormateadorJSON(logging.Formatter):
+    def format(self, record):
+        """
+        Convierte un registro en una línea JSON con momento, nivel, logger, hilo,
+        mensaje y los campos extra pasados con extra={...}.
+        """
+        linea = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='microseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'hilo': record.threadName,
+            'mensaje': record.getMessage(),
+        }
+        for clave, valor in vars(record).items():
+            if clave not in ATRIBUTOS_REGISTRO:
+                linea[clave] = valor
+        if record.exc_info:
+            linea['excepcion'] = self.formatException(record.exc_info)
+        return json.dumps(linea, ensure_ascii=False, default=str)
+
+class ManejadorCola(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        """
+        Deja el formateo al hilo del QueueListener: en el hilo que registra solo se
+        resuelven los argumentos del mensaje y se encola el registro.
+        """
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+_OYENTES = {}
+
+def configurar_registro(nombre="bot", archivo="../datos/bot.jsonl", nivel=logging.INFO, consola=False):
+    """
+    Configura un logger cuyos registros se encolan sin bloquear y se formatean y
+    escriben como líneas JSON en un hilo en segundo plano (QueueListener). Un
+    terminal lento o un colector de logs que tarda en leer no añade latencia a
+    quien registra.
+
+    :param nombre: Nombre del logger (los loggers hijos, e.g., "bot.ordenes", lo comparten).
+    :param archivo: Archivo JSON lines de destino (None = sin archivo). Si su carpeta no
+                    existe, las líneas se escriben en stderr.
+    :param nivel: Nivel mínimo de registro.
+    :param consola: Si es True, también escribe las líneas JSON en stderr (desde el hilo de fondo).
+    :return: Logger configurado.
+    """
+    logger = logging.getLogger(nombre)
+    if nombre in _OYENTES:
+        return logger
+
+    manejadores = []
+    if archivo is not None and not os.path.isdir(os.path.dirname(archivo) or "."):
+        print(f"[WARN] No existe la carpeta de {archivo}; el registro se escribe en stderr.", file=sys.stderr)
+        archivo, consola = None, True
+    if archivo is not None:
+        manejadores.append(logging.FileHandler(archivo, encoding='utf-8'))
+    if consola:
+        manejadores.append(logging.StreamHandler(sys.stderr))
+    for manejador in manejadores:
+        manejador.setFormatter(FormateadorJSON())
+
+    cola = queue.SimpleQueue()
+    oyente = logging.handlers.QueueListener(cola, *manejadores, respect_handler_level=True)
+    oyente.start()
+    atexit.register(oyente.stop)
+    _OYENTES[nombre] = oyente
+
+    logger.setLevel(nivel)
+    logger.addHandler(ManejadorCola(cola))
+    # Sin propagar: el StreamHandler síncrono de logging.basicConfig no debe recibir estos registros
+    logger.propagate = False
+    return logger
+
+def detener_registro(nombre="bot"):
+    """
+    Vacía la cola y detiene el hilo de escritura de un logger configurado.
+    """
+    oyente = _OYENTES.pop(nombre, None)
+    if oyente is not None:
+        # Ya detenido: no debe volver a detenerse al salir del proceso
+        atexit.unregister(oyente.stop)
+        oyente.stop()
+        logger = logging.getLogger(nombre)
+        for manejador in [m for m in logger.handlers if isinstance(m, ManejadorCola)]:
+            logger.removeHandler(manejador)
+
+class ConsolaRegistro:
+    def __init__(self, logger):
+        """
+        Sustituto de rich.console.Console para el modo headless de los bots: log()
+        encola el mensaje en el logger asíncrono y print() descarta tablas y paneles.
+
+        :param logger: Logger (e.g., el devuelto por configurar_registro o uno hijo).
+        """
+        self.logger = logger
+
+    def log(self, *objetos, **campos):
+        """
+        Registra un mensaje. El prefijo "[INFO]", "[WARN]" o "[ERROR]" del mensaje
+        determina el nivel; los argumentos con nombre se guardan como campos extra.
+        """
+        mensaje = " ".join(str(objeto) for objeto in objetos)
+        nivel = logging.INFO
+        coincidencia = PREFIJO_NIVEL.match(mensaje)
+        if coincidencia:
+            nivel = NIVELES[coincidencia.group(1)]
+            mensaje = mensaje[coincidencia.end():]
+        if self.logger.isEnabledFor(nivel):
+            self.logger.log(nivel, mensaje, extra={clave: valor for clave, valor in campos.items()
+                                                   if clave not in ATRIBUTOS_REGISTRO})
+
+    def print(self, *objetos, **kwargs):
+        # Las tablas y paneles de rich no se renderizan en modo headless
+        if all(isinstance(objeto, str) for objeto in objetos):
+            self.log(*objetos)
@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import threading
+import time
+from metricas import ClienteMedido
+from planificador_peticiones import PlanificadorPeticiones, ClientePlanificado
+
+class SesionBinance:
+    def __init__(self, archivo_cache_mercados="../datos/cache_mercados.json", ttl_mercados=3600,
+                 api_key=None, api_secret=None, peso_por_minuto=None, exchange=None):
+        """
+        Inicializa una sesión de Binance compartida por todas las etapas del bot.
+
+        La sesión crea un único cliente ccxt (y con él un único pool de conexiones HTTP)
+        y mantiene una caché de mercados con tiempo de vida, persistida en disco para que
+        los arranques en frío no tengan que descargar los mercados de nuevo.
+
+        :param archivo_cache_mercados: Archivo JSON donde se persiste la caché de mercados.
+        :param ttl_mercados: Segundos que se consideran válidos los mercados cargados.
+        :param api_key: API Key de Binance (por defecto BINANCE_API_KEY o config.json).
+        :param api_secret: API Secret de Binance (por defecto BINANCE_API_SECRET o config.json).
+        :param peso_por_minuto: Límite de peso por minuto compartido por todos los usuarios de la
+                                sesión; las llamadas pasan por un PlanificadorPeticiones con
+                                prioridades (None = solo el limitador propio de ccxt).
+        :param exchange: Cliente ya creado que sustituye a Binance (e.g., ExchangeSimulado); no
+                         necesita credenciales y sus mercados no se guardan en la caché en disco.
+        """
+        logging.basicConfig(level=logging.INFO,
+                            format='%(asctime)s - %(levelname)s - %(message)s')
+        self.logger = logging.getLogger(__name__)
+
+        self.api_key = api_key or os.getenv('BINANCE_API_KEY')
+        self.api_secret = api_secret or os.getenv('BINANCE_API_SECRET')
+        self.archivo_cache_mercados = archivo_cache_mercados
+        self.ttl_mercados = ttl_mercados
+        # Todas las llamadas REST de la sesión se miden en PETICION_REST
+        self._exchange = ClienteMedido(exchange) if exchange is not None else None
+        self._cliente = None
+        self.planificador = PlanificadorPeticiones(peso_por_minuto) if peso_por_minuto else None
+        self._mercados_cargados_en = None
+        # Las etapas pueden pedir el cliente desde varios hilos a la vez
+        self._lock = threading.RLock()
+
+        if exchange is not None:
+            # Los mercados del cliente inyectado no deben mezclarse con la caché de Binance
+            self.archivo_cache_mercados = None
+        elif not self.api_key or not self.api_secret:
+            self.cargar_credenciales_desde_archivo()
+
+    def cargar_credenciales_desde_archivo(self):
+        """
+        Carga las credenciales de API desde un archivo de configuración.
+        """
+        try:
+            print("Cargando credenciales desde archivo...")
+            with open('config.json', 'r') as f:
+                config = json.load(f)
+                self.api_key = config.get('binance_api_key')
+                self.api_secret = config.get('binance_api_secret')
+                print("Credenciales cargadas exitosamente.")
+        except FileNotFoundError:
+            self.logger.error("Archivo de configuración config.json no encontrado")
+            raise ValueError("No se encontraron credenciales de API. Por favor, configura tus credenciales.")
+
+    def inicializar_exchange(self):
+        """
+        Crea el cliente de Binance una sola vez para toda la sesión.
+        """
+        # ccxt tarda en importarse; se carga al crear el cliente
+        import ccxt
+        try:
+            print("Inicializando conexión con Binance...")
+            exchange = ccxt.binance({
+                'apiKey': self.api_key,
+                'secret': self.api_secret,
+                'enableRateLimit': True,
+                'options': {'defaultType': 'spot'}
+            })
+            self.logger.info("Cliente de Binance creado para la sesión compartida")
+            return ClienteMedido(exchange)
+        except ccxt.AuthenticationError:
+            self.logger.error("Error de autenticación. Verifica tus credenciales de API")
+            raise
+
+    def crear_cliente_stream(self):
+        """
+        Crea un cliente de ccxt.pro con las credenciales de la sesión para los streams de
+        la cuenta (e.g., watch_balance). Hay que crearlo en el bucle de eventos que lo usa.
+        """
+        import ccxt.pro as ccxtpro
+        return ClienteMedido(ccxtpro.binance({
+            'apiKey': self.api_key,
+            'secret': self.api_secret,
+            'enableRateLimit': True,
+            'options': {'defaultType': 'spot'}
+        }))
+
+    @property
+    def exchange(self):
+        """
+        Cliente de Binance compartido, con los mercados cargados y vigentes. Si la sesión
+        tiene planificador, las llamadas del cliente pasan por él.
+        """
+        with self._lock:
+            if self._exchange is None:
+                self._exchange = self.inicializar_exchange()
+            if self._cliente is None:
+                self._cliente = (ClientePlanificado(self._exchange, self.planificador)
+                                 if self.planificador is not None else self._exchange)
+            self.cargar_mercados()
+            return self._cliente
+
+    def mercados_vigentes(self):
+        """
+        Indica si los mercados en memoria siguen dentro de su tiempo de vida.
+        """
+        return (self._mercados_cargados_en is not None
+                and time.time() - self._mercados_cargados_en < self.ttl_mercados)
+
+    def cargar_mercados(self, forzar=False):
+        """
+        Carga los mercados desde memoria, desde la caché en disco o desde Binance,
+        en ese orden, respetando el tiempo de vida configurado.
+
+        :param forzar: Si es True, descarga los mercados de Binance aunque la caché siga vigente.
+        """
+        if not forzar and self.mercados_vigentes():
+            return
+
+        if not forzar and self.cargar_cache_mercados():
+            return
+
+        print("Descargando mercados de Binance...")
+        if self.planificador is not None:
+            self.planificador.ejecutar(self._exchange, 'load_markets', reload=True)
+        else:
+            self._exchange.load_markets(reload=True)
+        self._mercados_cargados_en = time.time()
+        self.guardar_cache_mercados()
+        self.logger.info(f"Mercados cargados desde Binance: {len(self._exchange.markets)}")
+
+    def cargar_cache_mercados(self):
+        """
+        Carga los mercados desde la caché en disco si existe y no ha expirado.
+
+        :return: True si se cargaron los mercados desde la caché.
+        """
+        try:
+            if self.archivo_cache_mercados is None or not os.path.exists(self.archivo_cache_mercados):
+                return False
+            with open(self.archivo_cache_mercados, 'r') as f:
+                cache = json.load(f)
+            guardado_en = cache.get('timestamp', 0)
+            if time.time() - guardado_en >= self.ttl_mercados:
+                return False
+
+            self._exchange.set_markets(cache['markets'], cache.get('currencies'))
+            self._mercados_cargados_en = guardado_en
+            self.logger.info(f"Mercados cargados desde caché {self.archivo_cache_mercados}: "
+                             f"{len(self._exchange.markets)}")
+            return True
+        except Exception as e:
+            self.logger.warning(f"No se pudo leer la caché de mercados: {e}")
+            return False
+
+    def guardar_cache_mercados(self):
+        """
+        Persiste los mercados cargados en disco de forma atómica.
+        """
+        if self.archivo_cache_mercados is None:
+            return
+        try:
+            temporal = f"{self.archivo_cache_mercados}.tmp"
+            with open(temporal, 'w') as f:
+                json.dump({
+                    'timestamp': self._mercados_cargados_en,
+                    'markets': self._exchange.markets,
+                    'currencies': self._exchange.currencies,
+                }, f)
+            os.replace(temporal, self.archivo_cache_mercados)
+        except Exception as e:
+            self.logger.warning(f"No se pudo guardar la caché de mercados: {e}")